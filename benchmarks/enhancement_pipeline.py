@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+PhotoVault Enhancement Pipeline Benchmark
+Compares the array-only enhancement pipeline against the previous PIL round trip
+
+Usage:
+    python benchmarks/enhancement_pipeline.py path/to/fixtures --repeat 3
+
+The legacy variant runs the OpenCV steps, converts BGR -> RGB -> PIL Image,
+applies ImageEnhance brightness/contrast/color/sharpness and converts back.
+The array variant runs every step on the BGR array. For each fixture the
+script reports time per run, the extra peak memory of each variant (measured
+in a fresh process), and the pixel difference between the two outputs.
+"""
+import os
+import sys
+import time
+import argparse
+import resource
+import multiprocessing
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from photovault.utils.image_enhancement import ImageEnhancer
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp'}
+
+# Typical settings suggested for faded old photos
+SETTINGS = {
+    'brightness': 1.1,
+    'contrast': 1.2,
+    'color': 1.1,
+    'sharpness': 1.2,
+    'denoise': True,
+    'clahe_enabled': True,
+    'auto_levels': True,
+    'colorize': False
+}
+TONE_KEYS = ('brightness', 'contrast', 'color', 'sharpness')
+
+
+def enhance_legacy(enhancer, img):
+    """OpenCV steps on the array, tone adjustments through a PIL round trip"""
+    opencv_only = dict(SETTINGS, **{key: 1.0 for key in TONE_KEYS})
+    img = enhancer.engine.process(img, opencv_only)
+    pil_img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+    pil_img = enhancer._apply_pil_enhancements(pil_img, SETTINGS)
+    return cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+
+
+def enhance_arrays(enhancer, img):
+    """Every step on the BGR array"""
+    return enhancer.engine.process(img, SETTINGS)
+
+
+VARIANTS = {'legacy': enhance_legacy, 'arrays': enhance_arrays}
+
+
+def peak_memory(args):
+    """Extra peak RSS (MB) of one variant above the decoded image, in a fresh process"""
+    variant, path = args
+    enhancer = ImageEnhancer()
+    img = cv2.imread(path)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    VARIANTS[variant](enhancer, img)
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024
+
+
+def run(fixture_dir, repeat):
+    paths = [os.path.join(fixture_dir, name) for name in sorted(os.listdir(fixture_dir))
+             if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS]
+    if not paths:
+        print(f"No images found in {fixture_dir}")
+        return 1
+
+    enhancer = ImageEnhancer()
+    context = multiprocessing.get_context('spawn')
+
+    print(f"{'image':<28} {'legacy ms':>10} {'arrays ms':>10} {'legacy MB':>10} {'arrays MB':>10} "
+          f"{'max diff':>9} {'mean diff':>10} {'>1 px %':>8}")
+    for path in paths:
+        img = cv2.imread(path)
+        if img is None:
+            continue
+
+        timings = {}
+        outputs = {}
+        for variant, enhance in VARIANTS.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                outputs[variant] = enhance(enhancer, img.copy())
+            timings[variant] = (time.perf_counter() - start) / repeat
+
+        memory = {}
+        for variant in VARIANTS:
+            with context.Pool(1) as pool:
+                memory[variant] = pool.apply(peak_memory, ((variant, path),))
+
+        diff = cv2.absdiff(outputs['legacy'], outputs['arrays'])
+        print(f"{os.path.basename(path)[:28]:<28} {timings['legacy'] * 1000:>10.1f} {timings['arrays'] * 1000:>10.1f} "
+              f"{memory['legacy']:>10.1f} {memory['arrays']:>10.1f} {int(diff.max()):>9} "
+              f"{float(diff.mean()):>10.3f} {float((diff > 1).mean() * 100):>8.2f}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the array-only enhancement pipeline')
+    parser.add_argument('fixtures', help='Directory of fixture images')
+    parser.add_argument('--repeat', type=int, default=3, help='Enhancement runs per image and variant')
+    args = parser.parse_args()
+    return run(args.fixtures, args.repeat)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+PhotoVault Face Detection Proxy Benchmark
+Compares proxy-resolution face detection against full-resolution detection
+
+Usage:
+    python benchmarks/face_detection_proxy.py path/to/fixtures --sizes 0,1536,1024,768
+
+Size 0 is full resolution and serves as the accuracy reference. For every
+other proxy size the script reports mean detection time per image and the
+recall/precision of its boxes against the reference (IoU >= 0.5).
+"""
+import os
+import sys
+import time
+import argparse
+
+import cv2
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from photovault.utils.face_detection import FaceDetector
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp'}
+
+
+def iou(a, b):
+    """Intersection over union of two face boxes"""
+    x1 = max(a['x'], b['x'])
+    y1 = max(a['y'], b['y'])
+    x2 = min(a['x'] + a['width'], b['x'] + b['width'])
+    y2 = min(a['y'] + a['height'], b['y'] + b['height'])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = a['width'] * a['height'] + b['width'] * b['height'] - inter
+    return inter / union if union else 0.0
+
+
+def count_matches(reference, candidate, threshold=0.5):
+    """Greedily match candidate boxes to reference boxes by IoU"""
+    unmatched = list(candidate)
+    matches = 0
+    for ref in reference:
+        best = max(unmatched, key=lambda c: iou(ref, c), default=None)
+        if best is not None and iou(ref, best) >= threshold:
+            matches += 1
+            unmatched.remove(best)
+    return matches
+
+
+def load_fixtures(fixture_dir):
+    """Decode every image in the fixture directory"""
+    images = []
+    for name in sorted(os.listdir(fixture_dir)):
+        if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+            continue
+        image = cv2.imread(os.path.join(fixture_dir, name))
+        if image is not None:
+            images.append((name, image))
+    return images
+
+
+def run(fixture_dir, sizes, repeat):
+    images = load_fixtures(fixture_dir)
+    if not images:
+        print(f"No images found in {fixture_dir}")
+        return 1
+
+    results = {}
+    for size in sizes:
+        detector = FaceDetector(max_dimension=size)
+        if not detector.is_available():
+            print("Face detection is not available (OpenCV models missing)")
+            return 1
+        per_image = {}
+        elapsed = 0.0
+        for name, image in images:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                faces = detector.detect_faces_in_image(image.copy(), name)
+                elapsed += time.perf_counter() - start
+            per_image[name] = faces
+        results[size] = (elapsed / (len(images) * repeat), per_image)
+
+    reference_time, reference = results[sizes[0]]
+    reference_total = sum(len(faces) for faces in reference.values())
+
+    print(f"{len(images)} fixture images, reference size {sizes[0] or 'full'}, "
+          f"{reference_total} reference faces")
+    print(f"{'size':>8} {'ms/image':>10} {'speedup':>8} {'faces':>6} {'recall':>7} {'precision':>9}")
+    for size in sizes:
+        mean_time, per_image = results[size]
+        found = sum(len(faces) for faces in per_image.values())
+        matched = sum(count_matches(reference[name], per_image[name]) for name, _ in images)
+        recall = matched / reference_total if reference_total else 1.0
+        precision = matched / found if found else 1.0
+        print(f"{size or 'full':>8} {mean_time * 1000:>10.1f} {reference_time / mean_time:>7.1f}x "
+              f"{found:>6} {recall:>7.2f} {precision:>9.2f}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark proxy-resolution face detection')
+    parser.add_argument('fixtures', help='Directory of fixture images')
+    parser.add_argument('--sizes', default='0,1536,1024,768',
+                        help='Comma-separated proxy long edges; the first is the reference (0 = full resolution)')
+    parser.add_argument('--repeat', type=int, default=3, help='Detection runs per image and size')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    return run(args.fixtures, sizes, args.repeat)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
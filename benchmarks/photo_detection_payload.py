@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+PhotoVault Photo Detection Payload Benchmark
+Compares the compact detection payload against the one with full contours
+
+Usage:
+    python benchmarks/photo_detection_payload.py path/to/scans --repeat 3
+
+For every fixture scan the script runs detection with and without full
+contours and reports the JSON response size and the detection plus
+serialization time per image.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from photovault.utils.photo_detection import PhotoDetector
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp'}
+
+
+def measure(detector, path, include_contours, repeat):
+    """Mean detection and serialization time and the payload size for one scan"""
+    detect_time = 0.0
+    serialize_time = 0.0
+    payload = b''
+    for _ in range(repeat):
+        start = time.perf_counter()
+        detections = detector.detect_photos(path, include_contours=include_contours)
+        detect_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        payload = json.dumps({'success': True, 'detected_photos': detections}).encode()
+        serialize_time += time.perf_counter() - start
+    return detect_time / repeat, serialize_time / repeat, len(payload)
+
+
+def run(fixture_dir, repeat):
+    paths = [os.path.join(fixture_dir, name) for name in sorted(os.listdir(fixture_dir))
+             if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS]
+    if not paths:
+        print(f"No images found in {fixture_dir}")
+        return 1
+
+    detector = PhotoDetector()
+    totals = {True: [0.0, 0.0, 0], False: [0.0, 0.0, 0]}
+
+    print(f"{'scan':<32} {'full KB':>9} {'compact KB':>11} {'ratio':>7} {'full ms':>9} {'compact ms':>11}")
+    for path in paths:
+        row = {}
+        for include_contours in (True, False):
+            row[include_contours] = measure(detector, path, include_contours, repeat)
+            for index, value in enumerate(row[include_contours]):
+                totals[include_contours][index] += value
+
+        full_size, compact_size = row[True][2], row[False][2]
+        print(f"{os.path.basename(path)[:32]:<32} {full_size / 1024:>9.1f} {compact_size / 1024:>11.1f} "
+              f"{full_size / max(compact_size, 1):>6.1f}x {sum(row[True][:2]) * 1000:>9.1f} "
+              f"{sum(row[False][:2]) * 1000:>11.1f}")
+
+    count = len(paths)
+    full, compact = totals[True], totals[False]
+    print(f"{'mean':<32} {full[2] / count / 1024:>9.1f} {compact[2] / count / 1024:>11.1f} "
+          f"{full[2] / max(compact[2], 1):>6.1f}x {(full[0] + full[1]) / count * 1000:>9.1f} "
+          f"{(compact[0] + compact[1]) / count * 1000:>11.1f}")
+    print(f"serialization ms/image: full {full[1] / count * 1000:.2f}, compact {compact[1] / count * 1000:.2f}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark photo detection payload size and latency')
+    parser.add_argument('fixtures', help='Directory of fixture scans')
+    parser.add_argument('--repeat', type=int, default=3, help='Detection runs per scan and format')
+    args = parser.parse_args()
+    return run(args.fixtures, args.repeat)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+PhotoVault SQLite Search Benchmark
+Runs full-text search against the SQLite FTS5 index of the development database
+
+Usage:
+    python benchmarks/search_sqlite.py --photos 5000 --repeat 20
+
+The script seeds an in-memory SQLite database with photos, checks that each
+query finds the photos it should (with thumbnail URLs) and reports the mean
+search time per query.
+"""
+import os
+import sys
+import time
+import argparse
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from photovault import create_app
+from photovault.extensions import db
+from photovault.models import User, Photo
+
+OCCASIONS = ['Birthday party at the lake', 'Wedding in the garden', 'Graduation day', 'Christmas morning']
+QUERIES = ['birth', 'wedding garden', 'graduation', 'christmas morn']
+
+
+def seed(photo_count):
+    """Create one user owning photo_count photos, cycling through the occasions"""
+    user = User(username='benchmark', email='benchmark@example.com')
+    user.set_password('benchmark')
+    db.session.add(user)
+    db.session.commit()
+
+    db.session.add_all([
+        Photo(filename=f'photo_{index}.jpg', original_name=f'photo_{index}.jpg',
+              file_path=f'/tmp/photo_{index}.jpg', thumbnail_path=f'/tmp/photo_{index}_thumb.jpg',
+              user_id=user.id, occasion=OCCASIONS[index % len(OCCASIONS)])
+        for index in range(photo_count)
+    ])
+    db.session.commit()
+    return user
+
+
+def run(photo_count, repeat):
+    from photovault.services.search_service import search_service
+
+    app = create_app('testing')
+    with app.test_request_context():
+        db.create_all()
+        user = seed(photo_count)
+
+        failures = 0
+        print(f"{'query':<24} {'results':>8} {'ms':>9}")
+        for query in QUERIES:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                result = search_service.search(user.id, query)
+            elapsed = (time.perf_counter() - start) / repeat
+
+            results = result['results']
+            ok = bool(results) and all(item['type'] == 'photo' and item.get('thumbnail_url') for item in results)
+            failures += not ok
+            print(f"{query:<24} {len(results):>8} {elapsed * 1000:>9.2f}{'' if ok else '  FAILED'}")
+
+    if failures:
+        print(f"{failures} queries returned no results")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark search on SQLite')
+    parser.add_argument('--photos', type=int, default=1000, help='Photos to seed')
+    parser.add_argument('--repeat', type=int, default=10, help='Searches per query')
+    args = parser.parse_args()
+    return run(args.photos, args.repeat)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""Allow unassigned face detections in photo_people
+
+Revision ID: 1fb9ecc3495d
+Revises: ad11b5287a15
+Create Date: 2026-10-18 09:12:44.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1fb9ecc3495d'
+down_revision = 'ad11b5287a15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Detected faces are stored before a person is assigned to them
+    with op.batch_alter_table('photo_people', schema=None) as batch_op:
+        batch_op.alter_column('person_id',
+               existing_type=sa.Integer(),
+               nullable=True)
+
+
+def downgrade():
+    # Unassigned detections cannot satisfy NOT NULL, drop them first
+    conn = op.get_bind()
+    conn.execute(sa.text("DELETE FROM photo_people WHERE person_id IS NULL"))
+
+    with op.batch_alter_table('photo_people', schema=None) as batch_op:
+        batch_op.alter_column('person_id',
+               existing_type=sa.Integer(),
+               nullable=False)
@@ -79,6 +79,26 @@ def create_app(config_class=None):
     migrate.init_app(app, db)
     csrf.init_app(app)
     
+    # Keep full-text search documents in step with their source rows
+    from photovault.services.search_service import search_service
+    search_service.init_app(app)
+    
+    # Expire cached vault access when shares and memberships change
+    from photovault.services.vault_acl_service import vault_acl
+    vault_acl.init_app(app)
+    
+    # Fan vault events out to the members' activity timelines
+    from photovault.services.vault_activity_service import vault_activity
+    vault_activity.init_app(app)
+    
+    # Wake the background email sender when queued mail is committed
+    from photovault.services.email_outbox_service import email_outbox
+    email_outbox.init_app(app)
+    
+    # Drop cached map tiles when photo positions change
+    from photovault.services.geo_search_service import geo_search
+    geo_search.init_app(app)
+    
     # Login manager configuration
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
@@ -101,6 +121,8 @@ def create_app(config_class=None):
     from photovault.routes.gallery import gallery_bp
     from photovault.routes.family import family_bp
     from photovault.routes.smart_tagging import smart_tagging_bp
+    from photovault.routes.map import map_bp
+    from photovault.routes.search import search_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
@@ -113,6 +135,12 @@ def create_app(config_class=None):
     app.register_blueprint(gallery_bp)
     app.register_blueprint(family_bp)
     app.register_blueprint(smart_tagging_bp)
+    app.register_blueprint(map_bp)
+    app.register_blueprint(search_bp)
+    
+    # Register CLI commands
+    from photovault.cli import photovault_cli
+    app.cli.add_command(photovault_cli)
     
     # Note: Upload file serving is handled securely via gallery.uploaded_file route with authentication
     
@@ -0,0 +1,161 @@
+"""
+PhotoVault CLI Commands
+Copyright (c) 2025 Calmic Sdn Bhd. All rights reserved.
+
+Maintenance commands registered under `flask photovault ...`
+"""
+# photovault/cli.py
+
+import click
+from flask.cli import AppGroup
+
+photovault_cli = AppGroup('photovault', help='PhotoVault maintenance commands.')
+
+@photovault_cli.command('detect-faces')
+@click.option('--user-id', type=int, default=None, help='Only scan photos owned by this user.')
+@click.option('--workers', type=int, default=None, help='Detection processes (defaults to FACE_DETECTION_WORKERS or one per CPU).')
+@click.option('--batch-size', type=int, default=None, help='Photos per worker task.')
+@click.option('--rescan', is_flag=True, help='Also scan photos that already have face detections.')
+def detect_faces_command(user_id, workers, batch_size, rescan):
+    """Detect faces across the photo library using a process pool"""
+    from flask import current_app
+    from photovault.services.face_detection_pool import FaceDetectionPool
+    
+    pool = FaceDetectionPool(
+        processes=workers or current_app.config.get('FACE_DETECTION_WORKERS'),
+        batch_size=batch_size or current_app.config.get('FACE_DETECTION_BATCH_SIZE', 8),
+        max_dimension=current_app.config.get('FACE_DETECTION_MAX_DIMENSION')
+    )
+    try:
+        click.echo(f"Scanning faces with {pool.processes} workers...")
+        results = pool.scan_photos(user_id=user_id, only_unprocessed=not rescan)
+    finally:
+        pool.close()
+    
+    click.echo(f"Processed {results['processed']} photos ({results['cached']} from cache), "
+               f"found {results['faces_found']} faces")
+    for error in results['errors']:
+        click.echo(f"  {error}", err=True)
+
+@photovault_cli.command('cluster-faces')
+@click.option('--user-id', type=int, default=None, help='Only cluster faces of this user.')
+def cluster_faces_command(user_id):
+    """Group similar unassigned faces into tagging suggestions"""
+    from photovault.models import User
+    from photovault.services.face_clustering_service import face_clustering_service
+    
+    user_ids = [user_id] if user_id else [uid for (uid,) in User.query.with_entities(User.id).order_by(User.id)]
+    for uid in user_ids:
+        summary = face_clustering_service.cluster_unknown_faces(uid)
+        if summary['faces']:
+            click.echo(f"User {uid}: {summary['clusters']} clusters from {summary['faces']} unassigned faces")
+
+@photovault_cli.command('prune-detection-cache')
+@click.option('--all', 'clear_all', is_flag=True, help='Delete every cached detection, not only stale versions.')
+def prune_detection_cache_command(clear_all):
+    """Delete cached detections made with an outdated detector configuration"""
+    from photovault.extensions import db
+    from photovault.models import DetectionCache
+    from photovault.services.detection_cache_service import detection_cache
+    from photovault.services.face_detection_service import get_face_cache_key
+    from photovault.utils.photo_detection import photo_detector
+    
+    if clear_all:
+        deleted = DetectionCache.query.delete(synchronize_session=False)
+        db.session.commit()
+    else:
+        deleted = detection_cache.invalidate_stale(get_face_cache_key())
+        deleted += detection_cache.invalidate_stale(f"photos:{photo_detector.get_version_key()}")
+    click.echo(f"Deleted {deleted} cached detections")
+
+@photovault_cli.command('prune-enhancement-cache')
+@click.option('--all', 'clear_all', is_flag=True, help='Delete every cached render, not only those over the size budget.')
+def prune_enhancement_cache_command(clear_all):
+    """Trim cached enhancement renders to ENHANCEMENT_CACHE_MAX_MB, least recently used first"""
+    from photovault.utils.enhancement_cache import enhancement_cache
+    
+    deleted = enhancement_cache.evict(max_bytes=0 if clear_all else None)
+    click.echo(f"Deleted {deleted} cached enhancement renders")
+
+@photovault_cli.command('sweep-detection-sessions')
+def sweep_detection_sessions_command():
+    """Delete expired photo detection sessions and their uploaded files"""
+    from photovault.services.detection_session_service import detection_sessions
+    
+    removed = detection_sessions.sweep_expired()
+    click.echo(f"Removed {removed} expired detection sessions")
+
+@photovault_cli.command('backfill-metadata')
+@click.option('--chunk-size', type=int, default=1000, show_default=True, help='Photos per keyset chunk and bulk update.')
+@click.option('--workers', type=int, default=None, help='Extraction processes (defaults to one per CPU).')
+@click.option('--restart', is_flag=True, help='Start over from the first photo instead of the last checkpoint.')
+def backfill_metadata_command(chunk_size, workers, restart):
+    """Extract EXIF date, camera and GPS fields for existing photos, resuming from the last checkpoint"""
+    from photovault.services.metadata_backfill_service import MetadataBackfillService
+    
+    service = MetadataBackfillService(chunk_size=chunk_size, processes=workers)
+    checkpoint = service.get_checkpoint(restart)
+    click.echo(f"Backfilling metadata for photos after ID {checkpoint.last_photo_id}...")
+    
+    def report(checkpoint):
+        click.echo(f"  up to photo {checkpoint.last_photo_id}: {checkpoint.processed} read, {checkpoint.updated} updated")
+    
+    checkpoint = service.run(progress=report)
+    click.echo(f"Done: {checkpoint.processed} photos read, {checkpoint.updated} updated")
+    failed_ids = service.get_failed_ids(checkpoint)
+    if failed_ids:
+        click.echo(f"{len(failed_ids)} photos could not be read and will be retried by the next run", err=True)
+
+@photovault_cli.command('rebuild-search-index')
+@click.option('--chunk-size', type=int, default=1000, show_default=True, help='Rows indexed per committed chunk.')
+def rebuild_search_index_command(chunk_size):
+    """Rebuild the full-text search documents of every photo, person, story and voice memo"""
+    from photovault.services.search_service import search_service
+    
+    click.echo("Rebuilding search index...")
+    counts = search_service.rebuild(chunk_size=chunk_size)
+    click.echo("Indexed " + ", ".join(f"{count} {doc_type} documents" for doc_type, count in counts.items()))
+
+@photovault_cli.command('rebuild-activity')
+@click.option('--vault-id', type=int, default=None, help='Only rebuild the timelines of this vault.')
+def rebuild_activity_command(vault_id):
+    """Rebuild the family activity timelines from current vault photos, stories and members"""
+    from photovault.services.vault_activity_service import vault_activity
+    
+    click.echo("Rebuilding family activity...")
+    counts = vault_activity.rebuild(vault_id=vault_id)
+    click.echo(f"Wrote {counts['entries']} timeline entries for {counts['vaults']} vaults")
+
+@photovault_cli.command('send-email')
+@click.option('--once', is_flag=True, help='Deliver the messages due now and exit instead of polling.')
+def send_email_command(once):
+    """Deliver queued email from the outbox, for a dedicated sender process or to drain the queue"""
+    from photovault.services.email_outbox_service import email_outbox
+    
+    click.echo("Delivering queued email..." if once else "Delivering queued email (Ctrl+C to stop)...")
+    email_outbox.run(once=once)
+
+@photovault_cli.command('split-scans')
+@click.argument('folder', type=click.Path(exists=True, file_okay=False))
+@click.option('--user-id', type=int, required=True, help='Owner of the extracted photos.')
+@click.option('--workers', type=int, default=None, help='Detection processes (defaults to SCAN_SPLIT_WORKERS or one per CPU).')
+def split_scans_command(folder, user_id, workers):
+    """Split every scan in a folder into individual photos"""
+    import os
+    from photovault.services.scan_split_service import ScanSplitService
+    
+    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp'}
+    scans = [(os.path.abspath(os.path.join(folder, name)), name) for name in sorted(os.listdir(folder))
+             if os.path.splitext(name)[1].lower() in image_extensions]
+    if not scans:
+        click.echo(f"No scans found in {folder}")
+        return
+    
+    service = ScanSplitService(processes=workers)
+    job = service.create_job(user_id, scans)
+    click.echo(f"Splitting {len(scans)} scans (job {job.id})...")
+    job = service.run_job(job.id)
+    
+    click.echo(f"Job {job.id} {job.status}: {job.processed_scans} scans, {job.photos_created} photos created")
+    for item in job.items.filter_by(status='failed'):
+        click.echo(f"  {item.original_filename}: {item.error}", err=True)
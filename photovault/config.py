@@ -44,6 +44,32 @@ class Config:
     CAMERA_QUALITY = 0.85  # JPEG quality for camera captures
     MAX_IMAGE_DIMENSION = 3600  # Maximum width/height for saved images (hardcopy photo size)
     
+    # Face detection runs on a proxy with this long edge (px); 0 uses full resolution
+    FACE_DETECTION_MAX_DIMENSION = int(os.environ.get('FACE_DETECTION_MAX_DIMENSION') or 1024)
+    FACE_DETECTION_WORKERS = int(os.environ.get('FACE_DETECTION_WORKERS') or 0) or None  # None = one per CPU
+    FACE_DETECTION_BATCH_SIZE = int(os.environ.get('FACE_DETECTION_BATCH_SIZE') or 8)  # Photos per worker task
+    
+    # Scan photo detection finds contours on a proxy with this long edge (px); 0 uses full resolution
+    PHOTO_DETECTION_MAX_DIMENSION = int(os.environ.get('PHOTO_DETECTION_MAX_DIMENSION') or 2048)
+    PHOTO_DETECTION_SESSION_TTL = timedelta(hours=1)  # Time to extract after a detection upload
+    PHOTO_DETECTION_SWEEP_INTERVAL = 300  # Seconds between expired detection session sweeps
+    SCAN_SPLIT_WORKERS = int(os.environ.get('SCAN_SPLIT_WORKERS') or 0) or None  # None = one per CPU
+    
+    # Full-resolution enhancement renders run on this many background threads
+    ENHANCEMENT_JOB_WORKERS = int(os.environ.get('ENHANCEMENT_JOB_WORKERS') or 2)
+    ENHANCEMENT_BATCH_WORKERS = int(os.environ.get('ENHANCEMENT_BATCH_WORKERS') or 0) or None  # None = one per CPU
+    ENHANCEMENT_BATCH_MAX_PHOTOS = 500  # Photos accepted per batch enhancement request
+    
+    # Map search limits; clustered tiles are cached on disk for GEO_TILE_CACHE_TTL seconds
+    GEO_SEARCH_MAX_RESULTS = 1000  # Photos returned per bounding box or radius search
+    GEO_SEARCH_MAX_RADIUS_KM = 500
+    
+    # Family vault pages load this many shared photos and stories at a time
+    VAULT_PHOTOS_PER_PAGE = 48
+    VAULT_STORIES_PER_PAGE = 10
+    VAULT_BULK_SHARE_MAX_PHOTOS = 500  # Photos accepted per bulk share or unshare request
+    VAULT_ACTIVITY_PER_PAGE = 20  # Family activity timeline entries per page
+    
     # Session configuration
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
     SESSION_COOKIE_SECURE = True  # Set to True in production with HTTPS
@@ -60,6 +86,15 @@ class Config:
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() in ['true', 'on', '1']
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or os.environ.get('SENDGRID_FROM_EMAIL') or 'noreply@photovault.com'
+    
+    # Email outbox: requests queue mail and a background sender delivers it in batches
+    EMAIL_TRANSPORT = os.environ.get('EMAIL_TRANSPORT')  # 'sendgrid', 'smtp' or 'console'; None picks from the settings above
+    EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE') or 50)
+    EMAIL_OUTBOX_POLL_INTERVAL = float(os.environ.get('EMAIL_OUTBOX_POLL_INTERVAL') or 5)
+    EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS') or 8)
+    EMAIL_OUTBOX_RETRY_BASE = int(os.environ.get('EMAIL_OUTBOX_RETRY_BASE') or 30)  # Seconds, doubled per failed attempt
+    EMAIL_OUTBOX_RATE_LIMIT = float(os.environ.get('EMAIL_OUTBOX_RATE_LIMIT') or 10)  # Messages per second per sender
     
     @staticmethod
     def init_app(app):
@@ -5,6 +5,7 @@ Complete models for User, Photo, Album, Person, and PhotoPerson management
 from datetime import datetime, timedelta
 import secrets
 from flask_login import UserMixin
+from sqlalchemy import DDL, event
 from werkzeug.security import generate_password_hash, check_password_hash
 from photovault.extensions import db
 
@@ -85,6 +86,11 @@ class Person(db.Model):
 
 class Photo(db.Model):
     """Photo model for storing photo information"""
+    __table_args__ = (
+        # Map searches: per-user cell prefix scans and latitude/longitude range scans
+        db.Index('ix_photo_user_geohash', 'user_id', 'geohash'),
+        db.Index('ix_photo_user_gps', 'user_id', 'gps_latitude', 'gps_longitude'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     original_name = db.Column(db.String(255), nullable=False)
@@ -122,6 +128,21 @@ class Photo(db.Model):
     processing_notes = db.Column(db.Text)
     edited_filename = db.Column(db.String(255))  # Stores the filename of the edited image
     
+    # EXIF metadata (columns added by migration 4d9b1047e585)
+    camera_make = db.Column(db.String(100))
+    camera_model = db.Column(db.String(100))
+    iso = db.Column(db.Integer)
+    aperture = db.Column(db.Float)            # f-stop value
+    shutter_speed = db.Column(db.String(50))  # Exposure time, e.g. "1/125"
+    focal_length = db.Column(db.Float)        # mm
+    flash_used = db.Column(db.Boolean)
+    gps_latitude = db.Column(db.Float)        # Decimal degrees
+    gps_longitude = db.Column(db.Float)       # Decimal degrees
+    gps_altitude = db.Column(db.Float)        # Meters
+    geohash = db.Column(db.String(12))        # Grid cell of the GPS position; prefixes are enclosing cells
+    orientation = db.Column(db.Integer)       # EXIF orientation value
+    color_space = db.Column(db.String(50))
+    
     # Front/back pairing for photos with writing on back
     paired_photo_id = db.Column(db.Integer, db.ForeignKey('photo.id'))
     is_back_side = db.Column(db.Boolean, nullable=False, default=False)
@@ -156,7 +177,7 @@ class PhotoPerson(db.Model):
     __tablename__ = 'photo_people'
     id = db.Column(db.Integer, primary_key=True)
     photo_id = db.Column(db.Integer, db.ForeignKey('photo.id'), nullable=False)
-    person_id = db.Column(db.Integer, db.ForeignKey('person.id'), nullable=False)
+    person_id = db.Column(db.Integer, db.ForeignKey('person.id'), nullable=True)  # None until the face is identified
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Face detection metadata
@@ -168,6 +189,8 @@ class PhotoPerson(db.Model):
     manually_tagged = db.Column(db.Boolean, nullable=False, default=False)  # True if manually tagged vs auto-detected
     verified = db.Column(db.Boolean, nullable=False, default=False)  # True if user verified the detection
     notes = db.Column(db.String(255))  # Optional notes about the identification
+    face_encoding = db.Column(db.LargeBinary)  # float32 face encoding used for recognition and clustering
+    cluster_id = db.Column(db.Integer, index=True)  # Group of similar unassigned faces, None if not clustered
     
     # Relationships
     photo = db.relationship('Photo', back_populates='photo_people_records', overlaps="people,photos")
@@ -176,9 +199,249 @@ class PhotoPerson(db.Model):
     # Ensure unique photo-person combinations
     __table_args__ = (db.UniqueConstraint('photo_id', 'person_id', name='unique_photo_person'),)
     
+    @property
+    def bounding_box(self):
+        """Return the face bounding box as a dict, or None if not recorded"""
+        if None in (self.face_box_x, self.face_box_y, self.face_box_width, self.face_box_height):
+            return None
+        return {
+            'x': self.face_box_x,
+            'y': self.face_box_y,
+            'width': self.face_box_width,
+            'height': self.face_box_height
+        }
+    
     def __repr__(self):
         return f'<PhotoPerson {self.photo_id}-{self.person_id}>'
 
+class PhotoTag(db.Model):
+    """AI-detected object tag of a photo, one row per tag and detection model"""
+    __tablename__ = 'photo_tags'
+    __table_args__ = (
+        db.UniqueConstraint('photo_id', 'tag', 'source', name='uq_photo_tags_photo_tag_source'),
+        # Tag browsing and facet counts are answered from this index alone
+        db.Index('ix_photo_tags_user_tag_confidence', 'user_id', 'tag', 'confidence'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    photo_id = db.Column(db.Integer, db.ForeignKey('photo.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # Photo owner, denormalized for the index
+    tag = db.Column(db.String(100), nullable=False)       # Lowercased label, e.g. "dog"
+    confidence = db.Column(db.Float, nullable=False)      # Best detection score of the tag in the photo
+    instances = db.Column(db.Integer, nullable=False, default=1)  # Detections of the tag in the photo
+    boxes = db.Column(db.Text)                            # JSON list of [x, y, width, height] per detection
+    source = db.Column(db.String(50), nullable=False)     # Detection model, e.g. "COCO-SSD"
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    photo = db.relationship('Photo', backref=db.backref('ai_tags', lazy='dynamic', cascade='all, delete-orphan'))
+    
+    def __repr__(self):
+        return f'<PhotoTag {self.tag} on Photo {self.photo_id}>'
+
+class PhotoAnalysis(db.Model):
+    """AI analysis of a photo, one row per kind ('poses', 'composition', 'face_landmarks')"""
+    __tablename__ = 'photo_analyses'
+    __table_args__ = (db.UniqueConstraint('photo_id', 'kind', name='uq_photo_analyses_photo_kind'),)
+    id = db.Column(db.Integer, primary_key=True)
+    photo_id = db.Column(db.Integer, db.ForeignKey('photo.id', ondelete='CASCADE'), nullable=False)
+    kind = db.Column(db.String(30), nullable=False)
+    data = db.Column(db.Text, nullable=False)  # JSON result of the analysis
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    photo = db.relationship('Photo', backref=db.backref('ai_analyses', lazy='dynamic', cascade='all, delete-orphan'))
+    
+    def __repr__(self):
+        return f'<PhotoAnalysis {self.kind} of Photo {self.photo_id}>'
+
+class BackfillCheckpoint(db.Model):
+    """Progress of a resumable backfill over the photo table, by last processed photo ID"""
+    __tablename__ = 'backfill_checkpoints'
+    name = db.Column(db.String(50), primary_key=True)
+    last_photo_id = db.Column(db.Integer, nullable=False, default=0)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.Integer, nullable=False, default=0)
+    failed_photo_ids = db.Column(db.Text)  # JSON list of photos behind the checkpoint to retry on the next run
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<BackfillCheckpoint {self.name} {self.last_photo_id}>'
+
+class DetectionCache(db.Model):
+    """Cached detector output keyed by image content hash and detector version"""
+    __tablename__ = 'detection_cache'
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the image file bytes
+    detector_key = db.Column(db.String(100), nullable=False, index=True)  # e.g. "faces:opencv-<params digest>"
+    results = db.Column(db.Text, nullable=False)  # JSON detector output
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # One entry per image content and detector configuration
+    __table_args__ = (db.UniqueConstraint('content_hash', 'detector_key', name='unique_detection_cache_entry'),)
+    
+    def __repr__(self):
+        return f'<DetectionCache {self.detector_key} {self.content_hash[:8]}>'
+
+class DetectionSession(db.Model):
+    """Photo detection upload awaiting extraction, shared by all app workers"""
+    __tablename__ = 'detection_sessions'
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(36), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)
+    original_filename = db.Column(db.String(255))
+    detected_photos = db.Column(db.Text, nullable=False)  # JSON list of detected regions
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def is_expired(self):
+        """Check if the session has passed its expiry time"""
+        return datetime.utcnow() > self.expires_at
+    
+    def __repr__(self):
+        return f'<DetectionSession {self.token[:8]}...>'
+
+class ScanSplitJob(db.Model):
+    """Batch job that detects and extracts the photos of many flatbed scans"""
+    __tablename__ = 'scan_split_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    total_scans = db.Column(db.Integer, nullable=False, default=0)
+    processed_scans = db.Column(db.Integer, nullable=False, default=0)
+    photos_created = db.Column(db.Integer, nullable=False, default=0)
+    delete_scans = db.Column(db.Boolean, nullable=False, default=False)  # Remove the uploaded scans when the job ends
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    
+    # Relationships
+    items = db.relationship('ScanSplitItem', backref='job', lazy='dynamic', cascade='all, delete-orphan')
+    
+    def __repr__(self):
+        return f'<ScanSplitJob {self.id} {self.status}>'
+
+class ScanSplitItem(db.Model):
+    """One scan of a scan split job and its outcome"""
+    __tablename__ = 'scan_split_items'
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('scan_split_jobs.id'), nullable=False, index=True)
+    file_path = db.Column(db.String(500), nullable=False)
+    original_filename = db.Column(db.String(255))
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, completed, failed
+    photos_created = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    processed_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<ScanSplitItem {self.id} {self.status}>'
+
+class EnhancementJob(db.Model):
+    """Full-resolution enhancement render of a photo, run in the background on save"""
+    __tablename__ = 'enhancement_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    photo_id = db.Column(db.Integer, db.ForeignKey('photo.id', ondelete='CASCADE'), nullable=False, index=True)
+    batch_id = db.Column(db.Integer, db.ForeignKey('enhancement_batches.id'), index=True)  # Set for batch renders
+    settings = db.Column(db.Text)  # JSON enhancement settings
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    enhanced_filename = db.Column(db.String(255))
+    thumbnail_filename = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    
+    # Jobs go with their photo
+    photo = db.relationship('Photo', backref=db.backref('enhancement_jobs', lazy='dynamic', cascade='all, delete-orphan'))
+    
+    def __repr__(self):
+        return f'<EnhancementJob {self.id} {self.status}>'
+
+class EnhancementBatch(db.Model):
+    """One enhancement preset applied to many photos across a worker pool"""
+    __tablename__ = 'enhancement_batches'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    settings = db.Column(db.Text)  # JSON enhancement settings
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    total_photos = db.Column(db.Integer, nullable=False, default=0)
+    processed_photos = db.Column(db.Integer, nullable=False, default=0)
+    failed_photos = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    
+    # Relationships
+    jobs = db.relationship('EnhancementJob', backref='batch', lazy='dynamic')
+    
+    def __repr__(self):
+        return f'<EnhancementBatch {self.id} {self.status}>'
+
+class FaceScanJob(db.Model):
+    """Face detection over many of a user's photos, run in the background on the shared detection pool"""
+    __tablename__ = 'face_scan_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    photo_ids = db.Column(db.Text)  # JSON list of requested photos; empty scans every photo without faces
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    total_photos = db.Column(db.Integer, nullable=False, default=0)
+    processed_photos = db.Column(db.Integer, nullable=False, default=0)
+    failed_photos = db.Column(db.Integer, nullable=False, default=0)
+    cached_photos = db.Column(db.Integer, nullable=False, default=0)
+    faces_found = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text)  # JSON list of the first per-photo errors
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<FaceScanJob {self.id} {self.status}>'
+
+class AclVersion(db.Model):
+    """Version token of a user's vault access; changes whenever their memberships or vault shares change"""
+    __tablename__ = 'acl_versions'
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # No foreign key: written after the source rows are flushed
+    version = db.Column(db.String(32), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AclVersion {self.user_id} {self.version}>'
+
+class EmailOutbox(db.Model):
+    """Queued email, delivered outside the request by the background outbox sender"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        # Senders claim due messages in order from this index
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), nullable=False)  # 'family_invitation', 'password_reset'
+    reference_id = db.Column(db.Integer)  # Row the email is about, e.g. the VaultInvitation
+    to_email = db.Column(db.String(255), nullable=False)
+    from_email = db.Column(db.String(255))  # None uses the transport's default sender
+    subject = db.Column(db.String(255), nullable=False)
+    html_content = db.Column(db.Text)
+    text_content = db.Column(db.Text)
+    
+    # Delivery state
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'sending', 'sent', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(32))   # Claim token of the sender delivering it
+    locked_until = db.Column(db.DateTime)   # After this a crashed sender's claim is taken over
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<EmailOutbox {self.id} {self.category} {self.status}>'
+
 class PasswordResetToken(db.Model):
     """Password reset token model for secure password resets"""
     id = db.Column(db.Integer, primary_key=True)
@@ -291,12 +554,13 @@ class FamilyVault(db.Model):
     
     def get_member_role(self, user_id):
         """Get the role of a user in this vault"""
-        member = self.members.filter_by(user_id=user_id, status='active').first()
-        return member.role if member else None
+        from photovault.services.vault_acl_service import vault_acl
+        return vault_acl.get(user_id).roles.get(self.id)
     
     def has_member(self, user_id):
         """Check if user is an active member of this vault"""
-        return self.members.filter_by(user_id=user_id, status='active').first() is not None
+        from photovault.services.vault_acl_service import vault_acl
+        return self.id in vault_acl.get(user_id).roles
     
     def __repr__(self):
         return f'<FamilyVault {self.name}>'
@@ -396,6 +660,12 @@ class VaultInvitation(db.Model):
 
 class VaultPhoto(db.Model):
     """Association model for photos shared in family vaults"""
+    __table_args__ = (
+        # A photo is shared to a vault once; bulk shares skip existing rows on this constraint
+        db.UniqueConstraint('vault_id', 'photo_id', name='uq_vault_photo_vault_photo'),
+        # Keyset pages of a vault's photos, newest first
+        db.Index('ix_vault_photo_vault_shared', 'vault_id', 'shared_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     vault_id = db.Column(db.Integer, db.ForeignKey('family_vault.id'), nullable=False)
     photo_id = db.Column(db.Integer, db.ForeignKey('photo.id'), nullable=False)
@@ -412,6 +682,10 @@ class VaultPhoto(db.Model):
 
 class Story(db.Model):
     """Story model for family narratives and memories"""
+    __table_args__ = (
+        # Keyset pages of a vault's published stories, newest first
+        db.Index('ix_story_vault_published_created', 'vault_id', 'is_published', 'created_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     vault_id = db.Column(db.Integer, db.ForeignKey('family_vault.id'), nullable=False)
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -463,3 +737,74 @@ class StoryPerson(db.Model):
     
     def __repr__(self):
         return f'<StoryPerson {self.person.name if self.person else "Unknown"} in Story {self.story_id}>'
+
+class VaultActivity(db.Model):
+    """One entry of a user's family activity timeline, written for every member when something happens in a vault"""
+    __tablename__ = 'vault_activity'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'activity_type', 'subject_id', name='uq_vault_activity_user_subject'),
+        # Timeline pages of one user, newest first
+        db.Index('ix_vault_activity_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_vault_activity_subject', 'activity_type', 'subject_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    
+    # Plain integers because entries are fanned out after their source rows are flushed or deleted
+    user_id = db.Column(db.Integer, nullable=False)        # Member whose timeline this is
+    vault_id = db.Column(db.Integer, nullable=False, index=True)
+    actor_id = db.Column(db.Integer)                       # User who shared, published or joined
+    activity_type = db.Column(db.String(20), nullable=False)  # 'photo_shared', 'story_published', 'member_joined'
+    subject_id = db.Column(db.Integer, nullable=False)     # VaultPhoto, Story or FamilyMember ID
+    photo_id = db.Column(db.Integer, index=True)           # Shared photo, for thumbnails
+    summary = db.Column(db.String(255))                    # Photo name, story title or member username
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<VaultActivity {self.activity_type} {self.subject_id} for user {self.user_id}>'
+
+class SearchDocument(db.Model):
+    """Searchable text of a photo, person, story or voice memo, indexed by the database's full-text engine"""
+    __tablename__ = 'search_documents'
+    __table_args__ = (db.UniqueConstraint('doc_type', 'doc_id', name='uq_search_documents_doc'),)
+    id = db.Column(db.Integer, primary_key=True)
+    doc_type = db.Column(db.String(20), nullable=False)  # 'photo', 'person', 'story', 'voice_memo'
+    doc_id = db.Column(db.Integer, nullable=False)
+    
+    # Access scope; plain integers because documents are written after their source rows are flushed or deleted
+    user_id = db.Column(db.Integer, nullable=False, index=True)   # Owner or author
+    vault_id = db.Column(db.Integer, index=True)                  # Vault of a published story
+    photo_id = db.Column(db.Integer, index=True)                  # Photo the document belongs to, for vault shares
+    
+    title = db.Column(db.Text)
+    body = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SearchDocument {self.doc_type} {self.doc_id}>'
+
+# Full-text structures of search_documents; Alembic migration 5e8a2d47c913 creates the same objects
+SEARCH_POSTGRESQL_DDL = (
+    "ALTER TABLE search_documents ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED",
+    "CREATE INDEX ix_search_documents_vector ON search_documents USING GIN (search_vector)",
+)
+SEARCH_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_documents_fts USING fts5("
+    "title, body, content='search_documents', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(search_documents_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(search_documents_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO search_documents_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+)
+
+# Tables built with db.create_all() get the full-text structures too
+for _statement in SEARCH_POSTGRESQL_DDL:
+    event.listen(SearchDocument.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+for _statement in SEARCH_SQLITE_DDL:
+    event.listen(SearchDocument.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
@@ -380,28 +380,17 @@ def reset_password(token):
     return render_template('auth/reset_password.html', token=token, user=reset_token.user)
 
 def send_password_reset_email(user, token):
-    """Send password reset email to user using SendGrid service"""
+    """Queue a password reset email in the outbox; it is delivered in the background"""
     try:
-        # Import SendGrid service
-        from photovault.services.sendgrid_service import send_password_reset_email as sendgrid_reset_email
+        from photovault.services.email_outbox_service import queue_password_reset_email
         
-        # Try SendGrid first
-        if sendgrid_reset_email(user, token):
-            current_app.logger.info(f"Password reset email sent successfully to {user.email} via SendGrid")
-        else:
-            # Log failure but proceed with fallback
-            current_app.logger.error(f"SendGrid failed to send password reset email to {user.email}")
-            
-            # Fallback to console logging in development only
-            if current_app.debug:
-                reset_url = url_for('auth.reset_password', token=token, _external=True)
-                print(f"EMAIL TO {user.email}: Password reset link: {reset_url}")
-                current_app.logger.info(f"Used console fallback for password reset to {user.email}")
-        
-        # Always return True to prevent email enumeration attacks
-        return True
+        queue_password_reset_email(user, token)
+        db.session.commit()
+        current_app.logger.info(f"Password reset email queued for {user.email}")
         
     except Exception as e:
-        current_app.logger.error(f"Failed to send reset email: {str(e)}")
-        # Still return True to avoid revealing whether email exists or not
-        return True
\ No newline at end of file
+        db.session.rollback()
+        current_app.logger.error(f"Failed to queue reset email: {str(e)}")
+    
+    # Always return True to prevent email enumeration attacks
+    return True
\ No newline at end of file
@@ -16,33 +16,21 @@ from photovault.forms import (
     get_invitation_expiry, validate_vault_code, validate_photo_caption
 )
 from photovault.services.montage_service import create_montage
+from photovault.services.vault_feed_service import vault_feed
+from photovault.services.vault_share_service import vault_share
 from photovault.utils.enhanced_file_handler import delete_file_enhanced
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def send_invitation_email(email, invitation_token, vault_name, inviter_name):
-    """Send family vault invitation email using SendGrid service"""
+def send_invitation_email(invitation, vault_name, inviter_name):
+    """Queue the invitation email in the outbox; it is delivered in the background after commit"""
     try:
-        # Import SendGrid service
-        from photovault.services.sendgrid_service import send_family_invitation_email
-        
-        # Try SendGrid first
-        if send_family_invitation_email(email, invitation_token, vault_name, inviter_name):
-            return True
-        
-        # Fallback to console logging in development if SendGrid fails
-        if current_app.debug:
-            invitation_url = url_for('family.accept_invitation', token=invitation_token, _external=True)
-            print(f"EMAIL TO {email}: Family vault invitation link: {invitation_url}")
-            current_app.logger.info(f"SendGrid failed, used console fallback for invitation to {email}")
-            return True
-        else:
-            current_app.logger.error(f"Failed to send invitation email to {email} via SendGrid")
-            return False
-            
+        from photovault.services.email_outbox_service import queue_family_invitation_email
+        queue_family_invitation_email(invitation, vault_name, inviter_name)
+        return True
     except Exception as e:
-        logger.error(f"Exception while sending invitation email to {email}: {str(e)}")
+        logger.error(f"Exception while queueing invitation email to {invitation.email}: {str(e)}")
         return False
 
 # Create blueprint
@@ -65,10 +53,60 @@ def index():
         status='pending'
     ).all()
     
+    # Recent activity across all vaults comes precomputed from the user's timeline
+    try:
+        activities, next_activity_cursor = vault_feed.activity_page(
+            current_user.id, request.args.get('activity_after'), current_app.config.get('VAULT_ACTIVITY_PER_PAGE', 20)
+        )
+    except ValueError:
+        abort(400)
+    
     return render_template('family/index.html',
                          created_vaults=created_vaults,
                          member_vaults=member_vaults,
-                         pending_invitations=pending_invitations)
+                         pending_invitations=pending_invitations,
+                         activities=activities,
+                         activity_thumbnails={row.VaultActivity.id: _activity_thumbnail_url(row) for row in activities},
+                         next_activity_cursor=next_activity_cursor)
+
+@family_bp.route('/api/activity', methods=['GET'])
+@login_required
+def activity_feed():
+    """JSON feed of new photos, stories and members across the current user's vaults, paginated by cursor"""
+    try:
+        limit = max(1, min(request.args.get('limit', current_app.config.get('VAULT_ACTIVITY_PER_PAGE', 20), type=int), 100))
+        activities, next_cursor = vault_feed.activity_page(current_user.id, request.args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'success': True,
+        'activity': [{
+            'id': row.VaultActivity.id,
+            'type': row.VaultActivity.activity_type,
+            'vault_id': row.VaultActivity.vault_id,
+            'vault_name': row.vault_name,
+            'actor': row.actor_name,
+            'summary': row.VaultActivity.summary,
+            'created_at': row.VaultActivity.created_at.isoformat() if row.VaultActivity.created_at else None,
+            'thumbnail_url': _activity_thumbnail_url(row),
+            'url': _activity_url(row.VaultActivity)
+        } for row in activities],
+        'next_cursor': next_cursor
+    })
+
+def _activity_thumbnail_url(row):
+    """Thumbnail of an activity entry's photo, served by its owner's ACL-checked file route"""
+    if row.photo_owner_id is None:
+        return None
+    filename = os.path.basename(row.photo_thumbnail_path) if row.photo_thumbnail_path else row.photo_filename
+    return url_for('gallery.uploaded_file', user_id=row.photo_owner_id, filename=filename)
+
+def _activity_url(activity):
+    """Page an activity entry links to"""
+    if activity.activity_type == 'story_published':
+        return url_for('family.view_story', story_id=activity.subject_id)
+    return url_for('family.view_vault', vault_id=activity.vault_id)
 
 @family_bp.route('/create', methods=['GET', 'POST'])
 @login_required
@@ -138,14 +176,20 @@ def view_vault(vault_id):
         flash('You do not have access to this vault.', 'error')
         return redirect(url_for('family.index'))
     
-    # Get vault photos
-    vault_photos = VaultPhoto.query.filter_by(vault_id=vault_id).order_by(VaultPhoto.shared_at.desc()).all()
-    
-    # Get vault stories
-    stories = Story.query.filter_by(vault_id=vault_id, is_published=True).order_by(Story.created_at.desc()).all()
+    # Get one page of vault photos and stories, with their photos and people eager-loaded
+    try:
+        vault_photos, next_photos_cursor = vault_feed.photo_page(
+            vault_id, request.args.get('photos_after'), current_app.config.get('VAULT_PHOTOS_PER_PAGE', 48)
+        )
+        stories, next_stories_cursor = vault_feed.story_page(
+            vault_id, request.args.get('stories_after'), current_app.config.get('VAULT_STORIES_PER_PAGE', 10)
+        )
+    except ValueError:
+        abort(400)
+    counts = vault_feed.counts(vault_id)
     
     # Get vault members
-    members = FamilyMember.query.filter_by(vault_id=vault_id, status='active').all()
+    members = vault_feed.members(vault_id)
     
     # Get pending invitations (only for admins and vault creator)
     user_role = vault.get_member_role(current_user.id)
@@ -157,10 +201,69 @@ def view_vault(vault_id):
                          vault=vault,
                          vault_photos=vault_photos,
                          stories=stories,
+                         counts=counts,
+                         next_photos_cursor=next_photos_cursor,
+                         next_stories_cursor=next_stories_cursor,
                          members=members,
                          user_role=user_role,
                          pending_invitations=pending_invitations)
 
+@family_bp.route('/api/vaults/<int:vault_id>/photos', methods=['GET'])
+@login_required
+def vault_photos_feed(vault_id):
+    """JSON feed of a vault's shared photos, newest first, paginated by cursor"""
+    vault = FamilyVault.query.get_or_404(vault_id)
+    if not vault.has_member(current_user.id) and vault.created_by != current_user.id:
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    try:
+        limit = max(1, min(request.args.get('limit', current_app.config.get('VAULT_PHOTOS_PER_PAGE', 48), type=int), 100))
+        vault_photos, next_cursor = vault_feed.photo_page(vault_id, request.args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'success': True,
+        'photos': [{
+            'id': vault_photo.id,
+            'photo_id': vault_photo.photo_id,
+            'caption': vault_photo.caption,
+            'shared_at': vault_photo.shared_at.isoformat() if vault_photo.shared_at else None,
+            'shared_by': vault_photo.sharer.username if vault_photo.sharer else None,
+            'original_name': vault_photo.photo.original_name,
+            'url': url_for('gallery.uploaded_file', user_id=vault_photo.photo.user_id, filename=vault_photo.photo.filename)
+        } for vault_photo in vault_photos],
+        'next_cursor': next_cursor
+    })
+
+@family_bp.route('/api/vaults/<int:vault_id>/stories', methods=['GET'])
+@login_required
+def vault_stories_feed(vault_id):
+    """JSON feed of a vault's published stories, newest first, paginated by cursor"""
+    vault = FamilyVault.query.get_or_404(vault_id)
+    if not vault.has_member(current_user.id) and vault.created_by != current_user.id:
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    try:
+        limit = max(1, min(request.args.get('limit', current_app.config.get('VAULT_STORIES_PER_PAGE', 10), type=int), 50))
+        stories, next_cursor = vault_feed.story_page(vault_id, request.args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'success': True,
+        'stories': [{
+            'id': story.id,
+            'title': story.title,
+            'excerpt': story.content[:200] if story.content else '',
+            'story_type': story.story_type,
+            'author': story.author.username if story.author else None,
+            'created_at': story.created_at.isoformat() if story.created_at else None,
+            'url': url_for('family.view_story', story_id=story.id)
+        } for story in stories],
+        'next_cursor': next_cursor
+    })
+
 @family_bp.route('/vault/<int:vault_id>/invite', methods=['GET', 'POST'])
 @login_required
 def invite_member(vault_id):
@@ -219,16 +322,15 @@ def invite_member(vault_id):
             db.session.add(invitation)
             db.session.commit()
             
-            # Send invitation email
+            # Queue invitation email; the outbox sender delivers it outside the request
             email_sent = send_invitation_email(
-                email=email,
-                invitation_token=invitation.invitation_token,
+                invitation=invitation,
                 vault_name=vault.name,
                 inviter_name=current_user.username
             )
             
             if email_sent:
-                invitation.mark_as_sent()
+                # last_sent_at is set by the outbox once the email is delivered
                 db.session.commit()
                 flash(f'Invitation sent to {email}', 'success')
             else:
@@ -404,6 +506,81 @@ def share_photo(vault_id, photo_id):
         logger.error(f"Failed to share photo: {str(e)}")
         return jsonify({'success': False, 'error': 'Failed to share photo'}), 500
 
+def _requested_ids(key):
+    """De-duplicated integer IDs from a JSON list in the request body"""
+    data = request.get_json(silent=True) or {}
+    values = data.get(key)
+    if not isinstance(values, list):
+        return []
+    return list(dict.fromkeys(value for value in values if isinstance(value, int) and not isinstance(value, bool)))
+
+@family_bp.route('/api/vaults/<int:vault_id>/photos/share', methods=['POST'])
+@login_required
+def bulk_share_photos(vault_id):
+    """Share many of the current user's photos to a vault in one statement"""
+    FamilyVault.query.get_or_404(vault_id)
+    
+    member = FamilyMember.query.filter_by(vault_id=vault_id, user_id=current_user.id, status='active').first()
+    if not member or not member.can_add_content():
+        return jsonify({'success': False, 'error': 'Permission denied'}), 403
+    
+    photo_ids = _requested_ids('photo_ids')
+    if not photo_ids:
+        return jsonify({'success': False, 'error': 'photo_ids must be a non-empty list of photo IDs'}), 400
+    max_photos = current_app.config.get('VAULT_BULK_SHARE_MAX_PHOTOS', 500)
+    if len(photo_ids) > max_photos:
+        return jsonify({'success': False, 'error': f'At most {max_photos} photos can be shared at once'}), 400
+    
+    caption = (request.get_json(silent=True) or {}).get('caption') or ''
+    valid_caption, caption_msg = validate_photo_caption(caption)
+    if not valid_caption:
+        return jsonify({'success': False, 'error': caption_msg}), 400
+    
+    try:
+        shared = vault_share.share_photos(vault_id, current_user.id, photo_ids, caption.strip() or None)
+        db.session.commit()
+        return jsonify({
+            'success': True,
+            'shared': shared,
+            'skipped': len(photo_ids) - shared  # Already in the vault or not owned by the user
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to bulk share photos to vault {vault_id}: {str(e)}")
+        return jsonify({'success': False, 'error': 'Failed to share photos'}), 500
+
+@family_bp.route('/api/vaults/<int:vault_id>/photos/unshare', methods=['POST'])
+@login_required
+def bulk_unshare_photos(vault_id):
+    """Remove many shared photos from a vault in one statement"""
+    vault = FamilyVault.query.get_or_404(vault_id)
+    
+    vault_photo_ids = _requested_ids('vault_photo_ids')
+    if not vault_photo_ids:
+        return jsonify({'success': False, 'error': 'vault_photo_ids must be a non-empty list of vault photo IDs'}), 400
+    max_photos = current_app.config.get('VAULT_BULK_SHARE_MAX_PHOTOS', 500)
+    if len(vault_photo_ids) > max_photos:
+        return jsonify({'success': False, 'error': f'At most {max_photos} photos can be removed at once'}), 400
+    
+    # Vault admins and the creator remove any share; other users only their own
+    can_unshare_any = vault.get_member_role(current_user.id) == 'admin' or vault.created_by == current_user.id
+    
+    try:
+        removed = vault_share.unshare_photos(vault_id, vault_photo_ids,
+                                             shared_by=None if can_unshare_any else current_user.id)
+        db.session.commit()
+        
+        logger.info(f"{removed} photos unshared from vault {vault_id} by user {current_user.id}")
+        return jsonify({
+            'success': True,
+            'removed': removed,
+            'skipped': len(vault_photo_ids) - removed  # Not in the vault or not removable by the user
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to bulk unshare photos from vault {vault_id}: {str(e)}")
+        return jsonify({'success': False, 'error': 'Failed to remove photos from vault'}), 500
+
 @family_bp.route('/join', methods=['GET', 'POST'])
 @login_required
 def join_vault():
@@ -469,37 +646,15 @@ def add_photos(vault_id):
             flash('Please select at least one photo to share.', 'error')
             return redirect(url_for('family.add_photos', vault_id=vault_id))
         
-        shared_count = 0
-        skipped_count = 0
-        
-        for photo_id in photo_ids:
-            try:
-                photo = Photo.query.filter_by(id=int(photo_id), user_id=current_user.id).first()
-                if not photo:
-                    continue
-                
-                # Check if photo is already shared to this vault
-                existing_share = VaultPhoto.query.filter_by(vault_id=vault_id, photo_id=photo_id).first()
-                if existing_share:
-                    skipped_count += 1
-                    continue
-                
-                # Share photo
-                vault_photo = VaultPhoto(
-                    vault_id=vault_id,
-                    photo_id=photo_id,
-                    shared_by=current_user.id,
-                    caption=caption if caption else None
-                )
-                
-                db.session.add(vault_photo)
-                shared_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to share photo {photo_id}: {str(e)}")
-                continue
+        max_photos = current_app.config.get('VAULT_BULK_SHARE_MAX_PHOTOS', 500)
+        if len(photo_ids) > max_photos:
+            flash(f'You can share up to {max_photos} photos at a time.', 'error')
+            return redirect(url_for('family.add_photos', vault_id=vault_id))
         
         try:
+            requested_ids = {int(photo_id) for photo_id in photo_ids if str(photo_id).isdigit()}
+            shared_count = vault_share.share_photos(vault_id, current_user.id, requested_ids, caption or None)
+            skipped_count = len(requested_ids) - shared_count
             db.session.commit()
             
             # Create success message
@@ -558,17 +713,21 @@ def resend_invitation(vault_id, invitation_id):
             flash('Unable to resend invitation at this time.', 'warning')
         return redirect(url_for('family.view_vault', vault_id=vault_id))
     
+    # The previous email must go out before another one is queued
+    from photovault.services.email_outbox_service import email_outbox
+    if email_outbox.has_pending('family_invitation', invitation.id):
+        flash('The invitation email is still being sent. Please try again shortly.', 'warning')
+        return redirect(url_for('family.view_vault', vault_id=vault_id))
+        
     try:
-        # Resend invitation email
+        # Queue invitation email again
         email_sent = send_invitation_email(
-            email=invitation.email,
-            invitation_token=invitation.invitation_token,
+            invitation=invitation,
             vault_name=vault.name,
             inviter_name=current_user.username
         )
         
         if email_sent:
-            invitation.mark_as_sent()
             db.session.commit()
             flash(f'Invitation resent to {invitation.email}', 'success')
         else:
@@ -94,7 +94,6 @@ def delete_photo(photo_id):
     """Delete a photo"""
     try:
         from photovault.models import Photo
-        from photovault import db
         
         photo = Photo.query.filter_by(id=photo_id, user_id=current_user.id).first_or_404()
         
@@ -209,36 +208,16 @@ def uploaded_file(user_id, filename):
     # If not the owner or admin, check if photo is shared in a family vault where user is a member
     if not access_allowed:
         try:
-            from photovault.models import Photo, VaultPhoto, FamilyMember
+            from photovault.services.vault_acl_service import vault_acl
             
-            # Find the photo being requested
-            original_filename = filename
+            # Thumbnails are authorized through the photo they were made from
+            candidates = [filename]
             if filename.endswith('_thumb.jpg') or filename.endswith('_thumb.png') or filename.endswith('_thumb.jpeg'):
                 base_name = filename.rsplit('_thumb.', 1)[0]
-                for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
-                    potential_original = base_name + ext
-                    test_photo = Photo.query.filter_by(user_id=user_id).filter(
-                        (Photo.filename == potential_original) | (Photo.edited_filename == potential_original)
-                    ).first()
-                    if test_photo:
-                        original_filename = potential_original
-                        break
-            
-            # Find the photo record
-            photo = Photo.query.filter_by(user_id=user_id).filter(
-                (Photo.filename == original_filename) | (Photo.edited_filename == original_filename)
-            ).first()
-            
-            if photo:
-                # Check if this photo is shared in any family vault where current user is a member
-                shared_in_vault = db.session.query(VaultPhoto).join(FamilyMember, VaultPhoto.vault_id == FamilyMember.vault_id).filter(
-                    VaultPhoto.photo_id == photo.id,
-                    FamilyMember.user_id == current_user.id,
-                    FamilyMember.status == 'active'
-                ).first()
+                candidates.extend(base_name + ext for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'])
                 
-                if shared_in_vault:
-                    access_allowed = True
+            # Shared photos of the user's vaults are held in memory, so no join per request
+            access_allowed = vault_acl.can_view_file(current_user.id, user_id, candidates)
         except Exception as e:
             # If there's any error in the vault check, deny access for security
             pass
@@ -0,0 +1,107 @@
+"""
+Photo Map Routes for PhotoVault
+Bounding-box and radius search over photo GPS coordinates, plus clustered map tiles
+"""
+
+import logging
+from flask import Blueprint, request, jsonify, current_app
+from flask_login import login_required, current_user
+from photovault.services.geo_search_service import geo_search, MAX_TILE_ZOOM
+from photovault.utils.geohash import precision_for_zoom
+
+logger = logging.getLogger(__name__)
+
+# Create blueprint
+map_bp = Blueprint('map', __name__)
+
+def _parse_bbox(value):
+    """
+    Parse a 'minLon,minLat,maxLon,maxLat' query value
+    
+    Args:
+        value: Query string value
+        
+    Returns:
+        (min_lat, min_lon, max_lat, max_lon) or None if invalid
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in (value or '').split(','))
+    except ValueError:
+        return None
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        return None
+    return min_lat, min_lon, max_lat, max_lon
+
+def _result_limit():
+    max_results = current_app.config.get('GEO_SEARCH_MAX_RESULTS', 1000)
+    return max(1, min(request.args.get('limit', max_results, type=int), max_results))
+
+@map_bp.route('/api/map/photos')
+@login_required
+def map_photos():
+    """List the current user's photos inside a bounding box"""
+    try:
+        bbox = _parse_bbox(request.args.get('bbox'))
+        if bbox is None:
+            return jsonify({'success': False, 'error': 'bbox must be minLon,minLat,maxLon,maxLat'}), 400
+            
+        result = geo_search.search_bbox(current_user.id, bbox, _result_limit())
+        return jsonify({'success': True, **result})
+        
+    except Exception as e:
+        logger.error(f"Error searching photos by bounding box: {str(e)}")
+        return jsonify({'success': False, 'error': 'Failed to search photos'}), 500
+
+@map_bp.route('/api/map/nearby')
+@login_required
+def map_nearby():
+    """List the current user's photos within a radius of a point, nearest first"""
+    try:
+        lat = request.args.get('lat', type=float)
+        lon = request.args.get('lon', type=float)
+        radius_km = request.args.get('radius_km', 1.0, type=float)
+        if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return jsonify({'success': False, 'error': 'Valid lat and lon are required'}), 400
+        if not 0 < radius_km <= current_app.config.get('GEO_SEARCH_MAX_RADIUS_KM', 500):
+            return jsonify({'success': False, 'error': 'radius_km is out of range'}), 400
+            
+        result = geo_search.search_radius(current_user.id, lat, lon, radius_km, _result_limit())
+        return jsonify({'success': True, **result})
+        
+    except Exception as e:
+        logger.error(f"Error searching nearby photos: {str(e)}")
+        return jsonify({'success': False, 'error': 'Failed to search photos'}), 500
+
+@map_bp.route('/api/map/clusters')
+@login_required
+def map_clusters():
+    """Aggregate the current user's photos inside a bounding box per grid cell"""
+    try:
+        bbox = _parse_bbox(request.args.get('bbox'))
+        if bbox is None:
+            return jsonify({'success': False, 'error': 'bbox must be minLon,minLat,maxLon,maxLat'}), 400
+        zoom = max(0, min(request.args.get('zoom', 0, type=int), MAX_TILE_ZOOM))
+        
+        precision = precision_for_zoom(zoom)
+        clusters = geo_search.clusters(current_user.id, bbox, precision)
+        return jsonify({'success': True, 'precision': precision, 'clusters': clusters})
+        
+    except Exception as e:
+        logger.error(f"Error clustering photos: {str(e)}")
+        return jsonify({'success': False, 'error': 'Failed to cluster photos'}), 500
+
+@map_bp.route('/api/map/tiles/<int:z>/<int:x>/<int:y>.json')
+@login_required
+def map_tile(z, x, y):
+    """Get the photo clusters of a slippy map tile"""
+    try:
+        if z > MAX_TILE_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return jsonify({'success': False, 'error': 'Tile out of range'}), 404
+            
+        response = jsonify({'success': True, **geo_search.tile(current_user.id, z, x, y)})
+        response.headers['Cache-Control'] = 'private, max-age=60'
+        return response
+        
+    except Exception as e:
+        logger.error(f"Error building map tile {z}/{x}/{y}: {str(e)}")
+        return jsonify({'success': False, 'error': 'Failed to load map tile'}), 500
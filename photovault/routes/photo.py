@@ -20,14 +20,14 @@ from photovault.models import Photo, Album, User, Person, PhotoPerson
 from photovault.extensions import db
 
 # Import face detection utilities
-from photovault.utils.face_detection import detect_faces_in_photo
-from photovault.utils.face_recognition import face_recognizer
+from photovault.services.face_detection_service import face_detection_service
 
 # Import file handling utilities
 from photovault.utils.file_handler import create_thumbnail
 
 # Import photo detection utilities
-from photovault.utils.photo_detection import detect_photos_in_image, extract_detected_photos
+from photovault.utils.photo_detection import photo_detector, detect_photos_in_image, extract_detected_photos
+from photovault.services.detection_cache_service import detection_cache, compute_content_hash
 
 # Create blueprint
 photo_bp = Blueprint('photo', __name__)
@@ -1068,8 +1068,8 @@ def detect_faces_in_photo_api(photo_id):
         if photo.user_id != current_user.id:
             return jsonify({'success': False, 'error': 'Access denied'}), 403
         
-        # Detect faces in the photo
-        faces = detect_faces_in_photo(photo.file_path)
+        # Detect and recognize faces in the photo (single decode)
+        faces = face_detection_service.detect_and_recognize_faces(photo.file_path)
         
         if not faces:
             return jsonify({
@@ -1082,8 +1082,8 @@ def detect_faces_in_photo_api(photo_id):
         stored_faces = []
         for face in faces:
             try:
-                # Try to recognize the face
-                recognition_result = face_recognizer.recognize_face(photo.file_path, face)
+                # Recognition result computed alongside detection
+                recognition_result = face.get('recognition')
                 
                 if recognition_result:
                     # Face recognized - link to existing person
@@ -1116,7 +1116,8 @@ def detect_faces_in_photo_api(photo_id):
                         face_box_width=face['width'],
                         face_box_height=face['height'],
                         manually_tagged=manually_tagged,
-                        verified=False
+                        verified=False,
+                        face_encoding=face.get('face_encoding')
                     )
                     
                     db.session.add(photo_person)
@@ -1234,10 +1235,12 @@ def assign_face_to_person(face_id):
             'width': photo_person.face_box_width,
             'height': photo_person.face_box_height
         }
-        face_recognizer.add_person_encoding(person_id, person.name, photo.file_path, face_box)
-        
         db.session.commit()
         
+        # Train recognition on this face and re-match the user's unassigned faces
+        face_detection_service.add_person_training_data(person, photo, face_box,
+                                                        face_encoding=photo_person.face_encoding)
+        
         return jsonify({
             'success': True,
             'message': f'Face assigned to {person.name}',
@@ -1252,202 +1255,266 @@ def assign_face_to_person(face_id):
             'error': 'Failed to assign face'
         }), 500
 
+@photo_bp.route('/api/photos/<int:photo_id>/enhance/preview', methods=['POST'])
+@login_required
+def enhance_photo_preview_api(photo_id):
+    """
+    API endpoint to render enhancement settings on a screen-sized proxy for the live editor
+    """
+    try:
+        import time
+        from flask import Response
+        from photovault.services.enhancement_service import (
+            enhancement_previews, photo_source_path, validate_settings, OPENCV_AVAILABLE
+        )
+        
+        photo = Photo.query.get_or_404(photo_id)
+        if photo.user_id != current_user.id:
+            return jsonify({'success': False, 'error': 'Access denied'}), 403
+            
+        if not OPENCV_AVAILABLE:
+            return jsonify({'success': False, 'error': 'Live preview requires OpenCV'}), 503
+            
+        source_path = photo_source_path(photo, current_app.config['UPLOAD_FOLDER'])
+        if not os.path.exists(source_path):
+            return jsonify({'success': False, 'error': 'Photo file not found'}), 404
+            
+        # Proxies are cached per editor session, so each open editor keeps its own photos warm
+        if 'enhancement_preview_id' not in session:
+            session['enhancement_preview_id'] = uuid.uuid4().hex
+            
+        data = request.get_json() or {}
+        try:
+            settings = validate_settings(data.get('settings'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+            
+        started = time.perf_counter()
+        preview = enhancement_previews.render(
+            session['enhancement_preview_id'], photo.id, source_path, settings
+        )
+        if preview is None:
+            return jsonify({'success': False, 'error': 'Could not read photo'}), 400
+            
+        response = Response(preview, mimetype='image/jpeg')
+        response.headers['Cache-Control'] = 'no-store'
+        response.headers['X-Render-Time-Ms'] = f"{(time.perf_counter() - started) * 1000:.1f}"
+        return response
+        
+    except Exception as e:
+        logger.error(f"Error rendering enhancement preview for photo {photo_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to render preview'
+        }), 500
+
 @photo_bp.route('/api/photos/<int:photo_id>/enhance', methods=['POST'])
 @login_required
 def enhance_photo_api(photo_id):
     """
-    API endpoint to apply OpenCV-powered image enhancement
+    API endpoint to save OpenCV-powered image enhancement; the full-resolution
+    render runs as a background job
     """
     try:
-        from photovault.models import Photo
-        from photovault.utils.image_enhancement import enhancer
-        # Use local create_thumbnail function for consistency
-        import uuid
-        from datetime import datetime
-        import os
+        from photovault.services.enhancement_service import enhancement_jobs, photo_source_path, validate_settings
         
         # Get the photo and verify ownership
         photo = Photo.query.get_or_404(photo_id)
         if photo.user_id != current_user.id:
             return jsonify({'success': False, 'error': 'Access denied'}), 403
-        
-        # Construct full file path (handle relative paths from extracted photos)
-        user_upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], str(current_user.id))
-        if os.path.isabs(photo.file_path):
-            full_file_path = photo.file_path
-        else:
-            full_file_path = os.path.join(user_upload_dir, photo.file_path)
-        
-        # Check image size to prevent blocking on large files
-        if os.path.exists(full_file_path):
-            file_size = os.path.getsize(full_file_path)
-            # Limit enhancement to files under 10MB for performance
-            if file_size > 10 * 1024 * 1024:  # 10MB
-                return jsonify({
-                    'success': False, 
-                    'error': 'Image too large for enhancement. Please use smaller images (under 10MB).'
-                }), 400
+            
+        if not os.path.exists(photo_source_path(photo, current_app.config['UPLOAD_FOLDER'])):
+            return jsonify({'success': False, 'error': 'Photo file not found'}), 404
         
         # Get enhancement settings from request
-        data = request.get_json()
-        enhancement_settings = data.get('settings', {})
-        
-        # Generate filename for enhanced version
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        unique_id = str(uuid.uuid4())[:8]
-        base_name = os.path.splitext(photo.filename)[0]
-        enhanced_filename = f"{base_name}_enhanced_{timestamp}_{unique_id}.jpg"
+        data = request.get_json() or {}
+        try:
+            settings = validate_settings(data.get('settings'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+            
+        job = enhancement_jobs.submit(photo, settings)
         
-        # Create user upload directory
-        os.makedirs(user_upload_dir, exist_ok=True)
+        logger.info(f"Queued enhancement job {job.id} for user {current_user.id}, photo {photo_id}")
         
-        # Enhanced image path
-        enhanced_filepath = os.path.join(user_upload_dir, enhanced_filename)
+        return jsonify({
+            'success': True,
+            'message': 'Enhancement started',
+            'job_id': job.id,
+            'status_url': url_for('photo.enhance_photo_status', photo_id=photo.id, job_id=job.id)
+        }), 202
         
-        # Apply enhancements using the backend OpenCV system
-        output_path, applied_settings = enhancer.auto_enhance_photo(
-            full_file_path, 
-            enhanced_filepath, 
-            enhancement_settings
-        )
+    except Exception as e:
+        logger.error(f"Error enhancing photo {photo_id}: {str(e)}")
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': 'Failed to enhance photo'
+        }), 500
+
+@photo_bp.route('/api/photos/<int:photo_id>/enhance/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def enhance_photo_status(photo_id, job_id):
+    """
+    API endpoint to poll a background enhancement render
+    """
+    try:
+        from photovault.services.enhancement_service import enhancement_jobs
         
-        # Create thumbnail for enhanced version
-        thumbnail_filename = f"{base_name}_enhanced_{timestamp}_{unique_id}_thumb.jpg"
-        thumbnail_path = os.path.join(user_upload_dir, thumbnail_filename)
-        success, result = create_thumbnail(enhanced_filepath)
-        if not success:
-            logger.error(f"Failed to create thumbnail: {result}")
-            thumbnail_path = None
-        else:
-            thumbnail_path = result
+        status = enhancement_jobs.get_status(job_id, current_user.id)
+        if status is None or status['photo_id'] != photo_id:
+            return jsonify({'success': False, 'error': 'Enhancement job not found'}), 404
+            
+        return jsonify({'success': True, **status})
         
-        # Update photo record with enhanced version info
-        photo.edited_filename = enhanced_filename
-        photo.edited_path = enhanced_filepath
-        photo.thumbnail_path = thumbnail_path
-        photo.updated_at = datetime.utcnow()
+    except Exception as e:
+        logger.error(f"Error getting enhancement job {job_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to get enhancement status'
+        }), 500
+
+@photo_bp.route('/api/photos/enhance/batch', methods=['POST'])
+@login_required
+def enhance_photos_batch_api():
+    """
+    API endpoint to apply one enhancement preset to many photos in the background
+    """
+    try:
+        from photovault.services.enhancement_service import enhancement_jobs, validate_settings
         
-        # Ensure database transaction is committed properly
+        data = request.get_json() or {}
+        photo_ids = data.get('photo_ids') or []
+        if not isinstance(photo_ids, list) or not photo_ids:
+            return jsonify({'success': False, 'error': 'No photos provided'}), 400
+            
         try:
-            db.session.commit()
-            # Verify the update was successful by refreshing from database
-            db.session.refresh(photo)
-            logger.info(f"Enhanced photo database update verified: {photo.id}, edited_filename: {photo.edited_filename}")
-        except Exception as commit_error:
-            logger.error(f"Database commit failed for enhanced photo {photo_id}: {commit_error}")
-            db.session.rollback()
+            photo_ids = list(dict.fromkeys(int(photo_id) for photo_id in photo_ids))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Invalid photo IDs'}), 400
+            
+        try:
+            settings = validate_settings(data.get('settings'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+            
+        max_photos = current_app.config.get('ENHANCEMENT_BATCH_MAX_PHOTOS', 500)
+        if len(photo_ids) > max_photos:
             return jsonify({
                 'success': False,
-                'error': 'Failed to save enhancement to database'
-            }), 500
+                'error': f'Too many photos in one batch (maximum {max_photos})'
+            }), 400
+            
+        # Only the user's own photos are enhanced; everything else is reported back
+        photos = Photo.query.filter(Photo.id.in_(photo_ids), Photo.user_id == current_user.id).all()
+        found_ids = {photo.id for photo in photos}
+        rejected = [photo_id for photo_id in photo_ids if photo_id not in found_ids]
+        if not photos:
+            return jsonify({'success': False, 'error': 'No matching photos found', 'rejected': rejected}), 404
+            
+        batch = enhancement_jobs.create_batch(current_user.id, photos, settings)
+        enhancement_jobs.start_batch(batch.id)
         
-        logger.info(f"Successfully enhanced photo for user {current_user.id}, photo {photo_id}")
+        logger.info(f"Started enhancement batch {batch.id} with {len(photos)} photos for user {current_user.id}")
         
         return jsonify({
             'success': True,
-            'message': 'Photo enhanced successfully',
-            'enhanced_filename': enhanced_filename,
-            'thumbnail_url': url_for('gallery.uploaded_file', user_id=current_user.id, filename=thumbnail_filename),
-            'enhanced_url': url_for('gallery.uploaded_file', user_id=current_user.id, filename=enhanced_filename),
-            'applied_settings': applied_settings
-        })
+            'batch_id': batch.id,
+            'total_photos': len(photos),
+            'rejected': rejected,
+            'status_url': url_for('photo.enhance_photos_batch_status', batch_id=batch.id)
+        }), 202
         
     except Exception as e:
-        logger.error(f"Error enhancing photo {photo_id}: {str(e)}")
+        logger.error(f"Error starting enhancement batch: {str(e)}")
         db.session.rollback()
         return jsonify({
             'success': False,
-            'error': 'Failed to enhance photo'
+            'error': 'Failed to start batch enhancement'
+        }), 500
+
+@photo_bp.route('/api/photos/enhance/batch/<int:batch_id>', methods=['GET'])
+@login_required
+def enhance_photos_batch_status(batch_id):
+    """
+    API endpoint to poll the progress of a batch enhancement
+    """
+    try:
+        from photovault.services.enhancement_service import enhancement_jobs
+        
+        status = enhancement_jobs.get_batch_status(batch_id, current_user.id)
+        if status is None:
+            return jsonify({'success': False, 'error': 'Batch not found'}), 404
+            
+        return jsonify({'success': True, **status})
+        
+    except Exception as e:
+        logger.error(f"Error getting enhancement batch {batch_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to get batch status'
         }), 500
 
 @photo_bp.route('/api/photos/batch-detect-faces', methods=['POST'])
 @login_required
 def batch_detect_faces():
     """
-    Run face detection on multiple photos (background processing)
+    Start face detection on multiple photos as a background job
     """
     try:
-        data = request.get_json()
-        photo_ids = data.get('photo_ids', [])
+        from photovault.services.face_scan_service import face_scan_service
         
-        if not photo_ids:
-            # If no specific photos, detect faces in all user's photos without face detection
-            photos = Photo.query.filter_by(user_id=current_user.id).all()
-            photos_to_process = []
+        data = request.get_json() or {}
+        photo_ids = data.get('photo_ids') or []
+        if not isinstance(photo_ids, list):
+            return jsonify({'success': False, 'error': 'Invalid photo IDs'}), 400
             
-            for photo in photos:
-                # Check if photo already has face detections
-                existing_detections = PhotoPerson.query.filter_by(photo_id=photo.id).count()
-                if existing_detections == 0:
-                    photos_to_process.append(photo)
-        else:
-            # Process specific photos
-            photos_to_process = Photo.query.filter(
-                Photo.id.in_(photo_ids),
-                Photo.user_id == current_user.id
-            ).all()
+        try:
+            photo_ids = list(dict.fromkeys(int(photo_id) for photo_id in photo_ids))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Invalid photo IDs'}), 400
+            
+        # Detection runs in the worker pool; without specific photos, every photo
+        # of the user that has no face detections yet is scanned
+        job = face_scan_service.create_job(current_user.id, photo_ids)
+        face_scan_service.start_job(job.id)
         
-        results = {
-            'processed': 0,
-            'faces_found': 0,
-            'errors': []
-        }
-        
-        for photo in photos_to_process:
-            try:
-                # Detect faces
-                faces = detect_faces_in_photo(photo.file_path)
-                
-                faces_stored = 0
-                for face in faces:
-                    try:
-                        # Try to recognize the face
-                        recognition_result = face_recognizer.recognize_face(photo.file_path, face)
-                        
-                        # Store detection
-                        photo_person = PhotoPerson(
-                            photo_id=photo.id,
-                            person_id=recognition_result['person_id'] if recognition_result else None,
-                            confidence=recognition_result['confidence'] if recognition_result else face['confidence'],
-                            face_box_x=face['x'],
-                            face_box_y=face['y'],
-                            face_box_width=face['width'],
-                            face_box_height=face['height'],
-                            manually_tagged=False,
-                            verified=bool(recognition_result)
-                        )
-                        
-                        db.session.add(photo_person)
-                        faces_stored += 1
-                        
-                    except Exception as e:
-                        logger.error(f"Error storing face for photo {photo.id}: {e}")
-                        continue
-                
-                results['processed'] += 1
-                results['faces_found'] += faces_stored
-                
-                # Commit after each photo to avoid losing progress
-                db.session.commit()
-                
-            except Exception as e:
-                logger.error(f"Error processing photo {photo.id}: {e}")
-                results['errors'].append(f"Photo {photo.id}: {str(e)}")
-                db.session.rollback()
-                continue
+        logger.info(f"Started face scan job {job.id} for user {current_user.id}")
         
         return jsonify({
             'success': True,
-            'message': f'Processed {results["processed"]} photos, found {results["faces_found"]} faces',
-            'results': results
-        })
+            'job_id': job.id,
+            'status_url': url_for('photo.batch_detect_faces_status', job_id=job.id)
+        }), 202
         
     except Exception as e:
         logger.error(f"Error in batch face detection: {str(e)}")
         db.session.rollback()
         return jsonify({
             'success': False,
-            'error': 'Failed to process batch face detection'
+            'error': 'Failed to start batch face detection'
+        }), 500
+
+@photo_bp.route('/api/photos/batch-detect-faces/<int:job_id>', methods=['GET'])
+@login_required
+def batch_detect_faces_status(job_id):
+    """
+    API endpoint to poll the progress of a batch face detection
+    """
+    try:
+        from photovault.services.face_scan_service import face_scan_service
+        
+        status = face_scan_service.get_status(job_id, current_user.id)
+        if status is None:
+            return jsonify({'success': False, 'error': 'Face scan job not found'}), 404
+            
+        return jsonify({'success': True, **status})
+        
+    except Exception as e:
+        logger.error(f"Error getting face scan job {job_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to get face scan status'
         }), 500
 
 # AI-Enhanced Features API Endpoints
@@ -1459,7 +1526,7 @@ def save_ai_tags(photo_id):
     Save AI-generated object tags from TensorFlow.js COCO-SSD detection
     """
     try:
-        import json
+        from photovault.services.ai_tag_service import ai_tag_service
         
         # Get the photo and verify ownership
         photo = Photo.query.get_or_404(photo_id)
@@ -1472,24 +1539,8 @@ def save_ai_tags(photo_id):
         
         detected_objects = data['detectedObjects']
         
-        # Store AI tags in photo metadata for now (can be moved to separate table later)
-        ai_tags = []
-        for obj in detected_objects:
-            if obj.get('score', 0) > 0.6:  # Only save high-confidence detections
-                ai_tags.append({
-                    'tag_name': obj['class'],
-                    'confidence': obj['score'],
-                    'bbox': obj.get('bbox', []),
-                    'model': 'COCO-SSD',
-                    'timestamp': datetime.utcnow().isoformat()
-                })
-        
-        # Update photo with AI tags
-        ai_metadata = json.loads(photo.ai_metadata) if photo.ai_metadata else {}
-        ai_metadata['ai_tags'] = ai_tags
-        ai_metadata['last_ai_processing'] = datetime.utcnow().isoformat()
-        photo.ai_metadata = json.dumps(ai_metadata)
-        
+        # Only high-confidence detections become tags
+        ai_tags = ai_tag_service.save_tags(photo, detected_objects, source='COCO-SSD')
         db.session.commit()
         
         logger.info(f"Saved {len(ai_tags)} AI tags for photo {photo_id} by user {current_user.id}")
@@ -1497,7 +1548,7 @@ def save_ai_tags(photo_id):
         return jsonify({
             'success': True,
             'message': f'Saved {len(ai_tags)} AI-generated tags',
-            'tags': [{'name': tag['tag_name'], 'confidence': tag['confidence']} for tag in ai_tags]
+            'tags': [{'name': tag['tag'], 'confidence': tag['confidence']} for tag in ai_tags]
         })
         
     except Exception as e:
@@ -1515,7 +1566,7 @@ def save_ai_faces(photo_id):
     Save AI-generated face detection results from TensorFlow.js BlazeFace
     """
     try:
-        import json
+        from photovault.services.ai_tag_service import ai_tag_service
         
         # Get the photo and verify ownership
         photo = Photo.query.get_or_404(photo_id)
@@ -1530,6 +1581,7 @@ def save_ai_faces(photo_id):
         
         # Save face detections using existing PhotoPerson model
         saved_faces = []
+        face_landmarks = []
         for face in detected_faces:
             bbox = face.get('bbox', [])
             if len(bbox) >= 4:
@@ -1559,17 +1611,12 @@ def save_ai_faces(photo_id):
                     
                     # Store landmarks data if available
                     if 'landmarks' in face:
-                        # Create AI metadata for landmarks
-                        ai_metadata = json.loads(photo.ai_metadata) if photo.ai_metadata else {}
-                        if 'ai_face_landmarks' not in ai_metadata:
-                            ai_metadata['ai_face_landmarks'] = []
-                        ai_metadata['ai_face_landmarks'].append({
+                        face_landmarks.append({
                             'bbox': bbox,
                             'landmarks': face['landmarks'],
                             'model': 'BlazeFace',
                             'timestamp': datetime.utcnow().isoformat()
                         })
-                        photo.ai_metadata = json.dumps(ai_metadata)
                     
                     db.session.add(photo_person)
                     saved_faces.append({
@@ -1578,6 +1625,7 @@ def save_ai_faces(photo_id):
                         'landmarks_count': len(face.get('landmarks', []))
                     })
         
+        ai_tag_service.extend_analysis(photo_id, 'face_landmarks', face_landmarks)
         db.session.commit()
         
         logger.info(f"Saved {len(saved_faces)} AI face detections for photo {photo_id} by user {current_user.id}")
@@ -1603,7 +1651,7 @@ def save_ai_poses(photo_id):
     Save AI-generated pose detection and activity recognition data
     """
     try:
-        import json
+        from photovault.services.ai_tag_service import ai_tag_service
         
         # Get the photo and verify ownership
         photo = Photo.query.get_or_404(photo_id)
@@ -1617,9 +1665,8 @@ def save_ai_poses(photo_id):
         poses = data.get('poses', [])
         activity = data.get('activity', {})
         
-        # Store pose data in photo metadata
-        ai_metadata = json.loads(photo.ai_metadata) if photo.ai_metadata else {}
-        ai_metadata['ai_poses'] = {
+        # Store pose data as the photo's pose analysis
+        ai_tag_service.save_analysis(photo_id, 'poses', {
             'poses': poses,
             'activity': activity,
             'pose_count': len(poses),
@@ -1627,9 +1674,7 @@ def save_ai_poses(photo_id):
             'activity_confidence': activity.get('confidence', 0),
             'model': 'PoseNet',
             'timestamp': datetime.utcnow().isoformat()
-        }
-        photo.ai_metadata = json.dumps(ai_metadata)
-        
+        })
         db.session.commit()
         
         logger.info(f"Saved AI pose data for photo {photo_id}: {len(poses)} poses, activity: {activity.get('activity', 'unknown')}")
@@ -1657,7 +1702,7 @@ def save_ai_composition(photo_id):
     Save AI-generated composition analysis and suggestions
     """
     try:
-        import json
+        from photovault.services.ai_tag_service import ai_tag_service
         
         # Get the photo and verify ownership
         photo = Photo.query.get_or_404(photo_id)
@@ -1670,9 +1715,8 @@ def save_ai_composition(photo_id):
         
         composition_data = data['composition']
         
-        # Store composition analysis in photo metadata
-        ai_metadata = json.loads(photo.ai_metadata) if photo.ai_metadata else {}
-        ai_metadata['ai_composition'] = {
+        # Store composition analysis as the photo's composition analysis
+        composition = {
             'score': composition_data.get('composition', {}).get('score', 0),
             'feedback': composition_data.get('composition', {}).get('feedback', ''),
             'suggestions': composition_data.get('suggestions', []),
@@ -1681,12 +1725,11 @@ def save_ai_composition(photo_id):
             'poses_count': composition_data.get('poses', 0),
             'timestamp': datetime.utcnow().isoformat()
         }
-        photo.ai_metadata = json.dumps(ai_metadata)
-        
+        ai_tag_service.save_analysis(photo_id, 'composition', composition)
         db.session.commit()
         
-        score = ai_metadata['ai_composition']['score']
-        suggestions_count = len(ai_metadata['ai_composition']['suggestions'])
+        score = composition['score']
+        suggestions_count = len(composition['suggestions'])
         
         logger.info(f"Saved AI composition analysis for photo {photo_id}: score {score}")
         
@@ -1713,6 +1756,7 @@ def get_ai_metadata(photo_id):
     """
     try:
         import json
+        from photovault.services.ai_tag_service import ai_tag_service
         
         # Get the photo and verify ownership
         photo = Photo.query.get_or_404(photo_id)
@@ -1730,20 +1774,26 @@ def get_ai_metadata(photo_id):
             'generated_at': None
         }
         
-        # Get AI metadata from photo
-        if photo.ai_metadata:
-            try:
-                metadata = json.loads(photo.ai_metadata)
-                ai_data.update({
-                    'ai_tags': metadata.get('ai_tags', []),
-                    'ai_poses': metadata.get('ai_poses', {}),
-                    'ai_composition': metadata.get('ai_composition', {}),
-                    'ai_face_landmarks': metadata.get('ai_face_landmarks', []),
-                    'has_ai_data': True,
-                    'generated_at': metadata.get('last_ai_processing', photo.created_at.isoformat())
-                })
-            except json.JSONDecodeError:
-                logger.warning(f"Invalid JSON in ai_metadata for photo {photo_id}")
+        # Get AI tags and analyses of the photo
+        tags = ai_tag_service.get_tags(photo_id)
+        analyses = ai_tag_service.get_analyses(photo_id)
+        ai_data.update({
+            'ai_tags': [{
+                'tag_name': tag.tag,
+                'confidence': tag.confidence,
+                'instances': tag.instances,
+                'boxes': json.loads(tag.boxes) if tag.boxes else [],
+                'model': tag.source,
+                'timestamp': tag.updated_at.isoformat() if tag.updated_at else None
+            } for tag in tags],
+            'ai_poses': analyses.get('poses', {}),
+            'ai_composition': analyses.get('composition', {}),
+            'ai_face_landmarks': analyses.get('face_landmarks', [])
+        })
+        if tags or analyses:
+            ai_data['has_ai_data'] = True
+            timestamps = [tag.updated_at for tag in tags if tag.updated_at]
+            ai_data['generated_at'] = max(timestamps).isoformat() if timestamps else photo.created_at.isoformat()
         
         # Get AI face detections from PhotoPerson
         ai_faces = PhotoPerson.query.filter_by(
@@ -1773,6 +1823,77 @@ def get_ai_metadata(photo_id):
             'error': 'Failed to retrieve AI metadata'
         }), 500
 
+def _requested_tags():
+    """Normalized, de-duplicated tags of the 'tags' query parameter"""
+    from photovault.services.ai_tag_service import normalize_tag
+    tags = [normalize_tag(tag) for tag in request.args.get('tags', '').split(',')]
+    return list(dict.fromkeys(tag for tag in tags if tag))[:10]
+
+@photo_bp.route('/api/tags', methods=['GET'])
+@login_required
+def list_tag_facets():
+    """
+    Count the current user's photos per AI tag, narrowed to photos carrying the selected 'tags'
+    """
+    try:
+        from photovault.services.ai_tag_service import ai_tag_service
+        
+        selected = _requested_tags()
+        facets = ai_tag_service.tag_facets(
+            current_user.id,
+            selected=selected,
+            min_confidence=request.args.get('min_confidence', 0.0, type=float),
+            prefix=request.args.get('prefix'),
+            limit=max(1, min(request.args.get('limit', 50, type=int), 200))
+        )
+        
+        return jsonify({
+            'success': True,
+            'selected': selected,
+            'facets': facets
+        })
+        
+    except Exception as e:
+        logger.error(f"Error listing tag facets: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to list tags'
+        }), 500
+
+@photo_bp.route('/api/tags/photos', methods=['GET'])
+@login_required
+def list_tagged_photos():
+    """
+    List the current user's photos carrying every requested AI tag, newest first
+    """
+    try:
+        from photovault.services.ai_tag_service import ai_tag_service
+        
+        tags = _requested_tags()
+        if not tags:
+            return jsonify({'success': False, 'error': 'At least one tag is required'}), 400
+        
+        result = ai_tag_service.photos_with_tags(
+            current_user.id,
+            tags,
+            min_confidence=request.args.get('min_confidence', 0.0, type=float),
+            before_id=request.args.get('cursor', type=int),
+            limit=max(1, min(request.args.get('limit', 50, type=int), 100))
+        )
+        
+        return jsonify({
+            'success': True,
+            'tags': tags,
+            **result
+        })
+        
+    except Exception as e:
+        logger.error(f"Error listing tagged photos: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to list tagged photos'
+        }), 500
+
 @photo_bp.route('/api/photos/<int:photo_id>/auto-detect', methods=['POST'])
 @login_required
 def auto_detect_photos(photo_id):
@@ -1789,8 +1910,13 @@ def auto_detect_photos(photo_id):
         
         logger.info(f"Starting auto-detection for photo {photo_id} by user {current_user.id}")
         
-        # Detect photos in the image
-        detected_photos = detect_photos_in_image(photo.file_path)
+        # Detect photos in the image, reusing earlier results for unchanged files
+        content_hash = compute_content_hash(photo.file_path)
+        cache_key = f"photos:{photo_detector.get_version_key()}"
+        detected_photos = detection_cache.get(content_hash, cache_key)
+        if detected_photos is None:
+            detected_photos = detect_photos_in_image(photo.file_path)
+            detection_cache.put(content_hash, cache_key, detected_photos)
         
         if not detected_photos:
             return jsonify({
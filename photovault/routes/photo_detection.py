@@ -1,15 +1,15 @@
 # photovault/routes/photo_detection.py
 
 import os
-import uuid
 import json
-from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify, current_app, render_template, url_for, send_file
 from flask_login import login_required, current_user
 from werkzeug.exceptions import RequestEntityTooLarge
 from photovault.utils.file_handler import validate_image_file, generate_unique_filename
 from photovault.utils.enhanced_file_handler import save_uploaded_file_enhanced, delete_file_enhanced
 from photovault.utils.photo_detection import detect_photos_in_image, extract_detected_photos
+from photovault.services.detection_session_service import detection_sessions
+from photovault.services.scan_split_service import scan_split_service
 import logging
 
 # Configure logging
@@ -18,10 +18,6 @@ logger = logging.getLogger(__name__)
 # Create blueprint
 photo_detection_bp = Blueprint('photo_detection', __name__)
 
-# Temporary storage for uploaded files with secure tokens
-# In production, this should be stored in a database or cache like Redis
-_temp_files = {}
-
 @photo_detection_bp.route('/photo-detection')
 @login_required
 def photo_detection_page():
@@ -82,19 +78,12 @@ def upload_for_detection():
         
         file_path = file_path_or_error
         
-        # Check image size before processing to prevent memory issues
+        # Make sure the upload is a readable image; detection itself runs on a proxy,
+        # so large flatbed scans are accepted
         try:
             from PIL import Image as PILImage
             with PILImage.open(file_path) as img:
-                width, height = img.size
-                # Limit image size to prevent memory exhaustion
-                max_pixels = 25000000  # ~25MP limit to match detection logic
-                if width * height > max_pixels:
-                    delete_file_enhanced(file_path)
-                    return jsonify({
-                        'success': False,
-                        'error': f'Image too large ({width}x{height} pixels). Maximum supported size is 25 megapixels.'
-                    }), 400
+                img.verify()
         except Exception as e:
             delete_file_enhanced(file_path)
             return jsonify({
@@ -102,8 +91,9 @@ def upload_for_detection():
                 'error': f'Could not process image: {str(e)}'
             }), 400
         
-        # Detect photos in the uploaded image
-        detected_photos = detect_photos_in_image(file_path)
+        # Detect photos in the uploaded image; full contours are only sent when asked for
+        include_contours = request.form.get('include_contours', '').lower() in ('1', 'true', 'yes')
+        detected_photos = detect_photos_in_image(file_path, include_contours=include_contours)
         
         if not detected_photos:
             # Clean up uploaded file if no photos detected
@@ -115,21 +105,16 @@ def upload_for_detection():
         
         logger.info(f"Detected {len(detected_photos)} photos in {file.filename}")
         
-        # Generate secure token for this upload session
-        secure_token = str(uuid.uuid4())
-        expiry_time = datetime.now() + timedelta(hours=1)  # 1 hour expiry
-        
-        # Store file info securely with token
-        _temp_files[secure_token] = {
-            'file_path': file_path,
-            'user_id': current_user.id,
-            'original_filename': file.filename,
-            'detected_photos': detected_photos,
-            'expiry': expiry_time
-        }
-        
-        # Clean up expired tokens
-        _cleanup_expired_tokens()
+        # Store file info and detected regions in the shared session store,
+        # so extraction never has to detect again
+        secure_token = detection_sessions.create(
+            user_id=current_user.id,
+            file_path=file_path,
+            original_filename=file.filename,
+            detected_photos=[
+                {key: value for key, value in photo.items() if key != 'contour'} for photo in detected_photos
+            ]
+        )
         
         # Prepare response data (no file paths exposed)
         response_data = {
@@ -169,14 +154,13 @@ def extract_detected_photos_api():
         selected_indices = data.get('selected_photos', [])
         
         # Validate token and get file info
-        if token not in _temp_files:
+        file_info = detection_sessions.get(token)
+        if file_info is None:
             return jsonify({
                 'success': False,
                 'error': 'Invalid or expired session token'
             }), 400
         
-        file_info = _temp_files[token]
-        
         # Check if token belongs to current user
         if file_info['user_id'] != current_user.id:
             return jsonify({
@@ -185,8 +169,8 @@ def extract_detected_photos_api():
             }), 403
         
         # Check if token is expired
-        if datetime.now() > file_info['expiry']:
-            del _temp_files[token]
+        if file_info['expired']:
+            detection_sessions.delete(token)
             return jsonify({
                 'success': False,
                 'error': 'Session expired, please upload again'
@@ -278,8 +262,7 @@ def extract_detected_photos_api():
                     pass
             
             # Clean up the temporary original file and token
-            delete_file_enhanced(file_path)
-            del _temp_files[token]
+            detection_sessions.delete(token)
             
             return jsonify({
                 'success': False,
@@ -287,8 +270,7 @@ def extract_detected_photos_api():
             }), 500
         
         # Clean up the temporary original file and token
-        delete_file_enhanced(file_path)
-        del _temp_files[token]
+        detection_sessions.delete(token)
         
         logger.info(f"Successfully extracted {len(extracted_photos)} photos for user {current_user.id}")
         
@@ -314,18 +296,17 @@ def preview_original(token):
     """
     try:
         # Validate token
-        if token not in _temp_files:
+        file_info = detection_sessions.get(token)
+        if file_info is None:
             return jsonify({'error': 'Invalid or expired session token'}), 404
         
-        file_info = _temp_files[token]
-        
         # Check if token belongs to current user
         if file_info['user_id'] != current_user.id:
             return jsonify({'error': 'Unauthorized'}), 403
         
         # Check if token is expired
-        if datetime.now() > file_info['expiry']:
-            del _temp_files[token]
+        if file_info['expired']:
+            detection_sessions.delete(token)
             return jsonify({'error': 'Session expired'}), 404
         
         file_path = file_info['file_path']
@@ -348,22 +329,81 @@ def preview_original(token):
         logger.error(f"Preview failed: {e}")
         return jsonify({'error': 'Preview failed'}), 500
 
-def _cleanup_expired_tokens():
-    """Clean up expired tokens from temporary storage"""
-    current_time = datetime.now()
-    expired_tokens = [token for token, info in _temp_files.items() 
-                     if current_time > info['expiry']]
-    
-    for token in expired_tokens:
-        file_info = _temp_files[token]
-        try:
-            # Clean up the file if it exists
-            if os.path.exists(file_info['file_path']):
-                delete_file_enhanced(file_info['file_path'])
-        except Exception as e:
-            logger.warning(f"Failed to clean up expired file {file_info['file_path']}: {e}")
+@photo_detection_bp.route('/api/photo-detection/batch', methods=['POST'])
+@login_required
+def start_batch_scan_split():
+    """
+    Upload a set of scans and split them into individual photos in the background
+    """
+    try:
+        files = [file for file in request.files.getlist('files') if file.filename]
+        if not files:
+            return jsonify({
+                'success': False,
+                'error': 'No files provided'
+            }), 400
         
-        del _temp_files[token]
-    
-    if expired_tokens:
-        logger.info(f"Cleaned up {len(expired_tokens)} expired tokens")
\ No newline at end of file
+        scans = []
+        rejected = []
+        for file in files:
+            is_valid, validation_msg = validate_image_file(file)
+            if not is_valid:
+                rejected.append({'filename': file.filename, 'error': validation_msg})
+                continue
+            
+            unique_filename = generate_unique_filename(
+                file.filename,
+                prefix='scan',
+                username=current_user.username
+            )
+            success, file_path_or_error = save_uploaded_file_enhanced(
+                file, unique_filename, current_user.id
+            )
+            if not success:
+                rejected.append({'filename': file.filename, 'error': file_path_or_error})
+                continue
+            scans.append((file_path_or_error, file.filename))
+        
+        if not scans:
+            return jsonify({
+                'success': False,
+                'error': 'None of the uploaded files could be used',
+                'rejected': rejected
+            }), 400
+        
+        job = scan_split_service.create_job(current_user.id, scans, delete_scans=True)
+        scan_split_service.start_job(job.id)
+        
+        logger.info(f"Started scan split job {job.id} with {len(scans)} scans for user {current_user.id}")
+        
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'total_scans': len(scans),
+            'rejected': rejected,
+            'status_url': url_for('photo_detection.batch_scan_split_status', job_id=job.id)
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Batch scan split upload failed: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'An unexpected error occurred while starting the batch.'
+        }), 500
+
+@photo_detection_bp.route('/api/photo-detection/batch/<int:job_id>')
+@login_required
+def batch_scan_split_status(job_id):
+    """
+    Report the progress of a batch scan split job
+    """
+    try:
+        status = scan_split_service.get_status(job_id, current_user.id)
+        if status is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        
+        return jsonify({'success': True, **status})
+        
+    except Exception as e:
+        logger.error(f"Batch scan split status failed: {e}")
+        return jsonify({'success': False, 'error': 'Failed to get job status'}), 500
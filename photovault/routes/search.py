@@ -0,0 +1,41 @@
+"""
+Search Routes for PhotoVault
+Ranked full-text search over photo annotations, people, stories and voice memo transcripts
+"""
+
+import logging
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from photovault.services.search_service import search_service, SEARCH_SOURCES
+
+logger = logging.getLogger(__name__)
+
+# Create blueprint
+search_bp = Blueprint('search', __name__)
+
+# Document types a search can be narrowed to
+SEARCH_TYPES = {doc_type for doc_type, _, _ in SEARCH_SOURCES.values()}
+
+@search_bp.route('/api/search')
+@login_required
+def search_api():
+    """Search the current user's content and the vaults they belong to"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'success': False, 'error': 'Search query is required'}), 400
+        if len(query) > 200:
+            return jsonify({'success': False, 'error': 'Search query is too long'}), 400
+            
+        page = max(1, request.args.get('page', 1, type=int))
+        per_page = max(1, min(request.args.get('per_page', 20, type=int), 50))
+        doc_types = [t for t in request.args.get('types', '').split(',') if t]
+        if any(t not in SEARCH_TYPES for t in doc_types):
+            return jsonify({'success': False, 'error': f"types must be among: {', '.join(sorted(SEARCH_TYPES))}"}), 400
+            
+        result = search_service.search(current_user.id, query, page=page, per_page=per_page, doc_types=doc_types or None)
+        return jsonify({'success': True, 'query': query, **result})
+        
+    except Exception as e:
+        logger.error(f"Error searching for user {current_user.id}: {str(e)}")
+        return jsonify({'success': False, 'error': 'Search failed'}), 500
@@ -8,6 +8,7 @@ from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
 from photovault.models import Photo, Person, PhotoPerson, db
 from photovault.services.face_detection_service import face_detection_service
+from photovault.services.face_clustering_service import face_clustering_service
 from photovault.extensions import csrf
 
 logger = logging.getLogger(__name__)
@@ -258,7 +259,8 @@ def tag_face():
         # Add training data for face recognition if this is a verified tag
         if hasattr(tag, 'bounding_box') and tag.bounding_box:
             try:
-                face_detection_service.add_person_training_data(person, photo, tag.bounding_box)
+                face_detection_service.add_person_training_data(person, photo, tag.bounding_box,
+                                                                 face_encoding=tag.face_encoding)
             except Exception as e:
                 logger.warning(f"Could not add training data: {e}")
         
@@ -294,7 +296,8 @@ def verify_tag(tag_id):
             # Add training data for face recognition
             if hasattr(tag, 'bounding_box') and tag.bounding_box and tag.person:
                 try:
-                    face_detection_service.add_person_training_data(tag.person, tag.photo, tag.bounding_box)
+                    face_detection_service.add_person_training_data(tag.person, tag.photo, tag.bounding_box,
+                                                                     face_encoding=tag.face_encoding)
                 except Exception as e:
                     logger.warning(f"Could not add training data: {e}")
             
@@ -344,4 +347,74 @@ def get_tagging_stats():
         })
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@smart_tagging_bp.route('/api/face-clusters')
+@login_required
+def get_face_clusters():
+    """Get clusters of similar unassigned faces for bulk tagging"""
+    try:
+        sample_size = min(request.args.get('sample_size', 6, type=int), 50)
+        clusters = face_clustering_service.get_clusters(current_user.id, sample_size=sample_size)
+        
+        return jsonify({
+            'success': True,
+            'clusters': clusters,
+            'total': len(clusters)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting face clusters: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@smart_tagging_bp.route('/api/face-clusters/rebuild', methods=['POST'])
+@csrf.exempt
+@login_required
+def rebuild_face_clusters():
+    """Recompute clusters over the user's unassigned faces"""
+    try:
+        summary = face_clustering_service.cluster_unknown_faces(current_user.id)
+        
+        return jsonify({
+            'success': True,
+            'summary': summary
+        })
+        
+    except Exception as e:
+        logger.error(f"Error rebuilding face clusters: {e}")
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@smart_tagging_bp.route('/api/face-clusters/<int:cluster_id>/assign', methods=['POST'])
+@csrf.exempt
+@login_required
+def assign_face_cluster(cluster_id):
+    """Tag every face in a cluster with one person"""
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('person_id'):
+            return jsonify({'success': False, 'error': 'Person ID is required'}), 400
+        
+        # Verify person belongs to user
+        person = Person.query.filter_by(id=data['person_id'], user_id=current_user.id).first()
+        if not person:
+            return jsonify({'success': False, 'error': 'Person not found'}), 404
+        
+        result = face_clustering_service.assign_cluster(current_user.id, cluster_id, person)
+        if not result['tagged'] and not result['skipped']:
+            return jsonify({'success': False, 'error': 'Cluster not found'}), 404
+        
+        logger.info(f"Assigned cluster {cluster_id} to person {person.name} for user {current_user.id}")
+        
+        return jsonify({
+            'success': True,
+            'person_name': person.name,
+            'tagged': result['tagged'],
+            'skipped': result['skipped']
+        })
+        
+    except Exception as e:
+        logger.error(f"Error assigning face cluster: {e}")
+        db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
\ No newline at end of file
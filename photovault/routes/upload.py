@@ -15,7 +15,7 @@ from photovault.utils.enhanced_file_handler import (
     save_uploaded_file_enhanced, create_thumbnail_enhanced, 
     get_image_info_enhanced, delete_file_enhanced
 )
-from photovault.utils.metadata_extractor import extract_metadata_for_photo
+from photovault.utils.metadata_extractor import extract_metadata_from_header, HEADER_READ_SIZE, PHOTO_EXIF_FIELDS
 from photovault.utils.image_enhancement import enhance_for_old_photo
 from photovault.utils.face_detection import detect_faces_in_photo
 from photovault.utils.face_recognition import face_recognizer
@@ -87,6 +87,12 @@ def upload_photos():
                     username=current_user.username
                 )
                 
+                # Keep the header region for metadata extraction, so the stored file
+                # (possibly in App Storage) is never read back for it
+                file.stream.seek(0)
+                header = file.stream.read(HEADER_READ_SIZE)
+                file.stream.seek(0)
+                
                 # Save file
                 success, file_path_or_error = save_uploaded_file_enhanced(
                     file, unique_filename, current_user.id
@@ -108,7 +114,7 @@ def upload_photos():
                 # Extract EXIF metadata
                 photo_metadata = {}
                 try:
-                    photo_metadata = extract_metadata_for_photo(file_path)
+                    photo_metadata = extract_metadata_from_header(header, image_info['size_bytes'])
                     logger.info(f"Extracted metadata for {file.filename}")
                 except Exception as e:
                     logger.warning(f"Metadata extraction failed for {file.filename}: {e}")
@@ -145,7 +151,8 @@ def upload_photos():
                         
                         # Available metadata fields
                         photo_date=photo_metadata.get('date_taken'),
-                        auto_enhanced=photo_metadata.get('auto_enhanced', False)
+                        auto_enhanced=photo_metadata.get('auto_enhanced', False),
+                        **{field: photo_metadata.get(field) for field in PHOTO_EXIF_FIELDS}
                     )
                     
                     db.session.add(photo)
@@ -0,0 +1,201 @@
+"""
+AI Tag Service for PhotoVault
+Stores browser-side AI detections as indexed tag rows and per-kind analysis
+rows, and answers tag-faceted photo queries from the tag index
+"""
+
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import distinct, func
+from photovault.models import Photo, PhotoTag, PhotoAnalysis
+from photovault.extensions import db
+from photovault.utils.upsert import bulk_upsert
+
+logger = logging.getLogger(__name__)
+
+# Detections at or below this score are not stored as tags
+DEFAULT_MIN_CONFIDENCE = 0.6
+
+def normalize_tag(name: Any) -> str:
+    """Lowercase and trim a detector label so 'Dog' and 'dog ' are the same tag"""
+    return ' '.join(str(name or '').lower().split())[:100]
+
+class AITagService:
+    """Structured storage of AI tags and analyses for photos"""
+    
+    def save_tags(self, photo: Photo, detections: Iterable[Dict], source: str,
+                  min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> List[Dict]:
+        """
+        Replace a photo's tags from one detection model with one bulk upsert
+        
+        Detections of the same label are merged into one tag holding the best
+        score and every bounding box. The caller commits.
+        
+        Args:
+            photo: Tagged photo
+            detections: Detector output with 'class', 'score' and 'bbox'
+            source: Detection model name
+            min_confidence: Scores at or below this are ignored
+            
+        Returns:
+            The stored tag rows, most confident first
+        """
+        grouped = {}
+        for detection in detections:
+            tag = normalize_tag(detection.get('class'))
+            score = float(detection.get('score') or 0)
+            if not tag or score <= min_confidence:
+                continue
+            entry = grouped.setdefault(tag, {'confidence': 0.0, 'boxes': []})
+            entry['confidence'] = max(entry['confidence'], score)
+            entry['boxes'].append(detection.get('bbox', []))
+            
+        now = datetime.utcnow()
+        rows = [{
+            'photo_id': photo.id,
+            'user_id': photo.user_id,
+            'tag': tag,
+            'confidence': entry['confidence'],
+            'instances': len(entry['boxes']),
+            'boxes': json.dumps(entry['boxes']),
+            'source': source,
+            'created_at': now,
+            'updated_at': now
+        } for tag, entry in grouped.items()]
+        
+        # Labels the model no longer reports are dropped
+        stale = PhotoTag.__table__.delete().where(PhotoTag.photo_id == photo.id, PhotoTag.source == source)
+        if grouped:
+            stale = stale.where(PhotoTag.tag.notin_(grouped.keys()))
+        db.session.execute(stale)
+        bulk_upsert(db.session, PhotoTag.__table__, rows, ('photo_id', 'tag', 'source'),
+                    ('confidence', 'instances', 'boxes', 'updated_at'))
+        
+        return sorted(rows, key=lambda row: row['confidence'], reverse=True)
+    
+    def save_analysis(self, photo_id: int, kind: str, data: Any):
+        """
+        Store one kind of analysis of a photo, replacing the previous result of that kind
+        
+        Args:
+            photo_id: Analyzed photo
+            kind: Analysis kind
+            data: JSON-serializable result
+        """
+        now = datetime.utcnow()
+        bulk_upsert(db.session, PhotoAnalysis.__table__, [{
+            'photo_id': photo_id,
+            'kind': kind,
+            'data': json.dumps(data),
+            'created_at': now,
+            'updated_at': now
+        }], ('photo_id', 'kind'), ('data', 'updated_at'))
+    
+    def extend_analysis(self, photo_id: int, kind: str, items: List[Any]):
+        """
+        Append items to a list-valued analysis of a photo
+        
+        Args:
+            photo_id: Analyzed photo
+            kind: Analysis kind
+            items: JSON-serializable entries to add
+        """
+        if items:
+            existing = self.get_analyses(photo_id).get(kind) or []
+            self.save_analysis(photo_id, kind, existing + items)
+    
+    def get_analyses(self, photo_id: int) -> Dict[str, Any]:
+        """
+        Get every stored analysis of a photo
+        
+        Args:
+            photo_id: Analyzed photo
+            
+        Returns:
+            Mapping of analysis kind to its result
+        """
+        analyses = {}
+        for kind, data in db.session.query(PhotoAnalysis.kind, PhotoAnalysis.data).filter_by(photo_id=photo_id):
+            try:
+                analyses[kind] = json.loads(data)
+            except ValueError:
+                logger.warning(f"Invalid JSON in {kind} analysis of photo {photo_id}")
+        return analyses
+    
+    def get_tags(self, photo_id: int) -> List[PhotoTag]:
+        """Get a photo's tags, most confident first"""
+        return PhotoTag.query.filter_by(photo_id=photo_id).order_by(PhotoTag.confidence.desc()).all()
+    
+    def _matching_photo_ids(self, user_id: int, tags: List[str], min_confidence: float):
+        """Subquery of the user's photos carrying every one of the tags"""
+        return db.session.query(PhotoTag.photo_id).filter(
+            PhotoTag.user_id == user_id,
+            PhotoTag.tag.in_(tags),
+            PhotoTag.confidence >= min_confidence
+        ).group_by(PhotoTag.photo_id).having(func.count(distinct(PhotoTag.tag)) == len(tags))
+    
+    def tag_facets(self, user_id: int, selected: Optional[List[str]] = None, min_confidence: float = 0.0,
+                   prefix: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """
+        Count the user's photos per tag, optionally among the photos carrying the selected tags
+        
+        Args:
+            user_id: Owner of the photos
+            selected: Tags every counted photo must also carry
+            min_confidence: Ignore tags scored below this
+            prefix: Only tags starting with this text
+            limit: Maximum facets returned
+            
+        Returns:
+            Facets with 'tag' and 'count', most frequent first
+        """
+        photo_count = func.count(distinct(PhotoTag.photo_id))
+        query = db.session.query(PhotoTag.tag, photo_count).filter(
+            PhotoTag.user_id == user_id,
+            PhotoTag.confidence >= min_confidence
+        )
+        if prefix:
+            query = query.filter(PhotoTag.tag.startswith(normalize_tag(prefix), autoescape=True))
+        if selected:
+            query = query.filter(
+                PhotoTag.photo_id.in_(self._matching_photo_ids(user_id, selected, min_confidence)),
+                PhotoTag.tag.notin_(selected)
+            )
+        rows = query.group_by(PhotoTag.tag).order_by(photo_count.desc(), PhotoTag.tag).limit(limit).all()
+        return [{'tag': tag, 'count': count} for tag, count in rows]
+    
+    def photos_with_tags(self, user_id: int, tags: List[str], min_confidence: float = 0.0,
+                         before_id: Optional[int] = None, limit: int = 50) -> Dict:
+        """
+        List the user's photos carrying every one of the tags, newest first
+        
+        Args:
+            user_id: Owner of the photos
+            tags: Required tags
+            min_confidence: Ignore tags scored below this
+            before_id: Keyset cursor from the previous page
+            limit: Photos per page
+            
+        Returns:
+            Dictionary with 'photos' and 'next_cursor' (None on the last page)
+        """
+        query = db.session.query(Photo.id, Photo.original_name, Photo.created_at).filter(
+            Photo.user_id == user_id,
+            Photo.id.in_(self._matching_photo_ids(user_id, tags, min_confidence))
+        )
+        if before_id:
+            query = query.filter(Photo.id < before_id)
+        rows = query.order_by(Photo.id.desc()).limit(limit + 1).all()
+        
+        photos = [{
+            'id': row.id,
+            'original_name': row.original_name,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'thumbnail_url': f"/api/thumbnail/{row.id}"
+        } for row in rows[:limit]]
+        return {'photos': photos, 'next_cursor': rows[limit - 1].id if len(rows) > limit else None}
+
+# Global service instance
+ai_tag_service = AITagService()
@@ -0,0 +1,163 @@
+"""
+Detection Cache Service for PhotoVault
+Persists detector output per (image content hash, detector version) so unchanged
+photos are never decoded and analysed twice
+"""
+
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Any
+from photovault.models import DetectionCache
+from photovault.extensions import db
+from photovault.utils.upsert import bulk_upsert
+
+logger = logging.getLogger(__name__)
+
+def compute_content_hash(file_path: str, chunk_size: int = 1024 * 1024) -> Optional[str]:
+    """
+    Compute the SHA-256 of a file's bytes without decoding it
+    
+    Args:
+        file_path: Path to the file
+        chunk_size: Bytes read per iteration
+        
+    Returns:
+        Hex digest, or None if the file cannot be read
+    """
+    if not file_path or not os.path.exists(file_path):
+        return None
+    try:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except OSError as e:
+        logger.error(f"Could not hash {file_path}: {e}")
+        return None
+
+class DetectionCacheService:
+    """Read-through store for detector results"""
+    
+    def __init__(self):
+        # Detector keys this process already purged the other versions of
+        self._pruned_keys = set()
+    
+    def get(self, content_hash: Optional[str], detector_key: str) -> Optional[Any]:
+        """
+        Get cached detector output
+        
+        Args:
+            content_hash: Content hash of the image
+            detector_key: Detector name and parameters version
+            
+        Returns:
+            Decoded results, or None on a cache miss
+        """
+        if not content_hash:
+            return None
+        return self.get_many([content_hash], detector_key).get(content_hash)
+    
+    def get_many(self, content_hashes: Iterable[str], detector_key: str) -> Dict[str, Any]:
+        """
+        Get cached detector output for many images with one query
+        
+        Args:
+            content_hashes: Content hashes of the images
+            detector_key: Detector name and parameters version
+            
+        Returns:
+            Mapping of content hash to decoded results for the cache hits
+        """
+        hashes = {h for h in content_hashes if h}
+        if not hashes:
+            return {}
+            
+        try:
+            entries = db.session.query(DetectionCache.content_hash, DetectionCache.results).filter(
+                DetectionCache.detector_key == detector_key,
+                DetectionCache.content_hash.in_(hashes)
+            ).all()
+            return {content_hash: json.loads(results) for content_hash, results in entries}
+        except Exception as e:
+            logger.warning(f"Detection cache lookup failed: {e}")
+            return {}
+    
+    def put(self, content_hash: Optional[str], detector_key: str, results: Any):
+        """
+        Store detector output for one image
+        
+        Args:
+            content_hash: Content hash of the image
+            detector_key: Detector name and parameters version
+            results: JSON-serializable detector output
+        """
+        if content_hash:
+            self.put_many({content_hash: results}, detector_key)
+    
+    def put_many(self, results_by_hash: Dict[str, Any], detector_key: str):
+        """
+        Store detector output for many images with a bulk insert
+        
+        Entries are written and committed on their own connection, so storing
+        them never commits or rolls back the caller's transaction. The first
+        write of a detector key in this process also deletes the entries of the
+        detector's other versions, so a configuration change frees them without
+        waiting for the prune-detection-cache command.
+        
+        Args:
+            results_by_hash: Mapping of content hash to JSON-serializable detector output
+            detector_key: Detector name and parameters version
+        """
+        rows = [{
+            'content_hash': content_hash,
+            'detector_key': detector_key,
+            'results': json.dumps(results),
+            'created_at': datetime.utcnow()
+        } for content_hash, results in results_by_hash.items() if content_hash]
+        if not rows:
+            return
+            
+        try:
+            with db.engine.begin() as connection:
+                if detector_key not in self._pruned_keys:
+                    self._delete_stale(connection, detector_key)
+                # Entries a concurrent request already stored are skipped
+                bulk_upsert(connection, DetectionCache.__table__, rows, ('content_hash', 'detector_key'))
+            self._pruned_keys.add(detector_key)
+        except Exception as e:
+            # The cache is best effort
+            logger.warning(f"Detection cache store failed: {e}")
+    
+    def invalidate_stale(self, detector_key: str) -> int:
+        """
+        Delete cached results of other versions of the same detector in bulk and commit
+        
+        Args:
+            detector_key: Current key, "<detector name>:<version>"
+            
+        Returns:
+            Number of deleted entries
+        """
+        with db.engine.begin() as connection:
+            deleted = self._delete_stale(connection, detector_key)
+        self._pruned_keys.add(detector_key)
+        return deleted
+    
+    def _delete_stale(self, connection, detector_key: str) -> int:
+        """Delete other versions' entries of a detector on a connection, leaving the commit to the caller"""
+        detector_name = detector_key.split(':', 1)[0]
+        table = DetectionCache.__table__
+        deleted = connection.execute(table.delete().where(
+            table.c.detector_key.like(f"{detector_name}:%"),
+            table.c.detector_key != detector_key
+        )).rowcount
+        if deleted:
+            logger.info(f"Invalidated {deleted} cached {detector_name} detections after a configuration change")
+        return deleted
+
+# Global service instance
+detection_cache = DetectionCacheService()
@@ -0,0 +1,168 @@
+"""
+Detection Session Service for PhotoVault
+Keeps photo detection uploads and their detected regions in the database so
+every app worker can serve the preview and extraction requests of a session
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from photovault.models import DetectionSession
+from photovault.extensions import db
+from photovault.utils.enhanced_file_handler import delete_file_enhanced
+
+logger = logging.getLogger(__name__)
+
+class DetectionSessionStore:
+    """Shared, TTL-bound store of pending photo detection sessions"""
+    
+    def __init__(self, ttl: timedelta = timedelta(hours=1), sweep_interval: int = 300):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval  # Seconds between background sweeps
+        self._sweeper = None
+        self._sweeper_lock = threading.Lock()
+    
+    def create(self, user_id: int, file_path: str, original_filename: str,
+               detected_photos: List[Dict]) -> str:
+        """
+        Store an uploaded file with its detected regions
+        
+        Args:
+            user_id: Owner of the upload
+            file_path: Path of the uploaded file
+            original_filename: Name of the file as uploaded
+            detected_photos: Detected regions, reused on extraction
+            
+        Returns:
+            Session token
+        """
+        self._ensure_sweeper()
+        
+        session = DetectionSession(
+            token=str(uuid.uuid4()),
+            user_id=user_id,
+            file_path=file_path,
+            original_filename=original_filename,
+            detected_photos=json.dumps(detected_photos),
+            expires_at=datetime.utcnow() + self._get_ttl()
+        )
+        db.session.add(session)
+        db.session.commit()
+        return session.token
+    
+    def get(self, token: str) -> Optional[Dict]:
+        """
+        Look up a session
+        
+        Args:
+            token: Session token
+            
+        Returns:
+            Session info with user_id, file_path, original_filename, detected_photos
+            and an 'expired' flag, or None if the token is unknown
+        """
+        session = DetectionSession.query.filter_by(token=token).first()
+        if session is None:
+            return None
+        return {
+            'user_id': session.user_id,
+            'file_path': session.file_path,
+            'original_filename': session.original_filename,
+            'detected_photos': json.loads(session.detected_photos),
+            'expired': session.is_expired()
+        }
+    
+    def delete(self, token: str, delete_file: bool = True):
+        """
+        End a session, optionally removing its uploaded file
+        
+        Args:
+            token: Session token
+            delete_file: Whether to delete the uploaded file as well
+        """
+        session = DetectionSession.query.filter_by(token=token).first()
+        if session is None:
+            return
+        file_path = session.file_path
+        db.session.delete(session)
+        db.session.commit()
+        if delete_file:
+            self._delete_upload(file_path)
+    
+    def sweep_expired(self) -> int:
+        """
+        Remove expired sessions and their uploaded files
+        
+        Returns:
+            Number of removed sessions
+        """
+        now = datetime.utcnow()
+        expired = db.session.query(DetectionSession.id, DetectionSession.file_path).filter(
+            DetectionSession.expires_at < now
+        ).all()
+        
+        removed = 0
+        for session_id, file_path in expired:
+            # Only the worker whose delete succeeds removes the file
+            deleted = DetectionSession.query.filter(
+                DetectionSession.id == session_id,
+                DetectionSession.expires_at < now
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            if deleted:
+                removed += 1
+                self._delete_upload(file_path)
+                
+        if removed:
+            logger.info(f"Cleaned up {removed} expired detection sessions")
+        return removed
+    
+    def _delete_upload(self, file_path: str):
+        """Delete an uploaded file, tolerating files already removed"""
+        try:
+            if file_path and os.path.exists(file_path):
+                delete_file_enhanced(file_path)
+        except Exception as e:
+            logger.warning(f"Failed to clean up detection upload {file_path}: {e}")
+    
+    def _get_ttl(self) -> timedelta:
+        """Get the session lifetime, preferring the app config"""
+        from flask import current_app
+        return current_app.config.get('PHOTO_DETECTION_SESSION_TTL', self.ttl)
+    
+    def _ensure_sweeper(self):
+        """Start this process's background sweeper on first use"""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        with self._sweeper_lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            from flask import current_app
+            app = current_app._get_current_object()
+            interval = app.config.get('PHOTO_DETECTION_SWEEP_INTERVAL', self.sweep_interval)
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, args=(app, interval),
+                name='detection-session-sweeper', daemon=True
+            )
+            self._sweeper.start()
+    
+    def _sweep_loop(self, app, interval: int):
+        """Periodically sweep expired sessions in an app context"""
+        while True:
+            with app.app_context():
+                try:
+                    self.sweep_expired()
+                except Exception as e:
+                    logger.warning(f"Detection session sweep failed: {e}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+# Global store instance
+detection_sessions = DetectionSessionStore()
@@ -0,0 +1,379 @@
+"""
+Email Outbox Service for PhotoVault
+Requests queue email in the email_outbox table and return; a background sender
+claims due messages in batches and delivers them through SendGrid, SMTP or the
+console with rate limiting and exponential backoff between retries
+"""
+
+import time
+import uuid
+import random
+import smtplib
+import logging
+import threading
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import List, Optional
+from sqlalchemy import and_, event, or_, select, update
+from photovault.models import EmailOutbox, VaultInvitation
+from photovault.extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Seconds a sender owns claimed messages before another sender may take them over
+CLAIM_LEASE_SECONDS = 300
+
+# Longest wait between two delivery attempts
+MAX_RETRY_DELAY = 6 * 3600
+
+# Session.info key set when a transaction queues mail, so the sender wakes on commit
+WAKE_KEY = 'email_outbox_wake'
+
+class EmailDeliveryError(Exception):
+    """A transport could not deliver a message"""
+
+class SendGridTransport:
+    """Delivers through the SendGrid API, or a stand-in at SENDGRID_API_HOST"""
+    name = 'sendgrid'
+    
+    def __init__(self, default_sender: str):
+        from photovault.services.sendgrid_service import sendgrid_service
+        self.service = sendgrid_service
+        self.default_sender = default_sender
+    
+    def __enter__(self):
+        if not self.service.is_available():
+            raise EmailDeliveryError("SendGrid is not configured")
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+    
+    def send(self, message: EmailOutbox):
+        if not self.service.send_email(
+            to_email=message.to_email,
+            subject=message.subject,
+            html_content=message.html_content,
+            text_content=message.text_content,
+            from_email=message.from_email
+        ):
+            raise EmailDeliveryError("SendGrid did not accept the message")
+
+class SMTPTransport:
+    """Delivers over one SMTP connection per batch, e.g. to a local debugging server"""
+    name = 'smtp'
+    
+    def __init__(self, host: str, port: int, use_tls: bool, username: Optional[str], password: Optional[str],
+                 default_sender: str, timeout: int = 30):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.username = username
+        self.password = password
+        self.default_sender = default_sender
+        self.timeout = timeout
+        self.connection = None
+    
+    def __enter__(self):
+        self.connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                self.connection.starttls()
+            if self.username:
+                self.connection.login(self.username, self.password or '')
+        except Exception:
+            self.connection.close()
+            raise
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.connection.quit()
+        except smtplib.SMTPException:
+            self.connection.close()
+        self.connection = None
+        return False
+    
+    def send(self, message: EmailOutbox):
+        email = EmailMessage()
+        email['Subject'] = message.subject
+        email['From'] = message.from_email or self.default_sender
+        email['To'] = message.to_email
+        email.set_content(message.text_content or '')
+        if message.html_content:
+            email.add_alternative(message.html_content, subtype='html')
+        self.connection.send_message(email)
+
+class ConsoleTransport:
+    """Logs messages instead of sending them; only chosen automatically in debug mode"""
+    name = 'console'
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+    
+    def send(self, message: EmailOutbox):
+        # Bodies carry password reset and invitation tokens, so only the envelope is logged
+        logger.info(f"Console transport delivered email {message.id} to {message.to_email}: {message.subject}")
+
+class EmailOutboxService:
+    """Durable queue of outgoing email with a per-process background sender"""
+    
+    def __init__(self):
+        self._sender = None
+        self._sender_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._last_send = 0.0
+    
+    def init_app(self, app):
+        """
+        Wake this process's sender as soon as queued mail is committed
+        
+        Args:
+            app: Flask application
+        """
+        if not event.contains(db.session, 'after_commit', self._wake_after_commit):
+            event.listen(db.session, 'after_commit', self._wake_after_commit)
+    
+    def _wake_after_commit(self, session):
+        if session.info.pop(WAKE_KEY, False):
+            self._wake.set()
+    
+    def enqueue(self, to_email: str, subject: str, html_content: Optional[str] = None,
+                text_content: Optional[str] = None, category: str = 'general',
+                reference_id: Optional[int] = None, from_email: Optional[str] = None) -> EmailOutbox:
+        """
+        Queue an email in the current transaction; it is sent after the caller commits
+        
+        Args:
+            to_email: Recipient address
+            subject: Email subject
+            html_content: HTML body
+            text_content: Plain text body
+            category: Kind of email, for monitoring
+            reference_id: Row the email is about
+            from_email: Sender address (defaults to MAIL_DEFAULT_SENDER)
+            
+        Returns:
+            The queued EmailOutbox row
+        """
+        message = EmailOutbox(
+            category=category,
+            reference_id=reference_id,
+            to_email=to_email,
+            from_email=from_email,
+            subject=subject[:255],
+            html_content=html_content,
+            text_content=text_content,
+            status='pending',
+            attempts=0,
+            next_attempt_at=datetime.utcnow()
+        )
+        db.session.add(message)
+        db.session.info[WAKE_KEY] = True
+        self._ensure_sender()
+        return message
+    
+    def _transport(self, config):
+        """Transport named by EMAIL_TRANSPORT, or the first one configured"""
+        name = (config.get('EMAIL_TRANSPORT') or '').lower()
+        if not name:
+            from photovault.services.sendgrid_service import sendgrid_service
+            if sendgrid_service.is_available():
+                name = 'sendgrid'
+            elif config.get('MAIL_SERVER'):
+                name = 'smtp'
+            elif config.get('DEBUG'):
+                name = 'console'
+            else:
+                raise EmailDeliveryError("No email transport configured; set SENDGRID_API_KEY or MAIL_SERVER")
+                
+        sender = config.get('MAIL_DEFAULT_SENDER', 'noreply@photovault.com')
+        if name == 'sendgrid':
+            return SendGridTransport(sender)
+        if name == 'smtp':
+            return SMTPTransport(config.get('MAIL_SERVER') or 'localhost', config.get('MAIL_PORT', 587),
+                                 config.get('MAIL_USE_TLS', True), config.get('MAIL_USERNAME'),
+                                 config.get('MAIL_PASSWORD'), sender)
+        if name == 'console':
+            return ConsoleTransport()
+        raise EmailDeliveryError(f"Unknown email transport: {name}")
+    
+    def _claim(self, limit: int) -> List[EmailOutbox]:
+        """
+        Claim due messages for this sender
+        
+        The claim token is written by one UPDATE that re-checks the due
+        condition, so concurrent senders never claim the same message.
+        """
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        due = or_(
+            and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+            and_(EmailOutbox.status == 'sending', EmailOutbox.locked_until < now)
+        )
+        due_ids = select(EmailOutbox.id).where(due).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(limit)
+        db.session.execute(
+            update(EmailOutbox).where(EmailOutbox.id.in_(due_ids), due).values(
+                status='sending',
+                claimed_by=token,
+                locked_until=now + timedelta(seconds=CLAIM_LEASE_SECONDS),
+                attempts=EmailOutbox.attempts + 1
+            ),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        return EmailOutbox.query.filter_by(claimed_by=token, status='sending').order_by(EmailOutbox.id).all()
+    
+    def _throttle(self, rate_limit: float):
+        """Space deliveries of this process at least 1 / rate_limit seconds apart"""
+        if rate_limit > 0:
+            wait = self._last_send + 1.0 / rate_limit - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        self._last_send = time.monotonic()
+    
+    def _mark_sent(self, message: EmailOutbox):
+        message.status = 'sent'
+        message.sent_at = datetime.utcnow()
+        message.claimed_by = None
+        message.locked_until = None
+        message.last_error = None
+        
+        # Invitations record when their email actually went out, which also paces resends
+        if message.category == 'family_invitation' and message.reference_id:
+            invitation = db.session.get(VaultInvitation, message.reference_id)
+            if invitation is not None:
+                invitation.mark_as_sent()
+    
+    def has_pending(self, category: str, reference_id: int) -> bool:
+        """
+        Check whether an email about a row is still waiting to be delivered
+        
+        Args:
+            category: Kind of email
+            reference_id: Row the email is about
+            
+        Returns:
+            True if a pending or sending message exists
+        """
+        return db.session.query(EmailOutbox.query.filter(
+            EmailOutbox.category == category,
+            EmailOutbox.reference_id == reference_id,
+            EmailOutbox.status.in_(('pending', 'sending'))
+        ).exists()).scalar()
+    
+    def _retry_later(self, message: EmailOutbox, error: Exception, max_attempts: int, retry_base: int):
+        """Schedule the next attempt with exponential backoff and jitter, or give up"""
+        message.claimed_by = None
+        message.locked_until = None
+        message.last_error = str(error)[:2000]
+        if message.attempts >= max_attempts:
+            message.status = 'failed'
+            logger.error(f"Giving up on {message.category} email {message.id} to {message.to_email} "
+                         f"after {message.attempts} attempts: {error}")
+            return
+        delay = min(retry_base * 2 ** (message.attempts - 1), MAX_RETRY_DELAY) * random.uniform(0.8, 1.2)
+        message.status = 'pending'
+        message.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        logger.warning(f"Email {message.id} to {message.to_email} failed (attempt {message.attempts}), "
+                       f"retrying in {int(delay)}s: {error}")
+    
+    def process_batch(self) -> int:
+        """
+        Claim and deliver one batch of due messages
+        
+        Returns:
+            Number of messages claimed
+        """
+        from flask import current_app
+        config = current_app.config
+        max_attempts = config.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 8)
+        retry_base = config.get('EMAIL_OUTBOX_RETRY_BASE', 30)
+        
+        claimed = self._claim(config.get('EMAIL_OUTBOX_BATCH_SIZE', 50))
+        if not claimed:
+            return 0
+            
+        remaining = list(claimed)
+        try:
+            with self._transport(config) as transport:
+                while remaining:
+                    message = remaining[0]
+                    self._throttle(config.get('EMAIL_OUTBOX_RATE_LIMIT', 10))
+                    try:
+                        transport.send(message)
+                    except Exception as e:
+                        self._retry_later(message, e, max_attempts, retry_base)
+                    else:
+                        self._mark_sent(message)
+                        logger.info(f"Sent {message.category} email {message.id} to {message.to_email} via {transport.name}")
+                    remaining.pop(0)
+                    db.session.commit()
+        except Exception as e:
+            # The transport could not be opened, so nothing left in the batch was attempted
+            logger.error(f"Email transport unavailable: {e}")
+            for message in remaining:
+                self._retry_later(message, e, max_attempts, retry_base)
+            db.session.commit()
+        return len(claimed)
+    
+    def run(self, once: bool = False):
+        """
+        Deliver due messages until the outbox is drained, then keep polling unless once is set
+        
+        Must run in an app context.
+        """
+        from flask import current_app
+        interval = current_app.config.get('EMAIL_OUTBOX_POLL_INTERVAL', 5)
+        batch_size = current_app.config.get('EMAIL_OUTBOX_BATCH_SIZE', 50)
+        while True:
+            try:
+                claimed = self.process_batch()
+            except Exception as e:
+                logger.warning(f"Email outbox batch failed: {e}")
+                db.session.rollback()
+                claimed = 0
+            finally:
+                db.session.remove()
+            if claimed >= batch_size:
+                continue
+            if once:
+                return
+            self._wake.wait(interval)
+            self._wake.clear()
+    
+    def _ensure_sender(self):
+        """Start this process's background sender on first use"""
+        if self._sender is not None and self._sender.is_alive():
+            return
+        with self._sender_lock:
+            if self._sender is not None and self._sender.is_alive():
+                return
+            from flask import current_app
+            app = current_app._get_current_object()
+            self._sender = threading.Thread(target=self._sender_loop, args=(app,), name='email-outbox-sender', daemon=True)
+            self._sender.start()
+    
+    def _sender_loop(self, app):
+        with app.app_context():
+            self.run()
+
+def queue_family_invitation_email(invitation, vault_name: str, inviter_name: str) -> EmailOutbox:
+    """Queue the invitation email of a VaultInvitation"""
+    from photovault.services.sendgrid_service import render_family_invitation_email
+    subject, html_content, text_content = render_family_invitation_email(invitation.invitation_token, vault_name, inviter_name)
+    return email_outbox.enqueue(invitation.email, subject, html_content, text_content,
+                                category='family_invitation', reference_id=invitation.id)
+
+def queue_password_reset_email(user, token: str) -> EmailOutbox:
+    """Queue a password reset email"""
+    from photovault.services.sendgrid_service import render_password_reset_email
+    subject, html_content, text_content = render_password_reset_email(user, token)
+    return email_outbox.enqueue(user.email, subject, html_content, text_content,
+                                category='password_reset', reference_id=user.id)
+
+# Global service instance
+email_outbox = EmailOutboxService()
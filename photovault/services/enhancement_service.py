@@ -0,0 +1,632 @@
+"""
+Enhancement Service for PhotoVault
+Renders live editor previews on cached screen-sized proxies and runs the
+full-resolution enhancement of a photo as a background job on save
+"""
+
+import os
+import json
+import uuid
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from PIL import Image
+from photovault.models import Photo, EnhancementJob, EnhancementBatch
+from photovault.extensions import db
+from photovault.utils.enhancement_cache import enhancement_cache, canonical_settings, settings_key
+
+logger = logging.getLogger(__name__)
+
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    cv2 = None
+    OPENCV_AVAILABLE = False
+
+# Long edge (px) of the proxy the editor previews are rendered on
+DEFAULT_PREVIEW_MAX_DIMENSION = 1280
+
+# JPEG quality of the preview images sent to the editor
+PREVIEW_JPEG_QUALITY = 85
+
+# Rendered previews kept per proxy, so stepping back and forth through edits is instant
+PREVIEW_RENDERS_PER_PROXY = 16
+
+def photo_source_path(photo: Photo, upload_folder: str) -> str:
+    """
+    Resolve the original file of a photo (extracted photos store paths relative to the user folder)
+    
+    Args:
+        photo: Photo record
+        upload_folder: Configured upload folder
+        
+    Returns:
+        Absolute path of the original image
+    """
+    if os.path.isabs(photo.file_path):
+        return photo.file_path
+    return os.path.join(upload_folder, str(photo.user_id), photo.file_path)
+
+def validate_settings(settings: Optional[Dict]) -> Dict:
+    """
+    Check enhancement settings sent by a client
+    
+    Args:
+        settings: Requested settings
+        
+    Returns:
+        Canonical settings
+        
+    Raises:
+        ValueError: If a setting is invalid
+    """
+    from photovault.utils.image_enhancement import enhancer
+    return canonical_settings(settings, enhancer.default_settings)
+
+def enhanced_filename_for(photo_filename: str) -> str:
+    """Build a unique filename for an enhanced version of a photo"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    base_name = os.path.splitext(photo_filename)[0]
+    return f"{base_name}_enhanced_{timestamp}_{str(uuid.uuid4())[:8]}.jpg"
+
+def load_preview_proxy(image_path: str, max_dimension: int):
+    """
+    Decode an image straight to roughly screen size
+    
+    JPEGs are decoded at 1/2, 1/4 or 1/8 scale by libjpeg, so a large scan is
+    never fully decoded; the remainder is closed with an area resize.
+    
+    Args:
+        image_path: Path to the image
+        max_dimension: Long edge (px) of the proxy; 0 keeps full resolution
+        
+    Returns:
+        BGR uint8 array, or None if the image cannot be read
+    """
+    flags = cv2.IMREAD_COLOR
+    if max_dimension:
+        with Image.open(image_path) as header:
+            long_edge = max(header.size)
+        for factor, reduced_flag in ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                                     (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                     (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if long_edge // factor >= max_dimension:
+                flags = reduced_flag
+                break
+                
+    img = cv2.imread(image_path, flags)
+    if img is None:
+        return None
+        
+    height, width = img.shape[:2]
+    if max_dimension and max(height, width) > max_dimension:
+        scale = max_dimension / max(height, width)
+        img = cv2.resize(img, (max(1, round(width * scale)), max(1, round(height * scale))),
+                         interpolation=cv2.INTER_AREA)
+    return img
+
+class EnhancementPreviewCache:
+    """In-memory LRU of decoded preview proxies, kept per editor session"""
+    
+    def __init__(self, max_dimension: Optional[int] = None, max_sessions: int = 32,
+                 proxies_per_session: int = 2):
+        if max_dimension is None:
+            max_dimension = int(os.environ.get('ENHANCEMENT_PREVIEW_MAX_DIMENSION') or DEFAULT_PREVIEW_MAX_DIMENSION)
+        self.max_dimension = max_dimension
+        self.max_sessions = max(1, max_sessions)
+        self.proxies_per_session = max(1, proxies_per_session)
+        # session id -> OrderedDict of photo id -> (source mtime, proxy, settings key -> JPEG bytes),
+        # least recently used first
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _get_entry(self, session_id: str, photo_id: int, image_path: str) -> Optional[Tuple]:
+        """
+        Get the proxy entry of a photo for an editor session, decoding the proxy on a miss
+        
+        Args:
+            session_id: Editor session ID
+            photo_id: Photo ID
+            image_path: Path to the original image
+            
+        Returns:
+            (source mtime, proxy, rendered previews) tuple, or None if the image cannot be read
+        """
+        mtime = os.path.getmtime(image_path)
+        with self._lock:
+            proxies = self._sessions.get(session_id)
+            if proxies is not None:
+                self._sessions.move_to_end(session_id)
+                entry = proxies.get(photo_id)
+                if entry is not None and entry[0] == mtime:
+                    proxies.move_to_end(photo_id)
+                    return entry
+                    
+        # Decode outside the lock so other sessions keep rendering
+        proxy = load_preview_proxy(image_path, self.max_dimension)
+        if proxy is None:
+            return None
+            
+        entry = (mtime, proxy, OrderedDict())
+        with self._lock:
+            proxies = self._sessions.setdefault(session_id, OrderedDict())
+            self._sessions.move_to_end(session_id)
+            proxies[photo_id] = entry
+            proxies.move_to_end(photo_id)
+            while len(proxies) > self.proxies_per_session:
+                proxies.popitem(last=False)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return entry
+    
+    def render(self, session_id: str, photo_id: int, image_path: str, settings: Dict) -> Optional[bytes]:
+        """
+        Render enhancement settings on the cached proxy
+        
+        Args:
+            session_id: Editor session ID
+            photo_id: Photo ID
+            image_path: Path to the original image
+            settings: Enhancement settings, as for a full render
+            
+        Returns:
+            JPEG bytes of the preview, or None if the image cannot be read
+        """
+        from photovault.utils.image_enhancement import enhancer
+        
+        entry = self._get_entry(session_id, photo_id, image_path)
+        if entry is None:
+            return None
+        _, proxy, renders = entry
+        
+        preview_settings = canonical_settings(settings, enhancer.default_settings)
+        render_key = settings_key(preview_settings)
+        with self._lock:
+            preview = renders.get(render_key)
+            if preview is not None:
+                renders.move_to_end(render_key)
+                return preview
+                
+        # The engine may work in place, so it gets its own copy of the shared proxy
+        rendered = enhancer.engine.process(proxy.copy(), preview_settings)
+        success, encoded = cv2.imencode('.jpg', rendered, [cv2.IMWRITE_JPEG_QUALITY, PREVIEW_JPEG_QUALITY])
+        if not success:
+            return None
+        preview = encoded.tobytes()
+        
+        with self._lock:
+            renders[render_key] = preview
+            while len(renders) > PREVIEW_RENDERS_PER_PROXY:
+                renders.popitem(last=False)
+        return preview
+
+def _init_batch_worker(cache_dir: Optional[str], threads: int):
+    """Pool initializer: point the enhancer at the shared render cache and size its tile pool"""
+    from photovault.utils.image_enhancement import enhancer
+    from photovault.utils.enhancement_engine import TiledEnhancementEngine
+    
+    enhancement_cache.cache_dir = cache_dir
+    # Photos already run in parallel across processes, so each one gets a share of the cores
+    enhancer.engine = TiledEnhancementEngine(workers=threads)
+    logger.info(f"Batch enhancement worker {os.getpid()} ready")
+
+def _enhance_batch_photo(task: Tuple[int, str, str, Dict]) -> Dict:
+    """
+    Enhance one photo of a batch and create its thumbnail inside a worker process
+    
+    Args:
+        task: (job_id, source_path, output_path, settings) tuple
+        
+    Returns:
+        Result dictionary with the thumbnail and applied settings or an error message
+    """
+    from photovault.utils.image_enhancement import enhancer
+    from photovault.utils.file_handler import create_thumbnail
+    
+    job_id, source_path, output_path, settings = task
+    result = {'job_id': job_id, 'thumbnail_path': None, 'applied_settings': None, 'error': None}
+    
+    try:
+        _, result['applied_settings'] = enhancer.auto_enhance_photo(source_path, output_path, settings)
+        success, thumbnail_result = create_thumbnail(output_path)
+        if success:
+            result['thumbnail_path'] = thumbnail_result
+        else:
+            logger.error(f"Failed to create thumbnail for {output_path}: {thumbnail_result}")
+    except Exception as e:
+        logger.error(f"Batch enhancement failed for {source_path}: {e}")
+        result['error'] = str(e)
+        
+    return result
+
+class EnhancementJobService:
+    """Runs single full-resolution renders on a background thread pool and batches across a process pool"""
+    
+    def __init__(self, workers: Optional[int] = None, batch_processes: Optional[int] = None,
+                 flush_every: int = 16):
+        self.workers = workers
+        self.batch_processes = batch_processes
+        self.flush_every = max(1, flush_every)  # Finished photos written per bulk update
+        self._executor = None
+        self._batch_runner = None
+        self._batch_pool = None
+        self._lock = threading.Lock()
+    
+    def _get_executor(self, app) -> ThreadPoolExecutor:
+        """Create the thread pool on first use; the engine already spreads each render over all cores"""
+        with self._lock:
+            if self._executor is None:
+                workers = self.workers or app.config.get('ENHANCEMENT_JOB_WORKERS') or 2
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='enhancement-job')
+            return self._executor
+    
+    def _get_batch_runner(self) -> ThreadPoolExecutor:
+        """Create the single thread batches queue on, so one batch at a time uses the process pool"""
+        with self._lock:
+            if self._batch_runner is None:
+                self._batch_runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix='enhancement-batch')
+            return self._batch_runner
+    
+    def _get_batch_pool(self, app):
+        """Start the batch worker processes on first use and keep them for every later batch"""
+        if self._batch_pool is None:
+            cpus = os.cpu_count() or 1
+            processes = self.batch_processes or app.config.get('ENHANCEMENT_BATCH_WORKERS') or cpus
+            
+            # Spawn keeps database connections and web worker state out of the children
+            context = multiprocessing.get_context('spawn')
+            self._batch_pool = context.Pool(
+                processes=processes,
+                initializer=_init_batch_worker,
+                initargs=(enhancement_cache.get_cache_dir(), max(1, cpus // processes))
+            )
+            logger.info(f"Started batch enhancement pool with {processes} workers")
+        return self._batch_pool
+    
+    def _discard_batch_pool(self):
+        """Terminate the batch worker processes after a failure; the next batch starts new ones"""
+        if self._batch_pool is not None:
+            self._batch_pool.terminate()
+            self._batch_pool.join()
+            self._batch_pool = None
+    
+    def submit(self, photo: Photo, settings: Dict) -> EnhancementJob:
+        """
+        Queue the full-resolution render of a photo
+        
+        Args:
+            photo: Photo to enhance
+            settings: Enhancement settings
+            
+        Returns:
+            The new job
+        """
+        from flask import current_app
+        app = current_app._get_current_object()
+        
+        job = EnhancementJob(user_id=photo.user_id, photo_id=photo.id, settings=json.dumps(settings or {}))
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+        
+        def run():
+            with app.app_context():
+                try:
+                    self.run_job(job_id)
+                finally:
+                    db.session.remove()
+                    
+        self._get_executor(app).submit(run)
+        return job
+    
+    def run_job(self, job_id: int) -> Optional[EnhancementJob]:
+        """
+        Render a job at full resolution and point the photo at the result
+        
+        Args:
+            job_id: Job to run
+            
+        Returns:
+            The finished job, or None if it does not exist
+        """
+        from flask import current_app
+        from photovault.utils.image_enhancement import enhancer
+        from photovault.utils.file_handler import create_thumbnail
+        
+        job = db.session.get(EnhancementJob, job_id)
+        if job is None:
+            return None
+            
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+        
+        try:
+            photo = db.session.get(Photo, job.photo_id)
+            if photo is None:
+                raise ValueError('Photo no longer exists')
+                
+            source_path = photo_source_path(photo, current_app.config['UPLOAD_FOLDER'])
+            user_upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], str(photo.user_id))
+            os.makedirs(user_upload_dir, exist_ok=True)
+            
+            enhanced_filename = enhanced_filename_for(photo.filename)
+            enhanced_filepath = os.path.join(user_upload_dir, enhanced_filename)
+            
+            _, applied_settings = enhancer.auto_enhance_photo(source_path, enhanced_filepath,
+                                                              json.loads(job.settings or '{}'))
+                                                              
+            success, thumbnail_result = create_thumbnail(enhanced_filepath)
+            if not success:
+                logger.error(f"Failed to create thumbnail: {thumbnail_result}")
+                thumbnail_result = None
+                
+            photo.edited_filename = enhanced_filename
+            photo.thumbnail_path = thumbnail_result
+            photo.updated_at = datetime.utcnow()
+            
+            job.settings = json.dumps(applied_settings)
+            job.enhanced_filename = enhanced_filename
+            job.thumbnail_filename = os.path.basename(thumbnail_result) if thumbnail_result else None
+            job.status = 'completed'
+            logger.info(f"Enhancement job {job_id} completed for photo {photo.id}: {enhanced_filename}")
+        except Exception as e:
+            logger.error(f"Enhancement job {job_id} failed: {e}")
+            db.session.rollback()
+            job.status = 'failed'
+            job.error = str(e)
+            
+        job.completed_at = datetime.utcnow()
+        db.session.commit()
+        return job
+    
+    def get_status(self, job_id: int, user_id: int) -> Optional[Dict]:
+        """
+        Get the state of a job
+        
+        Args:
+            job_id: Job ID
+            user_id: Owner of the job
+            
+        Returns:
+            Status dictionary, or None if the user has no such job
+        """
+        from flask import url_for
+        
+        job = EnhancementJob.query.filter_by(id=job_id, user_id=user_id).first()
+        if job is None:
+            return None
+            
+        status = {
+            'job_id': job.id,
+            'photo_id': job.photo_id,
+            'status': job.status,
+            'error': job.error,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'completed_at': job.completed_at.isoformat() if job.completed_at else None
+        }
+        if job.status == 'completed':
+            status.update({
+                'enhanced_filename': job.enhanced_filename,
+                'enhanced_url': url_for('gallery.uploaded_file', user_id=job.user_id, filename=job.enhanced_filename),
+                'thumbnail_url': url_for('gallery.uploaded_file', user_id=job.user_id,
+                                         filename=job.thumbnail_filename) if job.thumbnail_filename else None,
+                'applied_settings': json.loads(job.settings or '{}')
+            })
+        return status
+    
+    def create_batch(self, user_id: int, photos: List[Photo], settings: Dict) -> EnhancementBatch:
+        """
+        Create a batch and one job per photo
+        
+        Args:
+            user_id: Owner of the photos
+            photos: Photos to enhance
+            settings: Enhancement settings applied to every photo
+            
+        Returns:
+            The new batch
+        """
+        settings_json = json.dumps(settings or {})
+        batch = EnhancementBatch(user_id=user_id, settings=settings_json, total_photos=len(photos))
+        db.session.add(batch)
+        db.session.flush()
+        
+        db.session.bulk_insert_mappings(EnhancementJob, [{
+            'user_id': user_id,
+            'photo_id': photo.id,
+            'batch_id': batch.id,
+            'settings': settings_json,
+            'status': 'pending',
+            'created_at': datetime.utcnow()
+        } for photo in photos])
+        db.session.commit()
+        return batch
+    
+    def start_batch(self, batch_id: int):
+        """Queue a batch behind the batches already running in this process"""
+        from flask import current_app
+        app = current_app._get_current_object()
+        
+        def run():
+            with app.app_context():
+                try:
+                    self.run_batch(batch_id)
+                finally:
+                    db.session.remove()
+                    
+        self._get_batch_runner().submit(run)
+    
+    def run_batch(self, batch_id: int) -> Optional[EnhancementBatch]:
+        """
+        Enhance every pending photo of a batch, writing edited versions and progress in bulk
+        
+        Args:
+            batch_id: Batch to run
+            
+        Returns:
+            The finished batch, or None if it does not exist
+        """
+        from flask import current_app
+        
+        batch = db.session.get(EnhancementBatch, batch_id)
+        if batch is None:
+            return None
+            
+        try:
+            batch.status = 'running'
+            batch.started_at = batch.started_at or datetime.utcnow()
+            db.session.commit()
+            
+            rows = db.session.query(EnhancementJob.id, EnhancementJob.photo_id, Photo.filename, Photo.file_path).join(
+                Photo, Photo.id == EnhancementJob.photo_id
+            ).filter(
+                EnhancementJob.batch_id == batch_id,
+                EnhancementJob.status == 'pending'
+            ).order_by(EnhancementJob.id).all()
+            
+            upload_folder = current_app.config['UPLOAD_FOLDER']
+            user_upload_dir = os.path.join(upload_folder, str(batch.user_id))
+            os.makedirs(user_upload_dir, exist_ok=True)
+            
+            settings = json.loads(batch.settings or '{}')
+            jobs = {}
+            tasks = []
+            for row in rows:
+                source_path = row.file_path if os.path.isabs(row.file_path) else os.path.join(user_upload_dir, row.file_path)
+                enhanced_filename = enhanced_filename_for(row.filename)
+                jobs[row.id] = {'photo_id': row.photo_id, 'enhanced_filename': enhanced_filename}
+                tasks.append((row.id, source_path, os.path.join(user_upload_dir, enhanced_filename), settings))
+                
+            pending = []
+            if tasks:
+                try:
+                    for result in self._get_batch_pool(current_app).imap_unordered(_enhance_batch_photo, tasks):
+                        pending.append(result)
+                        if len(pending) >= self.flush_every:
+                            self._store_batch_results(batch, jobs, pending)
+                            pending = []
+                except Exception:
+                    self._discard_batch_pool()
+                    raise
+                    
+            self._store_batch_results(batch, jobs, pending)
+            batch.status = 'completed'
+        except Exception as e:
+            logger.error(f"Enhancement batch {batch_id} failed: {e}")
+            db.session.rollback()
+            batch.status = 'failed'
+            batch.error = str(e)
+        finally:
+            # Jobs the batch never finished would otherwise stay pending forever
+            self._fail_unfinished_jobs(batch, 'Batch stopped before this photo was enhanced')
+            batch.completed_at = datetime.utcnow()
+            db.session.commit()
+            
+        logger.info(f"Enhancement batch {batch_id} {batch.status}: {batch.processed_photos}/{batch.total_photos} photos, "
+                    f"{batch.failed_photos} failed")
+        return batch
+    
+    def _fail_unfinished_jobs(self, batch: EnhancementBatch, error: str):
+        """Mark the batch's jobs that are still pending or running as failed and count them as processed"""
+        unfinished = EnhancementJob.query.filter(
+            EnhancementJob.batch_id == batch.id,
+            EnhancementJob.status.in_(('pending', 'running'))
+        ).update({
+            'status': 'failed',
+            'error': error,
+            'completed_at': datetime.utcnow()
+        }, synchronize_session=False)
+        if unfinished:
+            batch.processed_photos += unfinished
+            batch.failed_photos += unfinished
+    
+    def _store_batch_results(self, batch: EnhancementBatch, jobs: Dict, results: List[Dict]):
+        """Point the photos at their edited versions and finish their jobs in bulk, then advance the batch counters"""
+        if not results:
+            return
+            
+        photo_updates = []
+        job_updates = []
+        now = datetime.utcnow()
+        failed = 0
+        
+        for result in results:
+            job = jobs[result['job_id']]
+            thumbnail_path = result['thumbnail_path']
+            if result['error']:
+                failed += 1
+                job_updates.append({
+                    'id': result['job_id'],
+                    'status': 'failed',
+                    'error': result['error'],
+                    'completed_at': now
+                })
+                continue
+                
+            photo_updates.append({
+                'id': job['photo_id'],
+                'edited_filename': job['enhanced_filename'],
+                'thumbnail_path': thumbnail_path,
+                'updated_at': now
+            })
+            job_updates.append({
+                'id': result['job_id'],
+                'status': 'completed',
+                'settings': json.dumps(result['applied_settings']),
+                'enhanced_filename': job['enhanced_filename'],
+                'thumbnail_filename': os.path.basename(thumbnail_path) if thumbnail_path else None,
+                'completed_at': now
+            })
+            
+        if photo_updates:
+            db.session.bulk_update_mappings(Photo, photo_updates)
+        db.session.bulk_update_mappings(EnhancementJob, job_updates)
+        batch.processed_photos += len(results)
+        batch.failed_photos += failed
+        db.session.commit()
+    
+    def get_batch_status(self, batch_id: int, user_id: int) -> Optional[Dict]:
+        """
+        Get a batch's progress with the outcome of each photo
+        
+        Args:
+            batch_id: Batch ID
+            user_id: Owner of the batch
+            
+        Returns:
+            Status dictionary, or None if the user has no such batch
+        """
+        from flask import url_for
+        
+        batch = EnhancementBatch.query.filter_by(id=batch_id, user_id=user_id).first()
+        if batch is None:
+            return None
+            
+        return {
+            'batch_id': batch.id,
+            'status': batch.status,
+            'total_photos': batch.total_photos,
+            'processed_photos': batch.processed_photos,
+            'failed_photos': batch.failed_photos,
+            'progress': round(batch.processed_photos / batch.total_photos * 100, 1) if batch.total_photos else 100.0,
+            'error': batch.error,
+            'created_at': batch.created_at.isoformat() if batch.created_at else None,
+            'completed_at': batch.completed_at.isoformat() if batch.completed_at else None,
+            'photos': [{
+                'photo_id': job.photo_id,
+                'status': job.status,
+                'error': job.error,
+                'thumbnail_url': url_for('gallery.uploaded_file', user_id=job.user_id,
+                                         filename=job.thumbnail_filename) if job.thumbnail_filename else None
+            } for job in batch.jobs.order_by(EnhancementJob.id)]
+        }
+
+# Global service instances
+enhancement_previews = EnhancementPreviewCache()
+enhancement_jobs = EnhancementJobService()
@@ -0,0 +1,229 @@
+"""
+Face Clustering Service for PhotoVault
+Groups similar unassigned faces so a person can be tagged on a whole cluster at once
+"""
+
+import logging
+from typing import List, Dict
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from photovault.models import Photo, Person, PhotoPerson
+from photovault.extensions import db
+from photovault.utils.face_recognition import face_recognizer, encoding_from_bytes
+
+logger = logging.getLogger(__name__)
+
+class FaceClusteringService:
+    """Offline clustering of unassigned face encodings and bulk cluster tagging"""
+    
+    def __init__(self, max_distance: float = 0.25, block_size: int = 1024):
+        self.max_distance = max_distance  # Cosine distance below which two faces are linked
+        self.block_size = block_size      # Rows of the distance matrix computed at a time
+    
+    def cluster_unknown_faces(self, user_id: int) -> Dict:
+        """
+        Recompute clusters over all unassigned faces of a user
+        
+        Args:
+            user_id: User whose unassigned faces are clustered
+            
+        Returns:
+            Summary with face and cluster counts
+        """
+        rows = db.session.query(PhotoPerson.id, PhotoPerson.face_encoding).join(Photo).filter(
+            Photo.user_id == user_id,
+            PhotoPerson.person_id.is_(None),
+            PhotoPerson.face_encoding.isnot(None)
+        ).order_by(PhotoPerson.id).all()
+        
+        face_ids = []
+        encodings = []
+        for face_id, data in rows:
+            encoding = encoding_from_bytes(data)
+            if encoding is not None and (not encodings or len(encoding) == len(encodings[0])):
+                face_ids.append(face_id)
+                encodings.append(encoding)
+                
+        labels = self._cluster_encodings(np.vstack(encodings)) if encodings else np.array([], dtype=np.int64)
+        
+        # Label clusters by their lowest face id; singletons are not worth suggesting
+        cluster_members = {}
+        for index, label in enumerate(labels):
+            cluster_members.setdefault(int(label), []).append(face_ids[index])
+            
+        assignments = {}
+        clusters = 0
+        for members in cluster_members.values():
+            if len(members) < 2:
+                continue
+            clusters += 1
+            cluster_id = min(members)
+            for face_id in members:
+                assignments[face_id] = cluster_id
+                
+        # Reset the user's previous clusters, then write the new ones in bulk
+        stale_ids = [face_id for (face_id,) in db.session.query(PhotoPerson.id).join(Photo).filter(
+            Photo.user_id == user_id,
+            PhotoPerson.cluster_id.isnot(None)
+        )]
+        if stale_ids:
+            PhotoPerson.query.filter(PhotoPerson.id.in_(stale_ids)).update(
+                {PhotoPerson.cluster_id: None}, synchronize_session=False
+            )
+        if assignments:
+            db.session.bulk_update_mappings(PhotoPerson, [
+                {'id': face_id, 'cluster_id': cluster_id} for face_id, cluster_id in assignments.items()
+            ])
+        db.session.commit()
+        
+        logger.info(f"Clustered {len(face_ids)} unassigned faces for user {user_id} into {clusters} clusters")
+        return {
+            'faces': len(face_ids),
+            'clustered_faces': len(assignments),
+            'clusters': clusters
+        }
+    
+    def _cluster_encodings(self, encodings: np.ndarray) -> np.ndarray:
+        """
+        Link faces whose cosine distance is within max_distance and return
+        connected-component labels, computing the distance matrix block by block
+        
+        Args:
+            encodings: Matrix with one face encoding per row
+            
+        Returns:
+            Cluster label per row
+        """
+        encodings = encodings.astype(np.float32)
+        norms = np.linalg.norm(encodings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        normalized = encodings / norms
+        
+        count = len(normalized)
+        min_similarity = 1.0 - self.max_distance
+        sources = []
+        targets = []
+        for start in range(0, count, self.block_size):
+            block = normalized[start:start + self.block_size]
+            rows, cols = np.nonzero(block @ normalized.T >= min_similarity)
+            rows += start
+            # Each pair once; the graph is treated as undirected
+            upper = cols > rows
+            sources.append(rows[upper])
+            targets.append(cols[upper])
+            
+        sources = np.concatenate(sources)
+        graph = coo_matrix((np.ones(len(sources), dtype=np.int8), (sources, np.concatenate(targets))),
+                           shape=(count, count))
+        _, labels = connected_components(graph, directed=False)
+        return labels
+    
+    def get_clusters(self, user_id: int, sample_size: int = 6) -> List[Dict]:
+        """
+        List a user's face clusters, largest first
+        
+        Args:
+            user_id: User ID
+            sample_size: Number of sample faces returned per cluster
+            
+        Returns:
+            List of clusters with face counts and sample faces
+        """
+        faces = db.session.query(
+            PhotoPerson.id, PhotoPerson.cluster_id, PhotoPerson.photo_id, PhotoPerson.confidence,
+            PhotoPerson.face_box_x, PhotoPerson.face_box_y,
+            PhotoPerson.face_box_width, PhotoPerson.face_box_height
+        ).join(Photo).filter(
+            Photo.user_id == user_id,
+            PhotoPerson.person_id.is_(None),
+            PhotoPerson.cluster_id.isnot(None)
+        ).order_by(PhotoPerson.cluster_id, PhotoPerson.confidence.desc()).all()
+        
+        clusters = {}
+        for face in faces:
+            cluster = clusters.setdefault(face.cluster_id, {
+                'cluster_id': face.cluster_id,
+                'face_count': 0,
+                'faces': []
+            })
+            cluster['face_count'] += 1
+            if len(cluster['faces']) < sample_size:
+                cluster['faces'].append({
+                    'tag_id': face.id,
+                    'photo_id': face.photo_id,
+                    'thumbnail_url': f"/api/thumbnail/{face.photo_id}",
+                    'detection_confidence': face.confidence or 0.0,
+                    'bounding_box': {
+                        'x': face.face_box_x,
+                        'y': face.face_box_y,
+                        'width': face.face_box_width,
+                        'height': face.face_box_height
+                    }
+                })
+                
+        return sorted(clusters.values(), key=lambda c: -c['face_count'])
+    
+    def assign_cluster(self, user_id: int, cluster_id: int, person: Person,
+                       training_samples: int = 5) -> Dict:
+        """
+        Assign a person to every face of a cluster with one bulk update
+        
+        Args:
+            user_id: Owner of the faces
+            cluster_id: Cluster to assign
+            person: Person to tag
+            training_samples: Number of the cluster's encodings added as recognition training data
+            
+        Returns:
+            Summary with tagged and skipped face counts
+        """
+        members = db.session.query(
+            PhotoPerson.id, PhotoPerson.photo_id, PhotoPerson.face_encoding
+        ).join(Photo).filter(
+            Photo.user_id == user_id,
+            PhotoPerson.cluster_id == cluster_id,
+            PhotoPerson.person_id.is_(None)
+        ).order_by(PhotoPerson.confidence.desc()).all()
+        
+        if not members:
+            return {'tagged': 0, 'skipped': 0}
+            
+        # A person can only be tagged once per photo
+        already_tagged = {photo_id for (photo_id,) in db.session.query(PhotoPerson.photo_id).filter(
+            PhotoPerson.person_id == person.id,
+            PhotoPerson.photo_id.in_({member.photo_id for member in members})
+        )}
+        
+        tag_ids = []
+        training_encodings = []
+        for member in members:
+            if member.photo_id in already_tagged:
+                continue
+            already_tagged.add(member.photo_id)
+            tag_ids.append(member.id)
+            if len(training_encodings) < training_samples and member.face_encoding:
+                training_encodings.append({'encoding': encoding_from_bytes(member.face_encoding)})
+                
+        if tag_ids:
+            PhotoPerson.query.filter(PhotoPerson.id.in_(tag_ids)).update({
+                PhotoPerson.person_id: person.id,
+                PhotoPerson.manually_tagged: True,
+                PhotoPerson.verified: True,
+                PhotoPerson.cluster_id: None
+            }, synchronize_session=False)
+        db.session.commit()
+        
+        # Improve future recognition with the stored encodings, no image decode needed
+        if training_encodings and face_recognizer.is_available():
+            face_recognizer.add_person_encodings(person.id, person.name, training_encodings)
+            
+            # Faces outside the cluster may now match the person as well
+            from photovault.services.face_detection_service import face_detection_service
+            face_detection_service.rematch_unassigned_faces(person)
+            
+        logger.info(f"Tagged {len(tag_ids)} faces of cluster {cluster_id} as {person.name}")
+        return {'tagged': len(tag_ids), 'skipped': len(members) - len(tag_ids)}
+
+# Global service instance
+face_clustering_service = FaceClusteringService()
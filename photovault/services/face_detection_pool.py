@@ -0,0 +1,297 @@
+"""
+Face Detection Worker Pool for PhotoVault
+Runs face detection across worker processes that each load the models once
+"""
+
+import os
+import logging
+import multiprocessing
+from typing import Callable, List, Dict, Optional, Iterable, Iterator, Tuple
+import cv2
+from photovault.models import Photo, Person, PhotoPerson
+from photovault.extensions import db
+from photovault.utils.face_detection import FaceDetector, face_detector
+from photovault.utils.face_recognition import FaceRecognizer, face_recognizer, encoding_to_bytes, encoding_from_bytes
+from photovault.services.detection_cache_service import detection_cache, compute_content_hash
+from photovault.services.face_detection_service import faces_to_cache, faces_from_cache
+
+logger = logging.getLogger(__name__)
+
+# Per-process detector and recognizer, created once by the pool initializer
+_worker_detector = None
+_worker_recognizer = None
+
+def _init_worker(max_dimension: Optional[int]):
+    """Pool initializer: load the detection and recognition models once per process"""
+    global _worker_detector, _worker_recognizer
+    _worker_detector = FaceDetector(max_dimension=max_dimension, preload=True)
+    _worker_recognizer = FaceRecognizer(preload=True)
+    logger.info(f"Face detection worker {os.getpid()} ready")
+
+def _detect_batch(batch: List[Tuple[int, str]]) -> List[Dict]:
+    """
+    Detect and encode faces for a batch of photos inside a worker process
+    
+    Args:
+        batch: List of (photo_id, file_path) tuples
+        
+    Returns:
+        One result dictionary per photo with its raw (unvalidated) faces or an error message
+    """
+    results = []
+    decoded = []
+    
+    for photo_id, file_path in batch:
+        image = cv2.imread(file_path) if file_path and os.path.exists(file_path) else None
+        if image is None:
+            results.append({'photo_id': photo_id, 'faces': [], 'error': 'Could not load image'})
+        else:
+            decoded.append((photo_id, image))
+            
+    try:
+        faces_per_image = _worker_detector.detect_faces_in_images([image for _, image in decoded])
+    except Exception as e:
+        logger.error(f"Batch face detection failed: {e}")
+        results.extend({'photo_id': photo_id, 'faces': [], 'error': str(e)} for photo_id, _ in decoded)
+        return results
+        
+    for (photo_id, image), faces in zip(decoded, faces_per_image):
+        try:
+            # Matching happens in the parent, which also serves cached photos
+            if faces and _worker_recognizer.is_available():
+                recognitions = _worker_recognizer.recognize_faces_in_image(image, faces)
+                for face, recognition in zip(faces, recognitions):
+                    face['face_encoding'] = encoding_to_bytes(recognition['encoding'])
+            results.append({'photo_id': photo_id, 'faces': faces, 'error': None})
+        except Exception as e:
+            logger.error(f"Face detection failed for photo {photo_id}: {e}")
+            results.append({'photo_id': photo_id, 'faces': [], 'error': str(e)})
+            
+    return results
+
+class FaceDetectionPool:
+    """Process pool for library-wide face detection with preloaded models"""
+    
+    def __init__(self, processes: Optional[int] = None, batch_size: int = 8,
+                 max_dimension: Optional[int] = None):
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+        self.max_dimension = max_dimension
+        self._pool = None
+    
+    def _get_pool(self):
+        """Start the worker processes on first use"""
+        if self._pool is None:
+            # Spawn keeps database connections and web worker state out of the children
+            context = multiprocessing.get_context('spawn')
+            self._pool = context.Pool(
+                processes=self.processes,
+                initializer=_init_worker,
+                initargs=(self.max_dimension,)
+            )
+            logger.info(f"Started face detection pool with {self.processes} workers")
+        return self._pool
+    
+    def close(self):
+        """Shut down the worker processes"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+    
+    def detect(self, items: Iterable[Tuple[int, str]]) -> Iterator[List[Dict]]:
+        """
+        Queue (photo_id, file_path) items in batches and yield results as batches finish
+        
+        Args:
+            items: Iterable of (photo_id, file_path) tuples
+            
+        Returns:
+            Iterator of per-batch result lists
+        """
+        batches = []
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                batches.append(batch)
+                batch = []
+        if batch:
+            batches.append(batch)
+            
+        if not batches:
+            return iter([])
+            
+        return self._get_pool().imap_unordered(_detect_batch, batches)
+    
+    def scan_photos(self, photo_ids: Optional[List[int]] = None, user_id: Optional[int] = None,
+                    only_unprocessed: bool = True, progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Detect faces in photos and store the detections as PhotoPerson rows in bulk
+        
+        Args:
+            photo_ids: Specific photos to scan (defaults to all matching photos)
+            user_id: Restrict the scan to one user's photos
+            only_unprocessed: Skip photos that already have face detections
+            progress: Called with the running summary before the first and after every stored chunk
+            
+        Returns:
+            Summary with total and processed photo counts, stored faces and errors
+        """
+        query = db.session.query(Photo.id, Photo.file_path, Photo.user_id)
+        if user_id is not None:
+            query = query.filter(Photo.user_id == user_id)
+        if photo_ids:
+            query = query.filter(Photo.id.in_(photo_ids))
+        if only_unprocessed:
+            query = query.filter(~db.session.query(PhotoPerson.id).filter(
+                PhotoPerson.photo_id == Photo.id
+            ).exists())
+            
+        photo_rows = query.order_by(Photo.id).all()
+        photo_owners = {row.id: row.user_id for row in photo_rows}
+        
+        # Recognition matches come from a shared encodings file, so only accept
+        # people that belong to the photo's owner
+        owner_people = {}
+        for person_id, person_user_id in db.session.query(Person.id, Person.user_id).filter(
+            Person.user_id.in_(set(photo_owners.values()))
+        ):
+            owner_people.setdefault(person_user_id, set()).add(person_id)
+            
+        results = {
+            'total': len(photo_rows),
+            'processed': 0,
+            'faces_found': 0,
+            'cached': 0,
+            'errors': []
+        }
+        
+        if progress is not None:
+            progress(results)
+            
+        cache_key = self._get_cache_key()
+        chunk_size = self.batch_size * self.processes
+        for start in range(0, len(photo_rows), chunk_size):
+            chunk = photo_rows[start:start + chunk_size]
+            
+            # Only photos without cached detections are sent to the workers
+            hashes = {row.id: compute_content_hash(row.file_path) for row in chunk}
+            cached = detection_cache.get_many(hashes.values(), cache_key)
+            
+            chunk_results = []
+            misses = []
+            for row in chunk:
+                content_hash = hashes[row.id]
+                if content_hash in cached:
+                    chunk_results.append({'photo_id': row.id, 'faces': faces_from_cache(cached[content_hash]), 'error': None})
+                else:
+                    misses.append((row.id, row.file_path))
+            results['cached'] += len(chunk_results)
+            
+            new_entries = {}
+            for batch_results in self.detect(misses):
+                for result in batch_results:
+                    if not result['error']:
+                        new_entries[hashes[result['photo_id']]] = faces_to_cache(result['faces'])
+                chunk_results.extend(batch_results)
+            detection_cache.put_many(new_entries, cache_key)
+            
+            for result in chunk_results:
+                result['faces'] = self._recognize_faces(result['faces'])
+                
+            try:
+                faces_stored = self._store_batch(chunk_results, photo_owners, owner_people)
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"Error storing face detections: {e}")
+                db.session.rollback()
+                results['errors'].extend(f"Photo {result['photo_id']}: {str(e)}" for result in chunk_results)
+            else:
+                for result in chunk_results:
+                    if result['error']:
+                        results['errors'].append(f"Photo {result['photo_id']}: {result['error']}")
+                    else:
+                        results['processed'] += 1
+                results['faces_found'] += faces_stored
+                
+            if progress is not None:
+                progress(results)
+            
+        logger.info(f"Face scan complete: {results['processed']} photos ({results['cached']} cached), "
+                    f"{results['faces_found']} faces, {len(results['errors'])} errors")
+        return results
+    
+    def _get_cache_key(self) -> str:
+        """Detection cache key for the detector configuration the workers run with"""
+        detector = FaceDetector(max_dimension=self.max_dimension)
+        return f"faces:{detector.get_version_key()}:{FaceRecognizer.ENCODING_VERSION}"
+    
+    def _recognize_faces(self, faces: List[Dict]) -> List[Dict]:
+        """Validate raw detections and match their encodings against the known people"""
+        faces = face_detector.validate_face_detection(faces)
+        for face in faces:
+            face['recognition'] = None
+            encoding = encoding_from_bytes(face.get('face_encoding'))
+            if encoding is not None and face_recognizer.is_available():
+                face['recognition'] = face_recognizer.match_encoding(encoding)
+        return faces
+    
+    def _store_batch(self, batch_results: List[Dict], photo_owners: Dict[int, int],
+                     owner_people: Dict[int, set]) -> int:
+        """Insert the PhotoPerson rows for one batch of detection results"""
+        photo_ids = [result['photo_id'] for result in batch_results if result['faces']]
+        if not photo_ids:
+            return 0
+            
+        # A person can only be tagged once per photo
+        taken = set(db.session.query(PhotoPerson.photo_id, PhotoPerson.person_id).filter(
+            PhotoPerson.photo_id.in_(photo_ids),
+            PhotoPerson.person_id.isnot(None)
+        ).all())
+        
+        rows = []
+        for result in batch_results:
+            photo_id = result['photo_id']
+            allowed_people = owner_people.get(photo_owners.get(photo_id), set())
+            
+            # Strongest match first so it keeps the person when several faces match
+            faces = sorted(result['faces'], key=lambda f: -(f['recognition'] or {}).get('confidence', 0.0))
+            for face in faces:
+                recognition = face['recognition']
+                person_id = None
+                if recognition and recognition['person_id'] in allowed_people \
+                        and (photo_id, recognition['person_id']) not in taken:
+                    person_id = recognition['person_id']
+                    taken.add((photo_id, person_id))
+                    
+                rows.append({
+                    'photo_id': photo_id,
+                    'person_id': person_id,
+                    'confidence': recognition['confidence'] if person_id else face['confidence'],
+                    'face_box_x': face['x'],
+                    'face_box_y': face['y'],
+                    'face_box_width': face['width'],
+                    'face_box_height': face['height'],
+                    'manually_tagged': False,
+                    'verified': person_id is not None,
+                    'face_encoding': face.get('face_encoding')
+                })
+                
+        if rows:
+            db.session.bulk_insert_mappings(PhotoPerson, rows)
+        return len(rows)
+
+_face_detection_pool = None
+
+def get_face_detection_pool() -> FaceDetectionPool:
+    """Get the process-wide face detection pool, configured from the app"""
+    global _face_detection_pool
+    if _face_detection_pool is None:
+        from flask import current_app
+        _face_detection_pool = FaceDetectionPool(
+            processes=current_app.config.get('FACE_DETECTION_WORKERS'),
+            batch_size=current_app.config.get('FACE_DETECTION_BATCH_SIZE', 8),
+            max_dimension=current_app.config.get('FACE_DETECTION_MAX_DIMENSION')
+        )
+    return _face_detection_pool
@@ -4,16 +4,67 @@ Integrates automatic face detection with photo uploads and person assignment
 """
 
 import os
+import cv2
+import base64
+import numpy as np
 import logging
 from typing import List, Dict, Optional, Tuple
 from flask import current_app
 from photovault.utils.face_detection import face_detector
-from photovault.utils.face_recognition import face_recognizer
+from photovault.utils.face_recognition import face_recognizer, encoding_to_bytes, encoding_from_bytes
 from photovault.models import Photo, Person, PhotoPerson
 from photovault.extensions import db
+from photovault.services.detection_cache_service import detection_cache, compute_content_hash
 
 logger = logging.getLogger(__name__)
 
+def get_face_cache_key() -> str:
+    """Detection cache key covering both the detector and the encoding layout"""
+    return f"faces:{face_detector.get_version_key()}:{face_recognizer.ENCODING_VERSION}"
+
+def faces_to_cache(faces: List[Dict]) -> List[Dict]:
+    """
+    Convert raw (unvalidated) detections with 'face_encoding' bytes into a JSON-safe cache entry
+    
+    Args:
+        faces: Detected faces
+        
+    Returns:
+        List of face dictionaries with base64-encoded encodings
+    """
+    entry = []
+    for face in faces:
+        encoding = face.get('face_encoding')
+        entry.append({
+            'x': int(face['x']),
+            'y': int(face['y']),
+            'width': int(face['width']),
+            'height': int(face['height']),
+            'confidence': float(face['confidence']),
+            'method': face.get('method', 'auto'),
+            'image_width': face.get('image_width'),
+            'image_height': face.get('image_height'),
+            'encoding': base64.b64encode(encoding).decode('ascii') if encoding else None
+        })
+    return entry
+
+def faces_from_cache(entry: List[Dict]) -> List[Dict]:
+    """
+    Rebuild detected faces from a cache entry written by faces_to_cache
+    
+    Args:
+        entry: Cached face dictionaries
+        
+    Returns:
+        List of detected faces with 'face_encoding' bytes
+    """
+    faces = []
+    for cached in entry:
+        face = {key: value for key, value in cached.items() if key != 'encoding'}
+        face['face_encoding'] = base64.b64decode(cached['encoding']) if cached.get('encoding') else None
+        faces.append(face)
+    return faces
+
 class FaceDetectionService:
     """Service for intelligent face detection and person assignment"""
     
@@ -46,8 +97,8 @@ class FaceDetectionService:
                 logger.error(f"Photo file not found: {photo_path}")
                 return []
             
-            # Detect faces in the photo
-            detected_faces = self.face_detector.detect_faces(photo_path)
+            # Detect and recognize faces with a single decode of the photo
+            detected_faces = self.detect_and_recognize_faces(photo_path, validate=False)
             
             if not detected_faces:
                 logger.info(f"No faces detected in photo {photo.id}")
@@ -58,7 +109,7 @@ class FaceDetectionService:
             # Process each detected face
             processed_faces = []
             for face in detected_faces:
-                face_result = self._process_single_face(photo, photo_path, face)
+                face_result = self._process_single_face(photo, face)
                 if face_result:
                     processed_faces.append(face_result)
             
@@ -68,14 +119,66 @@ class FaceDetectionService:
             logger.error(f"Error processing faces for photo {photo.id}: {e}")
             return []
     
-    def _process_single_face(self, photo: Photo, photo_path: str, face: Dict) -> Optional[Dict]:
+    def detect_and_recognize_faces(self, photo_path: str, validate: bool = True) -> List[Dict]:
+        """
+        Detect faces in a photo and match them against known people,
+        decoding the image only once for the whole chain
+        
+        Args:
+            photo_path: Full path to the photo file
+            validate: Whether to filter detections through validate_face_detection
+            
+        Returns:
+            List of detected faces, each with a 'recognition' result and serialized
+            'face_encoding' (None when unavailable)
+        """
+        if not self.face_detector.is_available():
+            return []
+        
+        # Unchanged photos reuse the cached boxes and encodings without a decode
+        content_hash = compute_content_hash(photo_path)
+        cache_key = get_face_cache_key()
+        cached = detection_cache.get(content_hash, cache_key)
+        
+        if cached is not None:
+            faces = faces_from_cache(cached)
+        else:
+            image = cv2.imread(photo_path)
+            if image is None:
+                logger.error(f"Could not load image: {photo_path}")
+                return []
+            
+            faces = self.face_detector.detect_faces_in_image(image, photo_path)
+            if faces and self.face_recognizer.is_available():
+                recognitions = self.face_recognizer.recognize_faces_in_image(image, faces)
+                for face, recognition in zip(faces, recognitions):
+                    face['face_encoding'] = encoding_to_bytes(recognition['encoding'])
+            detection_cache.put(content_hash, cache_key, faces_to_cache(faces))
+        
+        if validate:
+            faces = self.face_detector.validate_face_detection(faces)
+        
+        # Matching runs on every call since the known people change between requests
+        recognizer_available = self.face_recognizer.is_available()
+        for face in faces:
+            face.setdefault('face_encoding', None)
+            face['recognition'] = None
+            encoding = encoding_from_bytes(face['face_encoding'])
+            if encoding is not None and recognizer_available:
+                try:
+                    face['recognition'] = self.face_recognizer.match_encoding(encoding)
+                except Exception as e:
+                    logger.error(f"Error during face recognition: {e}")
+        
+        return faces
+    
+    def _process_single_face(self, photo: Photo, face: Dict) -> Optional[Dict]:
         """
         Process a single detected face for recognition and tagging
         
         Args:
             photo: Photo model instance
-            photo_path: Full path to the photo file
-            face: Face detection result dictionary
+            face: Face detection result dictionary with its 'recognition' result
             
         Returns:
             Processed face result with recognition data
@@ -91,29 +194,28 @@ class FaceDetectionService:
                 'detection_confidence': face['confidence'],
                 'detection_method': face.get('method', 'auto'),
                 'recognized_person': None,
-                'recognition_confidence': 0.0
+                'recognition_confidence': 0.0,
+                'face_encoding': face.get('face_encoding')
             }
             
-            # Attempt face recognition if available
-            if self.face_recognizer.is_available():
-                recognition_result = self.face_recognizer.recognize_face(photo_path, face)
+            # Use the recognition result computed alongside detection
+            recognition_result = face.get('recognition')
+            if recognition_result:
+                # Found a matching person
+                person = Person.query.filter_by(
+                    id=recognition_result['person_id'],
+                    user_id=photo.user_id
+                ).first()
                 
-                if recognition_result:
-                    # Found a matching person
-                    person = Person.query.filter_by(
-                        id=recognition_result['person_id'],
-                        user_id=photo.user_id
-                    ).first()
+                if person:
+                    face_result['recognized_person'] = {
+                        'id': person.id,
+                        'name': person.name,
+                        'nickname': person.nickname
+                    }
+                    face_result['recognition_confidence'] = recognition_result['confidence']
                     
-                    if person:
-                        face_result['recognized_person'] = {
-                            'id': person.id,
-                            'name': person.name,
-                            'nickname': person.nickname
-                        }
-                        face_result['recognition_confidence'] = recognition_result['confidence']
-                        
-                        logger.info(f"Recognized person {person.name} in photo {photo.id}")
+                    logger.info(f"Recognized person {person.name} in photo {photo.id}")
             
             return face_result
             
@@ -159,6 +261,7 @@ class FaceDetectionService:
             photo_tag.face_box_y = bbox['y']
             photo_tag.face_box_width = bbox['width']
             photo_tag.face_box_height = bbox['height']
+            photo_tag.face_encoding = face_result.get('face_encoding')
             
             db.session.add(photo_tag)
             db.session.commit()
@@ -229,6 +332,7 @@ class FaceDetectionService:
                             photo_tag.face_box_y = bbox['y']
                             photo_tag.face_box_width = bbox['width']
                             photo_tag.face_box_height = bbox['height']
+                            photo_tag.face_encoding = face_result.get('face_encoding')
                             
                             db.session.add(photo_tag)
                             db.session.commit()
@@ -238,6 +342,10 @@ class FaceDetectionService:
                             logger.error(f"Error creating detection-only tag: {e}")
                             db.session.rollback()
             
+            # Encodings are persisted on the tags and are not part of the summary
+            for face_result in faces:
+                face_result.pop('face_encoding', None)
+            
             logger.info(f"Face processing complete for photo {photo.id}: {results['faces_detected']} faces, "
                        f"{results['faces_recognized']} recognized, {results['tags_created']} tagged")
             
@@ -253,7 +361,8 @@ class FaceDetectionService:
                 'tags_created': 0
             }
     
-    def add_person_training_data(self, person: Person, photo: Photo, face_box: Dict) -> bool:
+    def add_person_training_data(self, person: Person, photo: Photo, face_box: Dict,
+                                 face_encoding: Optional[bytes] = None, rematch: bool = True) -> bool:
         """
         Add a known face for a person to improve recognition accuracy
         
@@ -261,6 +370,8 @@ class FaceDetectionService:
             person: Person model instance
             photo: Photo containing the person's face
             face_box: Bounding box of the person's face
+            face_encoding: Stored encoding of the face, avoids decoding the photo
+            rematch: Re-evaluate the user's unassigned faces against the person afterwards
             
         Returns:
             Success status
@@ -273,25 +384,104 @@ class FaceDetectionService:
             # Use the file path directly as it's already a complete path
             photo_path = photo.file_path
             
-            if not os.path.exists(photo_path):
-                logger.error(f"Photo file not found: {photo_path}")
-                return False
-            
-            # Add face encoding for this person
-            self.face_recognizer.add_person_encoding(
-                person.id, 
-                person.name, 
-                photo_path, 
-                face_box
-            )
+            if face_encoding:
+                # Reuse the encoding stored at detection time
+                self.face_recognizer.add_person_encodings(person.id, person.name, [{
+                    'encoding': encoding_from_bytes(face_encoding),
+                    'image_path': photo_path,
+                    'face_box': face_box
+                }])
+            else:
+                if not os.path.exists(photo_path):
+                    logger.error(f"Photo file not found: {photo_path}")
+                    return False
+                
+                # Add face encoding for this person
+                self.face_recognizer.add_person_encoding(
+                    person.id, 
+                    person.name, 
+                    photo_path, 
+                    face_box
+                )
             
             logger.info(f"Added training data for {person.name} from photo {photo.id}")
+            
+            if rematch:
+                self.rematch_unassigned_faces(person)
             return True
             
         except Exception as e:
             logger.error(f"Error adding person training data: {e}")
             return False
     
+    def rematch_unassigned_faces(self, person: Person, confidence_threshold: float = 0.6) -> int:
+        """
+        Match the stored encodings of a user's unassigned faces against one person
+        and assign the matches in bulk, without re-decoding any photo
+        
+        Args:
+            person: Person whose training data changed
+            confidence_threshold: Minimum confidence for recognition
+            
+        Returns:
+            Number of faces assigned to the person
+        """
+        try:
+            known = self.face_recognizer.get_person_encoding_matrix(person.id)
+            if known is None:
+                return 0
+            
+            rows = db.session.query(PhotoPerson.id, PhotoPerson.photo_id, PhotoPerson.face_encoding).join(Photo).filter(
+                Photo.user_id == person.user_id,
+                PhotoPerson.person_id.is_(None),
+                PhotoPerson.face_encoding.isnot(None)
+            ).all()
+            
+            candidates = [(row.id, row.photo_id, encoding_from_bytes(row.face_encoding)) for row in rows]
+            candidates = [c for c in candidates if c[2] is not None and len(c[2]) == known.shape[1]]
+            if not candidates:
+                return 0
+            
+            # Cosine similarity of every unassigned face against every known encoding at once
+            unknown = np.vstack([encoding for _, _, encoding in candidates])
+            unknown_norms = np.linalg.norm(unknown, axis=1, keepdims=True)
+            unknown_norms[unknown_norms == 0] = 1.0
+            known_norms = np.linalg.norm(known, axis=1, keepdims=True)
+            known_norms[known_norms == 0] = 1.0
+            confidences = ((unknown / unknown_norms) @ (known / known_norms).T).max(axis=1)
+            
+            # A person can only be tagged once per photo; keep the most confident face
+            taken = {photo_id for (photo_id,) in db.session.query(PhotoPerson.photo_id).filter(
+                PhotoPerson.person_id == person.id
+            )}
+            updates = []
+            for index in np.argsort(-confidences):
+                face_id, photo_id, _ = candidates[index]
+                if confidences[index] < confidence_threshold:
+                    break
+                if photo_id in taken:
+                    continue
+                taken.add(photo_id)
+                updates.append({
+                    'id': face_id,
+                    'person_id': person.id,
+                    'confidence': float(confidences[index]),
+                    'manually_tagged': False,
+                    'verified': False,
+                    'cluster_id': None
+                })
+            
+            if updates:
+                db.session.bulk_update_mappings(PhotoPerson, updates)
+                db.session.commit()
+                logger.info(f"Re-recognition assigned {len(updates)} unassigned faces to {person.name}")
+            return len(updates)
+            
+        except Exception as e:
+            logger.error(f"Error re-matching unassigned faces for person {person.id}: {e}")
+            db.session.rollback()
+            return 0
+    
     def get_face_detection_stats(self, user_id: int) -> Dict:
         """
         Get face detection statistics for a user
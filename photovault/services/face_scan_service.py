@@ -0,0 +1,151 @@
+"""
+Face Scan Service for PhotoVault
+Runs face detection over many photos as a background job on the shared
+detection pool and reports its progress
+"""
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+from photovault.models import FaceScanJob
+from photovault.extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Per-photo errors kept on a job for its status
+MAX_STORED_ERRORS = 100
+
+class FaceScanService:
+    """Creates, runs and reports background face scan jobs"""
+    
+    def __init__(self):
+        self._runner = None
+        self._lock = threading.Lock()
+    
+    def _get_runner(self) -> ThreadPoolExecutor:
+        """Create the single thread jobs queue on, so one scan at a time uses the detection pool"""
+        with self._lock:
+            if self._runner is None:
+                self._runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix='face-scan')
+            return self._runner
+    
+    def create_job(self, user_id: int, photo_ids: Optional[List[int]] = None) -> FaceScanJob:
+        """
+        Create a face scan job
+        
+        Args:
+            user_id: Owner of the photos
+            photo_ids: Photos to scan; None scans every photo of the user without face detections
+            
+        Returns:
+            The new job
+        """
+        job = FaceScanJob(user_id=user_id, photo_ids=json.dumps(photo_ids or []))
+        db.session.add(job)
+        db.session.commit()
+        return job
+    
+    def start_job(self, job_id: int):
+        """Queue a job behind the scans already running in this process"""
+        from flask import current_app
+        app = current_app._get_current_object()
+        
+        def run():
+            with app.app_context():
+                try:
+                    self.run_job(job_id)
+                finally:
+                    db.session.remove()
+                    
+        self._get_runner().submit(run)
+    
+    def run_job(self, job_id: int) -> Optional[FaceScanJob]:
+        """
+        Detect faces in the photos of a job, storing progress after every chunk
+        
+        Args:
+            job_id: Job to run
+            
+        Returns:
+            The finished job, or None if it does not exist
+        """
+        from photovault.services.face_detection_pool import get_face_detection_pool
+        
+        job = db.session.get(FaceScanJob, job_id)
+        if job is None:
+            return None
+            
+        def report(results: Dict):
+            job.total_photos = results['total']
+            job.processed_photos = results['processed']
+            job.failed_photos = len(results['errors'])
+            job.cached_photos = results['cached']
+            job.faces_found = results['faces_found']
+            job.errors = json.dumps(results['errors'][:MAX_STORED_ERRORS])
+            db.session.commit()
+            
+        try:
+            job.status = 'running'
+            job.started_at = job.started_at or datetime.utcnow()
+            db.session.commit()
+            
+            # Specific photos are always rescanned; a full scan skips photos that already have faces
+            photo_ids = json.loads(job.photo_ids or '[]')
+            get_face_detection_pool().scan_photos(
+                photo_ids=photo_ids,
+                user_id=job.user_id,
+                only_unprocessed=not photo_ids,
+                progress=report
+            )
+            job.status = 'completed'
+        except Exception as e:
+            logger.error(f"Face scan job {job_id} failed: {e}")
+            db.session.rollback()
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.completed_at = datetime.utcnow()
+            db.session.commit()
+            
+        logger.info(f"Face scan job {job_id} {job.status}: {job.processed_photos}/{job.total_photos} photos, "
+                    f"{job.faces_found} faces")
+        return job
+    
+    def get_status(self, job_id: int, user_id: int) -> Optional[Dict]:
+        """
+        Get a job's progress
+        
+        Args:
+            job_id: Job ID
+            user_id: Owner of the job
+            
+        Returns:
+            Status dictionary, or None if the user has no such job
+        """
+        job = FaceScanJob.query.filter_by(id=job_id, user_id=user_id).first()
+        if job is None:
+            return None
+            
+        done = job.processed_photos + job.failed_photos
+        return {
+            'job_id': job.id,
+            'status': job.status,
+            'total_photos': job.total_photos,
+            'processed_photos': job.processed_photos,
+            'failed_photos': job.failed_photos,
+            'cached_photos': job.cached_photos,
+            'faces_found': job.faces_found,
+            'progress': round(done / job.total_photos * 100, 1) if job.total_photos else (
+                100.0 if job.status in ('completed', 'failed') else 0.0
+            ),
+            'errors': json.loads(job.errors or '[]'),
+            'error': job.error,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'completed_at': job.completed_at.isoformat() if job.completed_at else None
+        }
+
+# Global service instance
+face_scan_service = FaceScanService()
@@ -0,0 +1,308 @@
+"""
+Geo Search Service for PhotoVault
+Bounding-box and radius searches over the indexed GPS columns, map clusters
+aggregated per geohash cell, and an on-disk cache of per-tile cluster JSON
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import and_, event, func, inspect, or_
+from photovault.models import Photo
+from photovault.extensions import db
+from photovault.utils.geohash import (
+    BBox, bbox_around, decode_bbox, haversine_km, precision_for_zoom, split_antimeridian, tile_bbox,
+    tiles_containing
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached tile is served before it is rebuilt
+DEFAULT_TILE_TTL = 600
+
+# Deepest zoom level tiles are served for
+MAX_TILE_ZOOM = 22
+
+# Session.info key of the photo positions added, moved or removed in the open transaction
+MOVED_POSITIONS_KEY = 'geo_search_moved_positions'
+
+class GeoSearchService:
+    """Map queries over the photos of one user"""
+    
+    def __init__(self, tile_dir: Optional[str] = None, tile_ttl: Optional[int] = None):
+        self.tile_dir = tile_dir or os.environ.get('GEO_TILE_CACHE_DIR')
+        if tile_ttl is None:
+            tile_ttl = int(os.environ.get('GEO_TILE_CACHE_TTL') or DEFAULT_TILE_TTL)
+        self.tile_ttl = tile_ttl
+    
+    def init_app(self, app):
+        """
+        Drop cached tiles when photos with a GPS position are added, moved or deleted
+        
+        Args:
+            app: Flask application
+        """
+        for name, listener in (('before_flush', self._collect_moves),
+                               ('after_commit', self._apply_moves),
+                               ('after_rollback', self._discard_moves)):
+            if not event.contains(db.session, name, listener):
+                event.listen(db.session, name, listener)
+    
+    def get_tile_dir(self) -> Optional[str]:
+        """
+        Resolve the tile cache directory, defaulting to a hidden folder next to the user uploads
+        
+        Returns:
+            Directory path, or None when tile caching is disabled or no folder is configured
+        """
+        if not self.tile_ttl:
+            return None
+        if self.tile_dir:
+            return self.tile_dir
+        try:
+            from flask import current_app
+            return os.path.join(current_app.config['UPLOAD_FOLDER'], '.geo_tiles')
+        except (RuntimeError, KeyError):
+            return None
+    
+    def _bbox_filter(self, bbox: BBox):
+        """Index-friendly range condition for a box, split where it crosses the antimeridian"""
+        conditions = [
+            and_(Photo.gps_latitude >= min_lat, Photo.gps_latitude <= max_lat,
+                 Photo.gps_longitude >= min_lon, Photo.gps_longitude <= max_lon)
+            for min_lat, min_lon, max_lat, max_lon in split_antimeridian(bbox)
+        ]
+        return conditions[0] if len(conditions) == 1 else or_(*conditions)
+    
+    def _photo_query(self, user_id: int):
+        return db.session.query(Photo.id, Photo.gps_latitude, Photo.gps_longitude, Photo.photo_date).filter(
+            Photo.user_id == user_id
+        )
+    
+    def _photo_item(self, row) -> Dict:
+        return {
+            'id': row.id,
+            'lat': row.gps_latitude,
+            'lon': row.gps_longitude,
+            'photo_date': row.photo_date.isoformat() if row.photo_date else None,
+            'thumbnail_url': f"/api/thumbnail/{row.id}"
+        }
+    
+    def search_bbox(self, user_id: int, bbox: BBox, limit: int) -> Dict:
+        """
+        Find photos taken inside a bounding box
+        
+        Args:
+            user_id: Owner of the photos
+            bbox: (min_lat, min_lon, max_lat, max_lon); min_lon > max_lon crosses the antimeridian
+            limit: Maximum photos returned
+            
+        Returns:
+            Dictionary with 'photos', newest first, and 'truncated'
+        """
+        rows = self._photo_query(user_id).filter(self._bbox_filter(bbox)).order_by(
+            Photo.id.desc()
+        ).limit(limit + 1).all()
+        return {
+            'photos': [self._photo_item(row) for row in rows[:limit]],
+            'truncated': len(rows) > limit
+        }
+    
+    def search_radius(self, user_id: int, latitude: float, longitude: float, radius_km: float, limit: int) -> Dict:
+        """
+        Find photos taken within a distance of a point
+        
+        The enclosing box is matched on the GPS index, then exact distances are
+        computed for the candidates only.
+        
+        Args:
+            user_id: Owner of the photos
+            latitude: Center latitude
+            longitude: Center longitude
+            radius_km: Search radius in kilometers
+            limit: Maximum photos returned
+            
+        Returns:
+            Dictionary with 'photos', nearest first with 'distance_km', and 'truncated'
+        """
+        boxes = bbox_around(latitude, longitude, radius_km)
+        conditions = [self._bbox_filter(box) for box in boxes]
+        rows = self._photo_query(user_id).filter(or_(*conditions) if len(conditions) > 1 else conditions[0]).all()
+        
+        matches = []
+        for row in rows:
+            distance = haversine_km(latitude, longitude, row.gps_latitude, row.gps_longitude)
+            if distance <= radius_km:
+                matches.append((distance, row))
+        matches.sort(key=lambda match: match[0])
+        
+        photos = []
+        for distance, row in matches[:limit]:
+            item = self._photo_item(row)
+            item['distance_km'] = round(distance, 3)
+            photos.append(item)
+        return {'photos': photos, 'truncated': len(matches) > limit}
+    
+    def clusters(self, user_id: int, bbox: BBox, precision: int) -> List[Dict]:
+        """
+        Aggregate the photos inside a box per geohash cell
+        
+        Args:
+            user_id: Owner of the photos
+            bbox: (min_lat, min_lon, max_lat, max_lon)
+            precision: Geohash prefix length of the cells
+            
+        Returns:
+            One cluster per non-empty cell with its count, centroid and a cover photo
+        """
+        cell = func.substr(Photo.geohash, 1, precision).label('cell')
+        rows = db.session.query(
+            cell,
+            func.count(Photo.id).label('count'),
+            func.avg(Photo.gps_latitude).label('lat'),
+            func.avg(Photo.gps_longitude).label('lon'),
+            func.max(Photo.id).label('cover_id')
+        ).filter(
+            Photo.user_id == user_id,
+            Photo.geohash.isnot(None),
+            self._bbox_filter(bbox)
+        ).group_by(cell).all()
+        
+        clusters = []
+        for row in rows:
+            min_lat, min_lon, max_lat, max_lon = decode_bbox(row.cell)
+            clusters.append({
+                'cell': row.cell,
+                'count': row.count,
+                'lat': row.lat,
+                'lon': row.lon,
+                'bounds': [min_lon, min_lat, max_lon, max_lat],
+                'cover_photo_id': row.cover_id,
+                'thumbnail_url': f"/api/thumbnail/{row.cover_id}"
+            })
+        return clusters
+    
+    def tile(self, user_id: int, zoom: int, x: int, y: int) -> Dict:
+        """
+        Get the clusters of a slippy map tile, from the tile cache when fresh
+        
+        Args:
+            user_id: Owner of the photos
+            zoom: Zoom level
+            x: Tile column
+            y: Tile row
+            
+        Returns:
+            Dictionary with the tile coordinates, cell precision and clusters
+        """
+        tile_dir = self.get_tile_dir()
+        tile_path = os.path.join(tile_dir, str(user_id), str(zoom), str(x), f"{y}.json") if tile_dir else None
+        
+        if tile_path:
+            try:
+                if time.time() - os.path.getmtime(tile_path) < self.tile_ttl:
+                    with open(tile_path, 'r') as f:
+                        return json.load(f)
+            except (OSError, ValueError):
+                pass
+                
+        precision = precision_for_zoom(zoom)
+        tile = {
+            'z': zoom,
+            'x': x,
+            'y': y,
+            'precision': precision,
+            'clusters': self.clusters(user_id, tile_bbox(zoom, x, y), precision)
+        }
+        
+        if tile_path:
+            temp_path = f"{tile_path}.{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+                with open(temp_path, 'w') as f:
+                    json.dump(tile, f, separators=(',', ':'))
+                os.replace(temp_path, tile_path)
+            except OSError as e:
+                logger.warning(f"Geo tile cache write failed for {tile_path}: {e}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        return tile
+    
+    def invalidate_user(self, user_id: int):
+        """
+        Drop the cached tiles of a user after their photo locations changed
+        
+        Args:
+            user_id: Owner of the photos
+        """
+        tile_dir = self.get_tile_dir()
+        if tile_dir is None:
+            return
+        user_dir = os.path.join(tile_dir, str(user_id))
+        # Renaming first makes the whole user's cache disappear at once for concurrent readers
+        stale_dir = f"{user_dir}.{uuid.uuid4().hex[:8]}.stale"
+        try:
+            os.rename(user_dir, stale_dir)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning(f"Geo tile cache invalidation failed for user {user_id}: {e}")
+            return
+        shutil.rmtree(stale_dir, ignore_errors=True)
+    
+    def invalidate_positions(self, user_id: int, positions: Iterable[Tuple[float, float]]):
+        """
+        Drop the cached tiles of a user that contain any of the positions, at every zoom level
+        
+        Args:
+            user_id: Owner of the photos
+            positions: (latitude, longitude) of photos that were added, moved or removed
+        """
+        tile_dir = self.get_tile_dir()
+        if tile_dir is None:
+            return
+        user_dir = os.path.join(tile_dir, str(user_id))
+        for latitude, longitude in positions:
+            for zoom in range(MAX_TILE_ZOOM + 1):
+                for x, y in tiles_containing(zoom, latitude, longitude):
+                    try:
+                        os.remove(os.path.join(user_dir, str(zoom), str(x), f"{y}.json"))
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        logger.warning(f"Geo tile cache invalidation failed for user {user_id}: {e}")
+    
+    def _collect_moves(self, session, flush_context, instances):
+        """Remember the old and new positions of photos a flush adds, moves or deletes, while deleted rows can still load"""
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if not isinstance(obj, Photo):
+                continue
+            positions = {(obj.gps_latitude, obj.gps_longitude)}
+            if obj in session.dirty:
+                state = inspect(obj)
+                latitude = state.attrs.gps_latitude.history
+                longitude = state.attrs.gps_longitude.history
+                if not (latitude.has_changes() or longitude.has_changes()):
+                    continue
+                positions.add((latitude.deleted[0] if latitude.deleted else obj.gps_latitude,
+                               longitude.deleted[0] if longitude.deleted else obj.gps_longitude))
+            positions = {(lat, lon) for lat, lon in positions if lat is not None and lon is not None}
+            if positions:
+                session.info.setdefault(MOVED_POSITIONS_KEY, {}).setdefault(obj.user_id, set()).update(positions)
+    
+    def _apply_moves(self, session):
+        """Drop the affected tiles once the changes are visible to other requests"""
+        moved = session.info.pop(MOVED_POSITIONS_KEY, None)
+        for user_id, positions in (moved or {}).items():
+            self.invalidate_positions(user_id, positions)
+    
+    def _discard_moves(self, session):
+        session.info.pop(MOVED_POSITIONS_KEY, None)
+
+# Global service instance
+geo_search = GeoSearchService()
@@ -0,0 +1,238 @@
+"""
+Metadata Backfill Service for PhotoVault
+Extracts EXIF metadata for existing photos across a process pool, walking the
+photo table in keyset-ordered chunks with a resumable checkpoint
+"""
+
+import os
+import json
+import logging
+import multiprocessing
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from photovault.models import Photo, BackfillCheckpoint
+from photovault.extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Checkpoint name of the metadata backfill
+CHECKPOINT_NAME = 'metadata'
+
+# Per-process upload folder, set once by the pool initializer
+_worker_upload_folder = None
+
+def _init_worker(upload_folder: str):
+    """Pool initializer: remember where relative photo paths live"""
+    global _worker_upload_folder
+    _worker_upload_folder = upload_folder
+
+def _read_photo_metadata(user_id: int, file_path: str) -> Optional[Dict]:
+    """Extract the database metadata of one photo from its local file or App Storage object"""
+    from photovault.utils.metadata_extractor import extractor, HEADER_READ_SIZE
+    
+    if file_path.startswith('users/') or file_path.startswith('uploads/'):
+        # App Storage path, mirrored locally when App Storage is not in use
+        local_path = os.path.join(_worker_upload_folder, file_path.split('/', 1)[1])
+        if not os.path.exists(local_path):
+            from photovault.services.app_storage_service import app_storage
+            success, data = app_storage.download_file(file_path)
+            if not success:
+                raise IOError(data.decode(errors='replace'))
+            return extractor.extract_photo_metadata_from_header(data[:HEADER_READ_SIZE], len(data))
+    elif os.path.isabs(file_path):
+        local_path = file_path
+    else:
+        local_path = os.path.join(_worker_upload_folder, str(user_id), file_path)
+        
+    if not os.path.exists(local_path):
+        raise FileNotFoundError(f"Photo file not found: {local_path}")
+    return extractor.extract_photo_metadata_for_db(local_path)
+
+def _extract_batch(rows: List[Tuple[int, int, str]]) -> List[Dict]:
+    """
+    Extract metadata for a batch of photos inside a worker process
+    
+    Args:
+        rows: (photo_id, user_id, file_path) tuples
+        
+    Returns:
+        One result dictionary per photo with its metadata or an error message
+    """
+    results = []
+    for photo_id, user_id, file_path in rows:
+        try:
+            results.append({'id': photo_id, 'metadata': _read_photo_metadata(user_id, file_path), 'error': None})
+        except Exception as e:
+            results.append({'id': photo_id, 'metadata': None, 'error': str(e)})
+    return results
+
+class MetadataBackfillService:
+    """Fills the EXIF columns of existing photos in resumable, bulk-written chunks"""
+    
+    def __init__(self, chunk_size: int = 1000, processes: Optional[int] = None):
+        self.chunk_size = max(1, chunk_size)
+        self.processes = processes
+    
+    def get_checkpoint(self, restart: bool = False) -> BackfillCheckpoint:
+        """
+        Load the backfill checkpoint, creating or resetting it
+        
+        Args:
+            restart: Start over from the first photo
+            
+        Returns:
+            The checkpoint
+        """
+        checkpoint = db.session.get(BackfillCheckpoint, CHECKPOINT_NAME)
+        if checkpoint is None:
+            checkpoint = BackfillCheckpoint(name=CHECKPOINT_NAME, last_photo_id=0, processed=0, updated=0)
+            db.session.add(checkpoint)
+        elif restart or checkpoint.completed_at:
+            # A finished backfill resumes from where it stopped, picking up only photos added since
+            if restart:
+                checkpoint.last_photo_id = 0
+                checkpoint.failed_photo_ids = None
+                checkpoint.started_at = datetime.utcnow()
+            checkpoint.processed = 0
+            checkpoint.updated = 0
+            checkpoint.completed_at = None
+        db.session.commit()
+        return checkpoint
+    
+    def run(self, restart: bool = False, progress: Optional[Callable[[BackfillCheckpoint], None]] = None) -> BackfillCheckpoint:
+        """
+        Extract metadata for the photos that failed last time, then every photo after the checkpoint
+        
+        The next chunk is extracted by the pool while the current one is written,
+        and each chunk's updates and checkpoint commit together, so an interrupted
+        run resumes at the first unwritten chunk. Photos whose extraction raised
+        are kept on the checkpoint and retried by the next run.
+        
+        Args:
+            restart: Start over from the first photo
+            progress: Called with the checkpoint after each chunk
+            
+        Returns:
+            The completed checkpoint
+        """
+        from flask import current_app
+        
+        checkpoint = self.get_checkpoint(restart)
+        processes = self.processes or os.cpu_count() or 1
+        
+        # Spawn keeps database connections out of the children
+        context = multiprocessing.get_context('spawn')
+        pool = context.Pool(processes=processes, initializer=_init_worker,
+                            initargs=(current_app.config['UPLOAD_FOLDER'],))
+        try:
+            self._retry_failed(pool, processes, checkpoint, progress)
+            
+            rows = self._fetch_chunk(checkpoint.last_photo_id)
+            pending = self._submit(pool, processes, rows)
+            while rows:
+                next_rows = self._fetch_chunk(rows[-1].id)
+                next_pending = self._submit(pool, processes, next_rows)
+                
+                results = [result for batch in pending.get() for result in batch]
+                self._store_results(checkpoint, rows, results)
+                if progress:
+                    progress(checkpoint)
+                    
+                rows, pending = next_rows, next_pending
+        finally:
+            pool.close()
+            pool.join()
+            
+        checkpoint.completed_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"Metadata backfill completed: {checkpoint.processed} photos read, {checkpoint.updated} updated, "
+                    f"{len(self.get_failed_ids(checkpoint))} failed")
+        return checkpoint
+    
+    def get_failed_ids(self, checkpoint: BackfillCheckpoint) -> List[int]:
+        """Photos behind the checkpoint whose extraction failed"""
+        return json.loads(checkpoint.failed_photo_ids or '[]')
+    
+    def _retry_failed(self, pool, processes: int, checkpoint: BackfillCheckpoint,
+                      progress: Optional[Callable[[BackfillCheckpoint], None]]):
+        """Extract the photos a previous run failed on again, a chunk at a time"""
+        failed_ids = self.get_failed_ids(checkpoint)
+        for start in range(0, len(failed_ids), self.chunk_size):
+            retry_ids = failed_ids[start:start + self.chunk_size]
+            rows = db.session.query(Photo.id, Photo.user_id, Photo.file_path, Photo.photo_date).filter(
+                Photo.id.in_(retry_ids)
+            ).order_by(Photo.id).all()
+            pending = self._submit(pool, processes, rows)
+            results = [result for batch in pending.get() for result in batch] if pending else []
+            self._store_results(checkpoint, rows, results, retry_ids=retry_ids)
+            if progress:
+                progress(checkpoint)
+    
+    def _fetch_chunk(self, after_id: int) -> List:
+        """Keyset page of the photos after a photo ID"""
+        return db.session.query(Photo.id, Photo.user_id, Photo.file_path, Photo.photo_date).filter(
+            Photo.id > after_id
+        ).order_by(Photo.id).limit(self.chunk_size).all()
+    
+    def _submit(self, pool, processes: int, rows: List):
+        """Queue a chunk on the pool, split so every process gets a few batches"""
+        if not rows:
+            return None
+        batch_size = max(1, -(-len(rows) // (processes * 4)))
+        tasks = [(row.id, row.user_id, row.file_path) for row in rows]
+        return pool.map_async(_extract_batch, [tasks[i:i + batch_size] for i in range(0, len(tasks), batch_size)])
+    
+    def _store_results(self, checkpoint: BackfillCheckpoint, rows: List, results: List[Dict],
+                       retry_ids: Optional[List[int]] = None):
+        """
+        Write a chunk's metadata with one bulk UPDATE and update the checkpoint in the same transaction
+        
+        Args:
+            checkpoint: Backfill checkpoint
+            rows: Photos of the chunk
+            results: Extraction results of the chunk
+            retry_ids: Failed photos this chunk retried; the checkpoint only advances for new chunks
+        """
+        from photovault.utils.metadata_extractor import PHOTO_EXIF_FIELDS
+        
+        photo_dates = {row.id: row.photo_date for row in rows}
+        owners = {row.id: row.user_id for row in rows}
+        located_users = set()
+        updates = []
+        for result in results:
+            metadata = result['metadata']
+            if not metadata:
+                if result['error']:
+                    logger.warning(f"Metadata backfill skipped photo {result['id']}: {result['error']}")
+                continue
+                
+            update = {field: metadata[field] for field in PHOTO_EXIF_FIELDS if metadata.get(field) is not None}
+            # Never overwrite a date the user already entered
+            if metadata.get('date_taken') and photo_dates[result['id']] is None:
+                update['photo_date'] = metadata['date_taken'].date()
+            if update:
+                update['id'] = result['id']
+                updates.append(update)
+                if 'geohash' in update:
+                    located_users.add(owners[result['id']])
+                
+        if updates:
+            db.session.bulk_update_mappings(Photo, updates)
+            
+        # Photos that raised stay listed until a later run reads them; deleted photos drop out
+        failed = set(self.get_failed_ids(checkpoint)).difference(retry_ids or [])
+        failed.update(result['id'] for result in results if result['error'])
+        checkpoint.failed_photo_ids = json.dumps(sorted(failed)) if failed else None
+        if retry_ids is None:
+            checkpoint.last_photo_id = rows[-1].id
+        checkpoint.processed += len(rows)
+        checkpoint.updated += len(updates)
+        db.session.commit()
+        
+        if located_users:
+            from photovault.services.geo_search_service import geo_search
+            for user_id in located_users:
+                geo_search.invalidate_user(user_id)
+
+# Global service instance
+metadata_backfill_service = MetadataBackfillService()
@@ -0,0 +1,322 @@
+"""
+Scan Split Service for PhotoVault
+Splits batches of flatbed scans into individual photos across a process pool
+"""
+
+import os
+import uuid
+import shutil
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+from photovault.models import Photo, ScanSplitJob, ScanSplitItem
+from photovault.extensions import db
+from photovault.services.search_service import search_service
+
+logger = logging.getLogger(__name__)
+
+# Per-process detector, created once by the pool initializer
+_worker_detector = None
+
+def _init_worker(max_dimension: Optional[int]):
+    """Pool initializer: create the photo detector once per process"""
+    global _worker_detector
+    from photovault.utils.photo_detection import PhotoDetector
+    
+    _worker_detector = PhotoDetector(max_dimension=max_dimension)
+    logger.info(f"Scan split worker {os.getpid()} ready")
+
+def _split_scan(task: Tuple[int, int, str, str]) -> Dict:
+    """
+    Detect and extract the photos of one scan inside a worker process
+    
+    Args:
+        task: (job_id, item_id, scan_path, output_dir) tuple
+        
+    Returns:
+        Result dictionary with the extracted photo files or an error message
+    """
+    from photovault.utils.file_handler import create_thumbnail
+    
+    job_id, item_id, scan_path, output_dir = task
+    result = {'item_id': item_id, 'photos': [], 'error': None}
+    
+    try:
+        if not os.path.exists(scan_path):
+            result['error'] = 'Scan file not found'
+            return result
+            
+        detected_photos = _worker_detector.detect_photos(scan_path)
+        if not detected_photos:
+            return result
+            
+        # Extract next to the final location, then give every photo a unique name
+        work_dir = os.path.join(output_dir, f'scan_split_{job_id}')
+        extracted_photos = _worker_detector.extract_photos(scan_path, work_dir, detected_photos)
+        
+        for index, extracted in enumerate(extracted_photos):
+            filename = f"scan_split_{job_id}_{item_id}_{index + 1:02d}_{str(uuid.uuid4())[:8]}.jpg"
+            final_path = os.path.join(output_dir, filename)
+            os.replace(extracted['file_path'], final_path)
+            
+            success, thumbnail_result = create_thumbnail(final_path)
+            result['photos'].append({
+                'filename': filename,
+                'file_path': final_path,
+                'thumbnail_path': thumbnail_result if success else None,
+                'file_size': os.path.getsize(final_path),
+                'width': extracted['extracted_width'],
+                'height': extracted['extracted_height'],
+                'confidence': extracted['confidence']
+            })
+    except Exception as e:
+        logger.error(f"Scan split failed for {scan_path}: {e}")
+        result['error'] = str(e)
+        
+    return result
+
+class ScanSplitService:
+    """Creates, runs and reports batch scan split jobs"""
+    
+    def __init__(self, processes: Optional[int] = None, flush_every: int = 8):
+        self.processes = processes
+        self.flush_every = max(1, flush_every)  # Finished scans written per bulk insert
+        self._runner = None
+        self._pool = None
+        self._lock = threading.Lock()
+    
+    def _get_runner(self) -> ThreadPoolExecutor:
+        """Create the single thread jobs queue on, so one job at a time uses the process pool"""
+        with self._lock:
+            if self._runner is None:
+                self._runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scan-split')
+            return self._runner
+    
+    def _get_pool(self, app):
+        """Start the worker processes on first use and keep them for every later job"""
+        if self._pool is None:
+            processes = self.processes or app.config.get('SCAN_SPLIT_WORKERS') or os.cpu_count() or 1
+            
+            # Spawn keeps database connections and web worker state out of the children
+            context = multiprocessing.get_context('spawn')
+            self._pool = context.Pool(
+                processes=processes,
+                initializer=_init_worker,
+                initargs=(app.config.get('PHOTO_DETECTION_MAX_DIMENSION'),)
+            )
+            logger.info(f"Started scan split pool with {processes} workers")
+        return self._pool
+    
+    def _discard_pool(self):
+        """Terminate the worker processes after a failure; the next job starts new ones"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+    
+    def create_job(self, user_id: int, scans: List[Tuple[str, str]], delete_scans: bool = False) -> ScanSplitJob:
+        """
+        Create a job and its items
+        
+        Args:
+            user_id: Owner of the scans and the extracted photos
+            scans: List of (file_path, original_filename) tuples
+            delete_scans: Remove the scan files when the job ends, whatever their outcome
+            
+        Returns:
+            The new job
+        """
+        job = ScanSplitJob(user_id=user_id, total_scans=len(scans), delete_scans=delete_scans)
+        db.session.add(job)
+        db.session.flush()
+        
+        db.session.bulk_insert_mappings(ScanSplitItem, [{
+            'job_id': job.id,
+            'file_path': file_path,
+            'original_filename': original_filename,
+            'status': 'pending',
+            'photos_created': 0
+        } for file_path, original_filename in scans])
+        db.session.commit()
+        return job
+    
+    def start_job(self, job_id: int):
+        """Queue a job behind the jobs already running in this process"""
+        from flask import current_app
+        app = current_app._get_current_object()
+        
+        def run():
+            with app.app_context():
+                try:
+                    self.run_job(job_id)
+                finally:
+                    db.session.remove()
+                    
+        self._get_runner().submit(run)
+    
+    def run_job(self, job_id: int) -> Optional[ScanSplitJob]:
+        """
+        Split every pending scan of a job, writing photos and progress in bulk
+        
+        Args:
+            job_id: Job to run
+            
+        Returns:
+            The finished job, or None if it does not exist
+        """
+        from flask import current_app
+        
+        job = db.session.get(ScanSplitJob, job_id)
+        if job is None:
+            return None
+            
+        output_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], str(job.user_id))
+        try:
+            job.status = 'running'
+            job.started_at = job.started_at or datetime.utcnow()
+            db.session.commit()
+            
+            items = db.session.query(ScanSplitItem.id, ScanSplitItem.file_path, ScanSplitItem.original_filename).filter(
+                ScanSplitItem.job_id == job_id,
+                ScanSplitItem.status == 'pending'
+            ).order_by(ScanSplitItem.id).all()
+            scans = {item.id: item for item in items}
+            
+            os.makedirs(output_dir, exist_ok=True)
+            tasks = [(job_id, item.id, item.file_path, output_dir) for item in items]
+            
+            pending = []
+            if tasks:
+                try:
+                    for result in self._get_pool(current_app).imap_unordered(_split_scan, tasks):
+                        pending.append(result)
+                        if len(pending) >= self.flush_every:
+                            self._store_results(job, scans, pending)
+                            pending = []
+                except Exception:
+                    self._discard_pool()
+                    raise
+                    
+            self._store_results(job, scans, pending)
+            job.status = 'completed'
+        except Exception as e:
+            logger.error(f"Scan split job {job_id} failed: {e}")
+            db.session.rollback()
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            shutil.rmtree(os.path.join(output_dir, f'scan_split_{job_id}'), ignore_errors=True)
+            # Scans the job never finished would otherwise stay pending forever
+            self._fail_unfinished_items(job, 'Job stopped before this scan was split')
+            job.completed_at = datetime.utcnow()
+            db.session.commit()
+            if job.delete_scans:
+                self._delete_scans(job_id)
+                
+        logger.info(f"Scan split job {job_id} {job.status}: {job.processed_scans}/{job.total_scans} scans, "
+                    f"{job.photos_created} photos")
+        return job
+    
+    def _fail_unfinished_items(self, job: ScanSplitJob, error: str):
+        """Mark the job's scans that are still pending as failed and count them as processed"""
+        unfinished = ScanSplitItem.query.filter(
+            ScanSplitItem.job_id == job.id,
+            ScanSplitItem.status == 'pending'
+        ).update({
+            'status': 'failed',
+            'error': error,
+            'processed_at': datetime.utcnow()
+        }, synchronize_session=False)
+        if unfinished:
+            job.processed_scans += unfinished
+    
+    def _delete_scans(self, job_id: int):
+        """Remove every uploaded scan of a job, whether it was split, empty or failed"""
+        from photovault.utils.enhanced_file_handler import delete_file_enhanced
+        
+        for (file_path,) in db.session.query(ScanSplitItem.file_path).filter(ScanSplitItem.job_id == job_id):
+            try:
+                delete_file_enhanced(file_path)
+            except Exception as e:
+                logger.warning(f"Could not delete scan {file_path}: {e}")
+    
+    def _store_results(self, job: ScanSplitJob, scans: Dict, results: List[Dict]):
+        """Insert the Photo rows and item updates of finished scans in bulk and advance the job counters"""
+        if not results:
+            return
+            
+        photo_rows = []
+        item_updates = []
+        now = datetime.utcnow()
+        
+        for result in results:
+            scan = scans[result['item_id']]
+            for photo in result['photos']:
+                photo_rows.append({
+                    'filename': photo['filename'],
+                    'original_name': f"Extracted from {scan.original_filename or os.path.basename(scan.file_path)}",
+                    'file_path': photo['file_path'],
+                    'thumbnail_path': photo['thumbnail_path'],
+                    'file_size': photo['file_size'],
+                    'width': photo['width'],
+                    'height': photo['height'],
+                    'mime_type': 'image/jpeg',
+                    'upload_source': 'scan_split',
+                    'user_id': job.user_id,
+                    'processing_notes': f"Extracted via batch scan split with {photo['confidence']:.2f} confidence"
+                })
+            item_updates.append({
+                'id': result['item_id'],
+                'status': 'failed' if result['error'] else 'completed',
+                'photos_created': len(result['photos']),
+                'error': result['error'],
+                'processed_at': now
+            })
+            
+        if photo_rows:
+            db.session.bulk_insert_mappings(Photo, photo_rows, return_defaults=True)
+            # Bulk inserts skip the flush hook that indexes new photos for search
+            search_service.index_rows(db.session.connection(), Photo, photo_rows)
+        db.session.bulk_update_mappings(ScanSplitItem, item_updates)
+        job.processed_scans += len(results)
+        job.photos_created += len(photo_rows)
+        db.session.commit()
+    
+    def get_status(self, job_id: int, user_id: int) -> Optional[Dict]:
+        """
+        Get a job's progress with the outcome of each scan
+        
+        Args:
+            job_id: Job ID
+            user_id: Owner of the job
+            
+        Returns:
+            Status dictionary, or None if the user has no such job
+        """
+        job = ScanSplitJob.query.filter_by(id=job_id, user_id=user_id).first()
+        if job is None:
+            return None
+            
+        return {
+            'job_id': job.id,
+            'status': job.status,
+            'total_scans': job.total_scans,
+            'processed_scans': job.processed_scans,
+            'photos_created': job.photos_created,
+            'progress': round(job.processed_scans / job.total_scans * 100, 1) if job.total_scans else 100.0,
+            'error': job.error,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'completed_at': job.completed_at.isoformat() if job.completed_at else None,
+            'scans': [{
+                'original_filename': item.original_filename,
+                'status': item.status,
+                'photos_created': item.photos_created,
+                'error': item.error
+            } for item in job.items.order_by(ScanSplitItem.id)]
+        }
+
+# Global service instance
+scan_split_service = ScanSplitService()
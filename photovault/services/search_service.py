@@ -0,0 +1,284 @@
+"""
+Search Service for PhotoVault
+Keeps the search_documents table in step with photo annotations, people, stories
+and voice memo transcripts, and runs ranked full-text queries over it with
+PostgreSQL tsvector/GIN or SQLite FTS5
+"""
+
+import os
+import re
+import logging
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import and_, column, event, func, inspect, literal_column, or_, select, table
+from photovault.models import Photo, Person, Story, VoiceMemo, FamilyMember, VaultPhoto, SearchDocument
+from photovault.extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Longest excerpt of the body returned with a result
+EXCERPT_LENGTH = 200
+
+# Weight of title over body matches in SQLite's bm25 ranking (PostgreSQL uses setweight A/B)
+SQLITE_TITLE_WEIGHT = 10.0
+
+def _join(*parts: Optional[str]) -> Optional[str]:
+    text = '\n'.join(part.strip() for part in parts if part and part.strip())
+    return text or None
+
+def _document(doc_type: str, doc_id: int, user_id: int, title: Optional[str], body: Optional[str],
+              vault_id: Optional[int] = None, photo_id: Optional[int] = None) -> Optional[Dict]:
+    if not title and not body:
+        return None
+    return {
+        'doc_type': doc_type,
+        'doc_id': doc_id,
+        'user_id': user_id,
+        'vault_id': vault_id,
+        'photo_id': photo_id,
+        'title': title,
+        'body': body
+    }
+
+def _photo_document(photo) -> Optional[Dict]:
+    return _document('photo', photo.id, photo.user_id,
+                     _join(photo.occasion, photo.location_text),
+                     _join(photo.date_text, photo.back_text, photo.processing_notes),
+                     photo_id=photo.id)
+
+def _person_document(person) -> Optional[Dict]:
+    return _document('person', person.id, person.user_id,
+                     _join(person.name, person.nickname),
+                     _join(person.relationship, person.notes))
+
+def _story_document(story) -> Optional[Dict]:
+    # Drafts stay visible to their author only
+    return _document('story', story.id, story.author_id, story.title, story.content,
+                     vault_id=story.vault_id if story.is_published else None)
+
+def _voice_memo_document(memo) -> Optional[Dict]:
+    return _document('voice_memo', memo.id, memo.user_id, memo.title, memo.transcript, photo_id=memo.photo_id)
+
+# Indexed models: document type, columns the document is built from, builder
+SEARCH_SOURCES = {
+    Photo: ('photo', ('id', 'user_id', 'occasion', 'location_text', 'date_text', 'back_text', 'processing_notes'),
+            _photo_document),
+    Person: ('person', ('id', 'user_id', 'name', 'nickname', 'relationship', 'notes'), _person_document),
+    Story: ('story', ('id', 'author_id', 'vault_id', 'is_published', 'title', 'content'), _story_document),
+    VoiceMemo: ('voice_memo', ('id', 'user_id', 'photo_id', 'title', 'transcript'), _voice_memo_document),
+}
+
+class SearchService:
+    """Full-text search over the text users attach to their photos and vaults"""
+    
+    def init_app(self, app):
+        """
+        Start maintaining search documents on every flush of the application session
+        
+        Args:
+            app: Flask application
+        """
+        if not event.contains(db.session, 'after_flush', self._index_flush):
+            event.listen(db.session, 'after_flush', self._index_flush)
+    
+    def _index_flush(self, session, flush_context):
+        """Rewrite the documents of indexed rows added, changed or deleted by a flush"""
+        documents = []
+        stale = []
+        for obj in session.new:
+            source = SEARCH_SOURCES.get(type(obj))
+            if source:
+                stale.append((source[0], obj.id))
+                documents.append(source[2](obj))
+        for obj in session.dirty:
+            source = SEARCH_SOURCES.get(type(obj))
+            if source and self._text_modified(obj, source[1]):
+                stale.append((source[0], obj.id))
+                documents.append(source[2](obj))
+        for obj in session.deleted:
+            source = SEARCH_SOURCES.get(type(obj))
+            if source:
+                stale.append((source[0], obj.id))
+                
+        if stale:
+            self.write_documents(session.connection(), stale, [doc for doc in documents if doc])
+    
+    def _text_modified(self, obj, columns: Iterable[str]) -> bool:
+        state = inspect(obj)
+        return any(state.attrs[name].history.has_changes() for name in columns if name != 'id')
+    
+    def write_documents(self, connection, stale: List, documents: List[Dict]):
+        """
+        Replace search documents; the database's full-text index follows the table
+        
+        Args:
+            connection: Connection in the writing transaction
+            stale: (doc_type, doc_id) pairs whose current documents are removed
+            documents: New document rows
+        """
+        documents_table = SearchDocument.__table__
+        stale_ids = {}
+        for doc_type, doc_id in stale:
+            stale_ids.setdefault(doc_type, set()).add(doc_id)
+        for doc_type, doc_ids in stale_ids.items():
+            connection.execute(documents_table.delete().where(
+                documents_table.c.doc_type == doc_type, documents_table.c.doc_id.in_(doc_ids)
+            ))
+        if documents:
+            connection.execute(documents_table.insert(), documents)
+    
+    def index_rows(self, connection, model, rows: List[Dict]):
+        """
+        Index rows written by bulk_insert_mappings or bulk_update_mappings, which skip the flush hook
+        
+        Args:
+            connection: Connection in the writing transaction
+            model: Indexed model the rows belong to
+            rows: Row dictionaries with their 'id' and every column the document is built from
+        """
+        doc_type, columns, build = SEARCH_SOURCES[model]
+        documents = [build(SimpleNamespace(**{name: row.get(name) for name in columns})) for row in rows]
+        self.write_documents(connection, [(doc_type, row['id']) for row in rows], [doc for doc in documents if doc])
+    
+    def rebuild(self, chunk_size: int = 1000) -> Dict[str, int]:
+        """
+        Rebuild the documents of every indexed row, one committed chunk at a time
+        
+        Args:
+            chunk_size: Rows read per query
+            
+        Returns:
+            Indexed document count per type
+        """
+        counts = {}
+        for model, (doc_type, columns, build) in SEARCH_SOURCES.items():
+            counts[doc_type] = 0
+            last_id = 0
+            query = db.session.query(*[getattr(model, name) for name in columns])
+            while True:
+                rows = query.filter(model.id > last_id).order_by(model.id).limit(chunk_size).all()
+                if not rows:
+                    break
+                documents = [doc for doc in (build(row) for row in rows) if doc]
+                self.write_documents(db.session.connection(), [(doc_type, row.id) for row in rows], documents)
+                db.session.commit()
+                counts[doc_type] += len(documents)
+                last_id = rows[-1].id
+        return counts
+    
+    def _scope(self, user_id: int):
+        """Documents a user may see: their own, published stories of their vaults and photos shared there"""
+        vault_ids = select(FamilyMember.vault_id).where(
+            FamilyMember.user_id == user_id, FamilyMember.status == 'active'
+        )
+        shared_photo_ids = select(VaultPhoto.photo_id).where(VaultPhoto.vault_id.in_(vault_ids))
+        return or_(
+            SearchDocument.user_id == user_id,
+            SearchDocument.vault_id.in_(vault_ids),
+            # Only the photo itself is shared, not voice memos its owner recorded about it
+            and_(SearchDocument.doc_type == 'photo', SearchDocument.photo_id.in_(shared_photo_ids))
+        )
+    
+    def search(self, user_id: int, query: str, page: int = 1, per_page: int = 20,
+               doc_types: Optional[List[str]] = None) -> Dict:
+        """
+        Find documents matching a query, best match first
+        
+        Args:
+            user_id: Searching user
+            query: Free text; every word must match (the last one as a prefix)
+            page: 1-based page number
+            per_page: Results per page
+            doc_types: Only return these document types
+            
+        Returns:
+            Dictionary with 'results', 'page', 'per_page' and 'has_more'
+        """
+        terms = re.findall(r'\w+', query or '', re.UNICODE)
+        if not terms:
+            return {'results': [], 'page': page, 'per_page': per_page, 'has_more': False}
+            
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            search_query = self._postgresql_query(query)
+        elif dialect == 'sqlite':
+            search_query = self._sqlite_query(terms)
+        else:
+            search_query = self._like_query(terms)
+            
+        search_query = search_query.filter(self._scope(user_id))
+        if doc_types:
+            search_query = search_query.filter(SearchDocument.doc_type.in_(doc_types))
+        rows = search_query.offset((page - 1) * per_page).limit(per_page + 1).all()
+        thumbnails = self._thumbnail_urls({document.photo_id for document, _ in rows[:per_page] if document.photo_id})
+        
+        return {
+            'results': [self._result(document, score, thumbnails) for document, score in rows[:per_page]],
+            'page': page,
+            'per_page': per_page,
+            'has_more': len(rows) > per_page
+        }
+    
+    def _postgresql_query(self, query: str):
+        ts_query = func.websearch_to_tsquery('english', query)
+        vector = literal_column('search_documents.search_vector')
+        rank = func.ts_rank_cd(vector, ts_query).label('score')
+        return db.session.query(SearchDocument, rank).filter(
+            vector.op('@@')(ts_query)
+        ).order_by(rank.desc(), SearchDocument.id.desc())
+    
+    def _sqlite_query(self, terms: List[str]):
+        # Quoted terms keep FTS5 operators in user input literal
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        fts = table('search_documents_fts', column('rowid'))
+        fts_name = literal_column('search_documents_fts')
+        # bm25 is lower for better matches
+        rank = func.bm25(fts_name, SQLITE_TITLE_WEIGHT, 1.0)
+        # Labelled, since the ORM cannot find an unnamed expression column in the row
+        score = (-rank).label('score')
+        return db.session.query(SearchDocument, score).join(
+            fts, fts.c.rowid == SearchDocument.id
+        ).filter(fts_name.op('MATCH')(match)).order_by(score.desc(), SearchDocument.id.desc())
+    
+    def _like_query(self, terms: List[str]):
+        logger.warning("Full-text search has no index on this database; falling back to LIKE scans")
+        search_query = db.session.query(SearchDocument, literal_column('0').label('score'))
+        for term in terms:
+            pattern = f'%{term}%'
+            search_query = search_query.filter(or_(SearchDocument.title.ilike(pattern), SearchDocument.body.ilike(pattern)))
+        return search_query.order_by(SearchDocument.id.desc())
+    
+    def _thumbnail_urls(self, photo_ids: Iterable[int]) -> Dict[int, str]:
+        """Map photo IDs to their owner's file URL, which also serves vault members the photo is shared with"""
+        from flask import url_for
+        
+        if not photo_ids:
+            return {}
+        rows = db.session.query(Photo.id, Photo.user_id, Photo.filename, Photo.thumbnail_path).filter(
+            Photo.id.in_(photo_ids)
+        ).all()
+        return {
+            photo_id: url_for('gallery.uploaded_file', user_id=owner_id,
+                              filename=os.path.basename(thumbnail_path) if thumbnail_path else filename)
+            for photo_id, owner_id, filename, thumbnail_path in rows
+        }
+    
+    def _result(self, document: SearchDocument, score, thumbnails: Dict[int, str]) -> Dict:
+        body = document.body or ''
+        result = {
+            'type': document.doc_type,
+            'id': document.doc_id,
+            'title': document.title,
+            'excerpt': body if len(body) <= EXCERPT_LENGTH else body[:EXCERPT_LENGTH].rsplit(' ', 1)[0] + '…',
+            'score': round(float(score or 0), 4),
+            'vault_id': document.vault_id,
+            'photo_id': document.photo_id
+        }
+        if document.photo_id in thumbnails:
+            result['thumbnail_url'] = thumbnails[document.photo_id]
+        if document.doc_type == 'story':
+            result['url'] = f"/family/story/{document.doc_id}"
+        return result
+
+# Global service instance
+search_service = SearchService()
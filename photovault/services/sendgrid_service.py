@@ -5,7 +5,7 @@ Based on the python_sendgrid blueprint integration
 import os
 import sys
 import logging
-from typing import Optional
+from typing import Optional, Tuple
 
 try:
     from sendgrid import SendGridAPIClient
@@ -26,6 +26,7 @@ class SendGridEmailService:
     def __init__(self):
         self.api_key = os.environ.get('SENDGRID_API_KEY')
         self.from_email = os.environ.get('SENDGRID_FROM_EMAIL', 'noreply@photovault.com')
+        self.api_host = os.environ.get('SENDGRID_API_HOST')  # Point at a local HTTP stand-in for testing
         
         if not self.api_key:
             logger.warning("SENDGRID_API_KEY not found in environment variables")
@@ -36,7 +37,10 @@ class SendGridEmailService:
         else:
             try:
                 if SendGridAPIClient:
-                    self.client = SendGridAPIClient(self.api_key)
+                    if self.api_host:
+                        self.client = SendGridAPIClient(self.api_key, host=self.api_host)
+                    else:
+                        self.client = SendGridAPIClient(self.api_key)
                     logger.info("SendGrid client initialized successfully")
                 else:
                     logger.error("SendGridAPIClient class not available")
@@ -138,15 +142,23 @@ class SendGridEmailService:
 sendgrid_service = SendGridEmailService()
 
 
-def send_password_reset_email(user, token: str) -> bool:
-    """Send password reset email using SendGrid"""
-    from flask import url_for
+def render_password_reset_email(user, token: str) -> Tuple[str, str, str]:
+    """
+    Build the password reset email
     
-    try:
-        reset_url = url_for('auth.reset_password', token=token, _external=True)
+    Args:
+        user: User resetting their password
+        token: Password reset token
         
-        subject = "PhotoVault - Password Reset Request"
-        html_content = f"""
+    Returns:
+        (subject, html_content, text_content)
+    """
+    from flask import url_for
+    
+    reset_url = url_for('auth.reset_password', token=token, _external=True)
+    
+    subject = "PhotoVault - Password Reset Request"
+    html_content = f"""
         <html>
         <body>
             <h2>PhotoVault - Password Reset</h2>
@@ -167,8 +179,8 @@ def send_password_reset_email(user, token: str) -> bool:
         </body>
         </html>
         """
-        
-        text_content = f"""Hello {user.username},
+    
+    text_content = f"""Hello {user.username},
 
 You have requested a password reset for your PhotoVault account.
 
@@ -181,7 +193,14 @@ If you did not request this password reset, please ignore this email.
 
 Best regards,
 PhotoVault Team"""
-        
+    
+    return subject, html_content, text_content
+
+
+def send_password_reset_email(user, token: str) -> bool:
+    """Send password reset email using SendGrid"""
+    try:
+        subject, html_content, text_content = render_password_reset_email(user, token)
         return sendgrid_service.send_email(
             to_email=user.email,
             subject=subject,
@@ -194,15 +213,24 @@ PhotoVault Team"""
         return False
 
 
-def send_family_invitation_email(email: str, invitation_token: str, vault_name: str, inviter_name: str) -> bool:
-    """Send family vault invitation email using SendGrid"""
-    from flask import url_for
+def render_family_invitation_email(invitation_token: str, vault_name: str, inviter_name: str) -> Tuple[str, str, str]:
+    """
+    Build the family vault invitation email
     
-    try:
-        invitation_url = url_for('family.accept_invitation', token=invitation_token, _external=True)
+    Args:
+        invitation_token: Invitation token of the accept link
+        vault_name: Name of the vault
+        inviter_name: Username of the inviting member
         
-        subject = f"PhotoVault - Invitation to join '{vault_name}' family vault"
-        html_content = f"""
+    Returns:
+        (subject, html_content, text_content)
+    """
+    from flask import url_for
+    
+    invitation_url = url_for('family.accept_invitation', token=invitation_token, _external=True)
+    
+    subject = f"PhotoVault - Invitation to join '{vault_name}' family vault"
+    html_content = f"""
         <html>
         <body>
             <h2>PhotoVault - Family Vault Invitation</h2>
@@ -225,8 +253,8 @@ def send_family_invitation_email(email: str, invitation_token: str, vault_name:
         </body>
         </html>
         """
-        
-        text_content = f"""Hello!
+    
+    text_content = f"""Hello!
 
 {inviter_name} has invited you to join the family vault "{vault_name}" on PhotoVault.
 
@@ -241,7 +269,14 @@ If you don't have a PhotoVault account yet, you'll be able to create one when yo
 
 Best regards,
 PhotoVault Team"""
-        
+    
+    return subject, html_content, text_content
+
+
+def send_family_invitation_email(email: str, invitation_token: str, vault_name: str, inviter_name: str) -> bool:
+    """Send family vault invitation email using SendGrid"""
+    try:
+        subject, html_content, text_content = render_family_invitation_email(invitation_token, vault_name, inviter_name)
         return sendgrid_service.send_email(
             to_email=email,
             subject=subject,
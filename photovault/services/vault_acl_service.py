@@ -0,0 +1,245 @@
+"""
+Vault ACL Service for PhotoVault
+Per-worker cache of the family vaults and shared photos each user can access,
+kept current through per-user version tokens that change on every share,
+unshare, membership and role change
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from itertools import chain
+from typing import Dict, FrozenSet, Iterable, NamedTuple, Optional, Set, Tuple
+from sqlalchemy import event, inspect
+from photovault.models import AclVersion, FamilyMember, FamilyVault, Photo, VaultPhoto
+from photovault.extensions import db
+from photovault.utils.upsert import bulk_upsert
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached entry is trusted before its version is compared with the database
+DEFAULT_CHECK_INTERVAL = 2.0
+
+# Users whose access is cached per worker
+DEFAULT_MAX_USERS = 10000
+
+# Session.info key of the users whose access changed in the open transaction
+PENDING_USERS_KEY = 'vault_acl_pending_users'
+
+class VaultAccess(NamedTuple):
+    """What one user can reach through family vaults"""
+    version: Optional[str]
+    roles: Dict[int, str]                 # Vault ID -> role, for active memberships
+    vault_ids: FrozenSet[int]             # Vaults the user can open: memberships and vaults they created
+    photo_ids: FrozenSet[int]             # Photos shared into the vaults they belong to
+    files: FrozenSet[Tuple[int, str]]     # (owner ID, filename) of those photos and their edits
+
+class VaultAclService:
+    """Answers vault and shared-media authorization from memory"""
+    
+    def __init__(self, check_interval: Optional[float] = None, max_users: Optional[int] = None):
+        if check_interval is None:
+            check_interval = float(os.environ.get('VAULT_ACL_CHECK_INTERVAL') or DEFAULT_CHECK_INTERVAL)
+        self.check_interval = check_interval
+        self.max_users = max_users or DEFAULT_MAX_USERS
+        self._entries = OrderedDict()  # user ID -> (VaultAccess, monotonic time of the last version check)
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        """
+        Start tracking access changes on the application session
+        
+        Args:
+            app: Flask application
+        """
+        for name, listener in (('after_flush', self._collect_changes),
+                               ('after_commit', self._apply_changes),
+                               ('after_rollback', self._discard_changes)):
+            if not event.contains(db.session, name, listener):
+                event.listen(db.session, name, listener)
+    
+    def get(self, user_id: int) -> VaultAccess:
+        """
+        Get a user's vault access, rebuilding it when another worker changed it
+        
+        Args:
+            user_id: User to authorize
+            
+        Returns:
+            The user's VaultAccess
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached is not None:
+                self._entries.move_to_end(user_id)
+        if cached is not None and now - cached[1] < self.check_interval:
+            return cached[0]
+            
+        version = db.session.query(AclVersion.version).filter_by(user_id=user_id).scalar()
+        if cached is not None and cached[0].version == version:
+            access = cached[0]
+        else:
+            access = self._load(user_id, version)
+            
+        with self._lock:
+            self._entries[user_id] = (access, now)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return access
+    
+    def _load(self, user_id: int, version: Optional[str]) -> VaultAccess:
+        """Read a user's memberships, created vaults and shared photos"""
+        roles = dict(db.session.query(FamilyMember.vault_id, FamilyMember.role).filter_by(
+            user_id=user_id, status='active'
+        ).all())
+        created = {vault_id for (vault_id,) in db.session.query(FamilyVault.id).filter_by(created_by=user_id)}
+        
+        photo_ids = set()
+        files = set()
+        if roles:
+            shared = db.session.query(Photo.id, Photo.user_id, Photo.filename, Photo.edited_filename).join(
+                VaultPhoto, VaultPhoto.photo_id == Photo.id
+            ).filter(VaultPhoto.vault_id.in_(roles.keys()))
+            for photo_id, owner_id, filename, edited_filename in shared:
+                photo_ids.add(photo_id)
+                files.add((owner_id, filename))
+                if edited_filename:
+                    files.add((owner_id, edited_filename))
+                    
+        return VaultAccess(version, roles, frozenset(roles) | frozenset(created), frozenset(photo_ids), frozenset(files))
+    
+    def can_view_vault(self, user_id: int, vault_id: int) -> bool:
+        """Check whether a user is an active member or the creator of a vault"""
+        return vault_id in self.get(user_id).vault_ids
+    
+    def can_view_photo(self, user_id: int, photo_id: int) -> bool:
+        """Check whether a photo is shared into a vault the user belongs to"""
+        return photo_id in self.get(user_id).photo_ids
+    
+    def can_view_file(self, user_id: int, owner_id: int, filenames: Iterable[str]) -> bool:
+        """
+        Check whether any of the files is a photo shared into a vault the user belongs to
+        
+        Args:
+            user_id: Requesting user
+            owner_id: Owner of the upload folder the file is in
+            filenames: Names the requested file may be stored under
+            
+        Returns:
+            True if access is allowed
+        """
+        files = self.get(user_id).files
+        return any((owner_id, filename) in files for filename in filenames)
+    
+    def invalidate(self, user_ids: Iterable[int]):
+        """Drop cached entries of this worker"""
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+    
+    def bump(self, connection, user_ids: Set[int]):
+        """
+        Give users a new version token so every worker rebuilds their access
+        
+        Args:
+            connection: Connection in the writing transaction
+            user_ids: Users whose access changed
+        """
+        now = datetime.utcnow()
+        rows = [{'user_id': user_id, 'version': uuid.uuid4().hex, 'updated_at': now} for user_id in sorted(user_ids)]
+        bulk_upsert(connection, AclVersion.__table__, rows, ('user_id',), ('version', 'updated_at'))
+    
+    def vault_audience(self, connection, vault_ids: Iterable[int]) -> Set[int]:
+        """Active members of vaults, whose shared photo sets depend on the vaults' shares"""
+        vault_ids = list(vault_ids)
+        if not vault_ids:
+            return set()
+        return {user_id for (user_id,) in connection.execute(
+            db.select(FamilyMember.user_id).where(
+                FamilyMember.vault_id.in_(vault_ids), FamilyMember.status == 'active'
+            ).distinct()
+        )}
+    
+    def mark_changed(self, session, user_ids: Set[int]):
+        """
+        Record access changes made outside the ORM, such as bulk inserts
+        
+        Args:
+            session: Session of the writing transaction
+            user_ids: Users whose access changed
+        """
+        if user_ids:
+            self.bump(session.connection(), user_ids)
+            session.info.setdefault(PENDING_USERS_KEY, set()).update(user_ids)
+            # Reads later in the same transaction see the change
+            self.invalidate(user_ids)
+    
+    def _changed(self, obj, columns: Tuple[str, ...]) -> Set:
+        """Current and previous values of columns that changed on a dirty object"""
+        state = inspect(obj)
+        values = set()
+        for column in columns:
+            history = state.attrs[column].history
+            if history.has_changes():
+                values.update(value for value in chain(history.added, history.deleted) if value is not None)
+        return values
+    
+    def _collect_changes(self, session, flush_context):
+        """Find the users whose vault access a flush changes and bump their versions"""
+        users = set()
+        vaults = set()
+        photos = set()
+        for obj in chain(session.new, session.dirty, session.deleted):
+            dirty = obj in session.dirty
+            if isinstance(obj, FamilyMember):
+                if not dirty or self._changed(obj, ('vault_id', 'role', 'status')):
+                    users.add(obj.user_id)
+                if dirty:
+                    users.update(self._changed(obj, ('user_id',)))
+            elif isinstance(obj, VaultPhoto):
+                if not dirty:
+                    vaults.add(obj.vault_id)
+                else:
+                    vaults.update(self._changed(obj, ('vault_id',)))
+                    if self._changed(obj, ('photo_id',)):
+                        vaults.add(obj.vault_id)
+            elif isinstance(obj, FamilyVault):
+                if not dirty:
+                    users.add(obj.created_by)
+                else:
+                    users.update(self._changed(obj, ('created_by',)))
+            elif isinstance(obj, Photo) and dirty and self._changed(obj, ('filename', 'edited_filename')):
+                photos.add(obj.id)
+                
+        if not (users or vaults or photos):
+            return
+            
+        connection = session.connection()
+        if photos:
+            vaults.update(vault_id for (vault_id,) in connection.execute(
+                db.select(VaultPhoto.vault_id).where(VaultPhoto.photo_id.in_(photos)).distinct()
+            ))
+        users.update(self.vault_audience(connection, vaults))
+        users.discard(None)
+        self.mark_changed(session, users)
+    
+    def _apply_changes(self, session):
+        """Drop this worker's entries once the changes are committed; other workers follow the versions"""
+        pending = session.info.pop(PENDING_USERS_KEY, None)
+        if pending:
+            self.invalidate(pending)
+    
+    def _discard_changes(self, session):
+        """Drop entries that may have been loaded from a rolled-back transaction"""
+        pending = session.info.pop(PENDING_USERS_KEY, None)
+        if pending:
+            self.invalidate(pending)
+
+# Global service instance
+vault_acl = VaultAclService()
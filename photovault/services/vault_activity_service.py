@@ -0,0 +1,240 @@
+"""
+Vault Activity Service for PhotoVault
+Fans family vault events out to a timeline row per member when they are
+written, so a user's activity across all their vaults is one indexed read
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from sqlalchemy import DateTime, Integer, String, and_, event, func, inspect, literal, or_, select
+from sqlalchemy.orm import aliased
+from photovault.models import FamilyMember, FamilyVault, Photo, Story, User, VaultActivity, VaultPhoto
+from photovault.extensions import db
+from photovault.utils.upsert import insert_from_select
+
+logger = logging.getLogger(__name__)
+
+# Earlier photos and stories of a vault copied into a new member's timeline
+JOIN_HISTORY_LIMIT = 100
+
+ACTIVITY_COLUMNS = ('user_id', 'vault_id', 'actor_id', 'activity_type', 'subject_id', 'photo_id', 'summary', 'created_at')
+
+def _active_members(vault_column):
+    return and_(FamilyMember.vault_id == vault_column, FamilyMember.status == 'active')
+
+class VaultActivityService:
+    """Fan-out-on-write timeline of shared photos, published stories and new members"""
+    
+    def init_app(self, app):
+        """
+        Start fanning out activity on every flush of the application session
+        
+        Args:
+            app: Flask application
+        """
+        if not event.contains(db.session, 'after_flush', self._fan_out_flush):
+            event.listen(db.session, 'after_flush', self._fan_out_flush)
+    
+    def _photo_rows(self, condition, member_condition=None, occurred_at=None):
+        """SELECT of one 'photo_shared' entry per active member for the matching vault photos"""
+        query = select(
+            FamilyMember.user_id,
+            VaultPhoto.vault_id,
+            VaultPhoto.shared_by,
+            literal('photo_shared', String),
+            VaultPhoto.id,
+            VaultPhoto.photo_id,
+            Photo.original_name,
+            occurred_at if occurred_at is not None else func.coalesce(VaultPhoto.shared_at, func.now())
+        ).join_from(VaultPhoto, FamilyMember, _active_members(VaultPhoto.vault_id)).join(
+            Photo, Photo.id == VaultPhoto.photo_id
+        ).where(condition)
+        return query.where(member_condition) if member_condition is not None else query
+    
+    def _story_rows(self, condition, member_condition=None, occurred_at=None):
+        """SELECT of one 'story_published' entry per active member for the matching published stories"""
+        query = select(
+            FamilyMember.user_id,
+            Story.vault_id,
+            Story.author_id,
+            literal('story_published', String),
+            Story.id,
+            literal(None, Integer),
+            Story.title,
+            occurred_at if occurred_at is not None else func.coalesce(Story.created_at, func.now())
+        ).join_from(Story, FamilyMember, _active_members(Story.vault_id)).where(
+            Story.is_published == True, condition
+        )
+        return query.where(member_condition) if member_condition is not None else query
+    
+    def _member_rows(self, condition, occurred_at=None):
+        """SELECT of one 'member_joined' entry per active member for the matching memberships"""
+        joiner = aliased(FamilyMember)
+        return select(
+            FamilyMember.user_id,
+            joiner.vault_id,
+            joiner.user_id,
+            literal('member_joined', String),
+            joiner.id,
+            literal(None, Integer),
+            User.username,
+            occurred_at if occurred_at is not None else func.coalesce(joiner.joined_at, func.now())
+        ).join_from(joiner, FamilyMember, _active_members(joiner.vault_id)).join(
+            User, User.id == joiner.user_id
+        ).where(joiner.status == 'active', condition(joiner))
+    
+    def _insert(self, connection, rows) -> int:
+        return insert_from_select(connection, VaultActivity.__table__, ACTIVITY_COLUMNS, rows,
+                                  ('user_id', 'activity_type', 'subject_id'))
+    
+    def _delete(self, connection, condition):
+        connection.execute(VaultActivity.__table__.delete().where(condition))
+    
+    def photos_shared(self, connection, condition) -> int:
+        """
+        Fan out vault photos shared by a Core statement, which skips the flush hook
+        
+        Args:
+            connection: Connection or session in the writing transaction
+            condition: Filter on VaultPhoto selecting the new shares
+            
+        Returns:
+            Number of timeline entries written
+        """
+        return self._insert(connection, self._photo_rows(condition))
+    
+    def photos_unshared(self, connection, vault_id: int, vault_photo_ids: Iterable[int]):
+        """
+        Remove the entries of vault photos a Core statement may have deleted
+        
+        Args:
+            connection: Connection or session in the writing transaction
+            vault_id: Family vault
+            vault_photo_ids: Vault photo rows that were requested for removal
+        """
+        vault_photo_ids = list(vault_photo_ids)
+        if vault_photo_ids:
+            self._delete(connection, and_(
+                VaultActivity.activity_type == 'photo_shared',
+                VaultActivity.vault_id == vault_id,
+                VaultActivity.subject_id.in_(vault_photo_ids),
+                VaultActivity.subject_id.notin_(select(VaultPhoto.id).where(VaultPhoto.id.in_(vault_photo_ids)))
+            ))
+    
+    def _fan_out_flush(self, session, flush_context):
+        """Write and remove timeline entries for vault changes made by a flush"""
+        shared = set()
+        published = set()
+        republished = set()
+        unpublished = set()
+        joined = set()
+        rejoined = set()
+        left = set()
+        unshared = set()
+        vaults = set()
+        photos = set()
+        
+        for obj in session.new:
+            if isinstance(obj, VaultPhoto):
+                shared.add(obj.id)
+            elif isinstance(obj, Story) and obj.is_published:
+                published.add(obj.id)
+            elif isinstance(obj, FamilyMember) and obj.status == 'active':
+                joined.add(obj.id)
+        for obj in session.dirty:
+            if isinstance(obj, Story) and inspect(obj).attrs.is_published.history.has_changes():
+                (republished if obj.is_published else unpublished).add(obj.id)
+            elif isinstance(obj, FamilyMember) and inspect(obj).attrs.status.history.has_changes():
+                if obj.status == 'active':
+                    rejoined.add(obj.id)
+                else:
+                    left.add((obj.id, obj.user_id, obj.vault_id))
+        for obj in session.deleted:
+            if isinstance(obj, VaultPhoto):
+                unshared.add(obj.id)
+            elif isinstance(obj, Story):
+                unpublished.add(obj.id)
+            elif isinstance(obj, FamilyMember):
+                left.add((obj.id, obj.user_id, obj.vault_id))
+            elif isinstance(obj, FamilyVault):
+                vaults.add(obj.id)
+            elif isinstance(obj, Photo):
+                photos.add(obj.id)
+                
+        if not (shared or published or republished or unpublished or joined or rejoined or left
+                or unshared or vaults or photos):
+            return
+            
+        connection = session.connection()
+        now = literal(datetime.utcnow(), DateTime)
+        activity = VaultActivity.__table__.c
+        
+        # Entries of content removed from a vault, and the timeline of members who left it
+        removed = []
+        if unshared:
+            removed.append(and_(activity.activity_type == 'photo_shared', activity.subject_id.in_(unshared)))
+        if unpublished:
+            removed.append(and_(activity.activity_type == 'story_published', activity.subject_id.in_(unpublished)))
+        for member_id, user_id, vault_id in left:
+            removed.append(and_(activity.user_id == user_id, activity.vault_id == vault_id))
+            removed.append(and_(activity.activity_type == 'member_joined', activity.subject_id == member_id))
+        if vaults:
+            removed.append(activity.vault_id.in_(vaults))
+        if photos:
+            removed.append(activity.photo_id.in_(photos))
+        if removed:
+            self._delete(connection, or_(*removed))
+            
+        if shared:
+            self._insert(connection, self._photo_rows(VaultPhoto.id.in_(shared)))
+        if published:
+            self._insert(connection, self._story_rows(Story.id.in_(published)))
+        if republished:
+            self._insert(connection, self._story_rows(Story.id.in_(republished), occurred_at=now))
+        if joined:
+            self._insert(connection, self._member_rows(lambda joiner: joiner.id.in_(joined)))
+        if rejoined:
+            self._insert(connection, self._member_rows(lambda joiner: joiner.id.in_(rejoined), occurred_at=now))
+        for member_id in joined | rejoined:
+            self._copy_history(connection, member_id)
+    
+    def _copy_history(self, connection, member_id: int):
+        """Give a new member the latest photos and stories of the vault they joined"""
+        member_condition = FamilyMember.id == member_id
+        vault_id = select(FamilyMember.vault_id).where(member_condition).scalar_subquery()
+        self._insert(connection, self._photo_rows(VaultPhoto.vault_id == vault_id, member_condition).order_by(
+            VaultPhoto.shared_at.desc(), VaultPhoto.id.desc()
+        ).limit(JOIN_HISTORY_LIMIT))
+        self._insert(connection, self._story_rows(Story.vault_id == vault_id, member_condition).order_by(
+            Story.created_at.desc(), Story.id.desc()
+        ).limit(JOIN_HISTORY_LIMIT))
+    
+    def rebuild(self, vault_id: Optional[int] = None) -> Dict[str, int]:
+        """
+        Rebuild the timelines from current vault content, one committed vault at a time
+        
+        Args:
+            vault_id: Only rebuild this vault
+            
+        Returns:
+            Entry counts: 'vaults' and 'entries'
+        """
+        query = db.session.query(FamilyVault.id).order_by(FamilyVault.id)
+        if vault_id:
+            query = query.filter(FamilyVault.id == vault_id)
+        vault_ids = [row.id for row in query]
+        
+        counts = {'vaults': 0, 'entries': 0}
+        for current_id in vault_ids:
+            connection = db.session.connection()
+            self._delete(connection, VaultActivity.vault_id == current_id)
+            counts['entries'] += self._insert(connection, self._photo_rows(VaultPhoto.vault_id == current_id))
+            counts['entries'] += self._insert(connection, self._story_rows(Story.vault_id == current_id))
+            counts['entries'] += self._insert(connection, self._member_rows(lambda joiner: joiner.vault_id == current_id))
+            db.session.commit()
+            counts['vaults'] += 1
+        return counts
+
+# Global service instance
+vault_activity = VaultActivityService()
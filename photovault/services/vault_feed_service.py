@@ -0,0 +1,162 @@
+"""
+Vault Feed Service for PhotoVault
+Keyset-paginated pages of a family vault's shared photos and stories, each
+page loaded with its photos and people in a fixed number of queries, and of
+a user's activity timeline across all their vaults
+"""
+
+import base64
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import joinedload, lazyload, load_only
+from photovault.models import FamilyMember, FamilyVault, Photo, Story, User, VaultActivity, VaultPhoto
+from photovault.extensions import db
+
+logger = logging.getLogger(__name__)
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Opaque cursor of the last row of a page, ordered by (timestamp, id) descending"""
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{row_id}".encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Read a cursor made by encode_cursor
+    
+    Args:
+        cursor: Cursor string
+        
+    Returns:
+        (timestamp, row_id)
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def _after_cursor(timestamp_column, id_column, cursor: str):
+    """Keyset condition selecting the rows after a cursor in descending order"""
+    timestamp, row_id = decode_cursor(cursor)
+    return or_(timestamp_column < timestamp, and_(timestamp_column == timestamp, id_column < row_id))
+
+class VaultFeedService:
+    """Paginated reads of family vault content"""
+    
+    def photo_page(self, vault_id: int, cursor: Optional[str] = None, limit: int = 48) -> Tuple[List[VaultPhoto], Optional[str]]:
+        """
+        Get a page of a vault's shared photos, newest first
+        
+        The photo and sharer of every row come from the same joined query.
+        
+        Args:
+            vault_id: Family vault
+            cursor: Cursor of the previous page's last row
+            limit: Photos per page
+            
+        Returns:
+            (vault photos, cursor of the next page or None)
+            
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        query = VaultPhoto.query.options(
+            joinedload(VaultPhoto.photo).options(
+                load_only(Photo.id, Photo.user_id, Photo.filename, Photo.original_name, Photo.thumbnail_path),
+                lazyload(Photo.people)
+            ),
+            joinedload(VaultPhoto.sharer).load_only(User.id, User.username)
+        ).filter(VaultPhoto.vault_id == vault_id)
+        if cursor:
+            query = query.filter(_after_cursor(VaultPhoto.shared_at, VaultPhoto.id, cursor))
+        rows = query.order_by(VaultPhoto.shared_at.desc(), VaultPhoto.id.desc()).limit(limit + 1).all()
+        
+        page = rows[:limit]
+        next_cursor = encode_cursor(page[-1].shared_at, page[-1].id) if len(rows) > limit else None
+        return page, next_cursor
+    
+    def story_page(self, vault_id: int, cursor: Optional[str] = None, limit: int = 10) -> Tuple[List[Story], Optional[str]]:
+        """
+        Get a page of a vault's published stories, newest first
+        
+        Args:
+            vault_id: Family vault
+            cursor: Cursor of the previous page's last row
+            limit: Stories per page
+            
+        Returns:
+            (stories, cursor of the next page or None)
+            
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        query = Story.query.options(
+            joinedload(Story.author).load_only(User.id, User.username)
+        ).filter(Story.vault_id == vault_id, Story.is_published == True)
+        if cursor:
+            query = query.filter(_after_cursor(Story.created_at, Story.id, cursor))
+        rows = query.order_by(Story.created_at.desc(), Story.id.desc()).limit(limit + 1).all()
+        
+        page = rows[:limit]
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if len(rows) > limit else None
+        return page, next_cursor
+    
+    def activity_page(self, user_id: int, cursor: Optional[str] = None, limit: int = 20) -> Tuple[List, Optional[str]]:
+        """
+        Get a page of a user's activity across all their vaults, newest first
+        
+        Entries are precomputed per member, so the page is one range scan of
+        the (user_id, created_at, id) index whatever the number of vaults.
+        
+        Args:
+            user_id: Timeline owner
+            cursor: Cursor of the previous page's last entry
+            limit: Entries per page
+            
+        Returns:
+            (rows of VaultActivity, vault_name, actor_name and the shared photo's
+            photo_owner_id, photo_filename and photo_thumbnail_path, cursor of the next page or None)
+            
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        query = db.session.query(
+            VaultActivity,
+            FamilyVault.name.label('vault_name'),
+            User.username.label('actor_name'),
+            Photo.user_id.label('photo_owner_id'),
+            Photo.filename.label('photo_filename'),
+            Photo.thumbnail_path.label('photo_thumbnail_path')
+        ).join(FamilyVault, FamilyVault.id == VaultActivity.vault_id).outerjoin(
+            User, User.id == VaultActivity.actor_id
+        ).outerjoin(Photo, Photo.id == VaultActivity.photo_id).filter(VaultActivity.user_id == user_id)
+        if cursor:
+            query = query.filter(_after_cursor(VaultActivity.created_at, VaultActivity.id, cursor))
+        rows = query.order_by(VaultActivity.created_at.desc(), VaultActivity.id.desc()).limit(limit + 1).all()
+        
+        page = rows[:limit]
+        next_cursor = encode_cursor(page[-1].VaultActivity.created_at, page[-1].VaultActivity.id) if len(rows) > limit else None
+        return page, next_cursor
+    
+    def members(self, vault_id: int) -> List[FamilyMember]:
+        """Get a vault's active members with their users loaded"""
+        return FamilyMember.query.options(
+            joinedload(FamilyMember.user).load_only(User.id, User.username)
+        ).filter_by(vault_id=vault_id, status='active').order_by(FamilyMember.joined_at).all()
+    
+    def counts(self, vault_id: int) -> Dict[str, int]:
+        """Count a vault's shared photos and published stories"""
+        return {
+            'photos': db.session.query(func.count(VaultPhoto.id)).filter(VaultPhoto.vault_id == vault_id).scalar(),
+            'stories': db.session.query(func.count(Story.id)).filter(
+                Story.vault_id == vault_id, Story.is_published == True
+            ).scalar()
+        }
+
+# Global service instance
+vault_feed = VaultFeedService()
@@ -0,0 +1,96 @@
+"""
+Vault Share Service for PhotoVault
+Shares and unshares many photos with a family vault in one statement each
+"""
+
+import logging
+from datetime import datetime
+from typing import Iterable, Optional
+from sqlalchemy import Integer, DateTime, Text, and_, literal, select
+from photovault.models import Photo, VaultPhoto
+from photovault.extensions import db
+from photovault.services.vault_acl_service import vault_acl
+from photovault.services.vault_activity_service import vault_activity
+from photovault.utils.upsert import insert_from_select
+
+logger = logging.getLogger(__name__)
+
+class VaultShareService:
+    """Bulk changes to the photos shared with a family vault"""
+    
+    def share_photos(self, vault_id: int, user_id: int, photo_ids: Iterable[int], caption: Optional[str] = None) -> int:
+        """
+        Share the user's photos with a vault, skipping photos already shared there
+        
+        Ownership is checked inside the INSERT ... SELECT, so photos of other
+        users are never shared and the whole request is one statement. The
+        caller commits.
+        
+        Args:
+            vault_id: Target family vault
+            user_id: Sharing user
+            photo_ids: Photos to share
+            caption: Caption given to every newly shared photo
+            
+        Returns:
+            Number of photos newly shared
+        """
+        photo_ids = list(set(photo_ids))
+        if not photo_ids:
+            return 0
+            
+        shared_at = datetime.utcnow()
+        owned_photos = select(
+            literal(vault_id, Integer),
+            Photo.id,
+            literal(user_id, Integer),
+            literal(caption, Text),
+            literal(shared_at, DateTime)
+        ).where(Photo.id.in_(photo_ids), Photo.user_id == user_id)
+        shared = insert_from_select(db.session, VaultPhoto.__table__,
+                                    ('vault_id', 'photo_id', 'shared_by', 'caption', 'shared_at'),
+                                    owned_photos, ('vault_id', 'photo_id'))
+                                    
+        # Core statements skip the flush hooks, so the vault's members are expired and notified here
+        if shared:
+            vault_acl.mark_changed(db.session, vault_acl.vault_audience(db.session.connection(), [vault_id]))
+            vault_activity.photos_shared(db.session, and_(
+                VaultPhoto.vault_id == vault_id,
+                VaultPhoto.shared_by == user_id,
+                VaultPhoto.shared_at == shared_at,
+                VaultPhoto.photo_id.in_(photo_ids)
+            ))
+        return shared
+    
+    def unshare_photos(self, vault_id: int, vault_photo_ids: Iterable[int], shared_by: Optional[int] = None) -> int:
+        """
+        Remove shared photos from a vault with one DELETE; the photos themselves are kept
+        
+        Args:
+            vault_id: Family vault
+            vault_photo_ids: Vault photo rows to remove
+            shared_by: Only remove rows shared by this user; None removes any
+            
+        Returns:
+            Number of photos removed
+        """
+        vault_photo_ids = list(set(vault_photo_ids))
+        if not vault_photo_ids:
+            return 0
+            
+        vault_photos = VaultPhoto.__table__
+        statement = vault_photos.delete().where(
+            vault_photos.c.vault_id == vault_id,
+            vault_photos.c.id.in_(vault_photo_ids)
+        )
+        if shared_by is not None:
+            statement = statement.where(vault_photos.c.shared_by == shared_by)
+        removed = db.session.execute(statement).rowcount
+        
+        if removed:
+            vault_acl.mark_changed(db.session, vault_acl.vault_audience(db.session.connection(), [vault_id]))
+            vault_activity.photos_unshared(db.session, vault_id, vault_photo_ids)
+        return removed
+
+# Global service instance
+vault_share = VaultShareService()
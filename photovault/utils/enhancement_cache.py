@@ -0,0 +1,269 @@
+"""
+Enhancement Output Cache for PhotoVault
+Stores each enhanced render once on disk, keyed by (source content hash,
+canonical settings, engine version), and hands out copies of it
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Default size budget of the cache directory
+DEFAULT_CACHE_MAX_MB = 1024
+
+# Eviction trims the cache to this fraction of the budget so it does not run on every store
+EVICTION_TARGET_RATIO = 0.9
+
+# Minimum seconds between directory scans for eviction
+EVICTION_INTERVAL = 60
+
+# Largest brightness, contrast, sharpness or color factor accepted from clients
+MAX_ENHANCEMENT_FACTOR = 5.0
+
+def canonical_settings(settings: Optional[Dict], defaults: Dict) -> Dict:
+    """
+    Validate and normalize enhancement settings so equivalent requests produce the same cache key
+    
+    Unknown keys are dropped (the engine ignores them), missing keys take their
+    default, flags must be booleans and factors are rounded to 3 decimals.
+    
+    Args:
+        settings: Requested settings
+        defaults: Default settings of the enhancer
+        
+    Returns:
+        Canonical settings dictionary
+        
+    Raises:
+        ValueError: If the settings are not an object or a value is out of range
+    """
+    if settings is None:
+        settings = {}
+    if not isinstance(settings, dict):
+        raise ValueError("Enhancement settings must be an object")
+        
+    canonical = {}
+    for key, default in defaults.items():
+        value = settings.get(key, default)
+        if isinstance(default, bool):
+            if not isinstance(value, bool):
+                raise ValueError(f"Enhancement setting '{key}' must be true or false")
+            canonical[key] = value
+            continue
+            
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"Enhancement setting '{key}' must be a number")
+        try:
+            factor = float(value)
+        except ValueError:
+            raise ValueError(f"Enhancement setting '{key}' must be a number")
+        if not 0.0 <= factor <= MAX_ENHANCEMENT_FACTOR:
+            raise ValueError(f"Enhancement setting '{key}' must be between 0 and {MAX_ENHANCEMENT_FACTOR:g}")
+        canonical[key] = round(factor, 3)
+    return canonical
+
+def settings_key(settings: Dict) -> str:
+    """Serialize canonical settings deterministically"""
+    return json.dumps(settings, sort_keys=True, separators=(',', ':'))
+
+class EnhancementOutputCache:
+    """Size-bounded on-disk store of enhanced renders, shared by every worker using the same folder"""
+    
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or os.environ.get('ENHANCEMENT_CACHE_DIR')
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('ENHANCEMENT_CACHE_MAX_MB') or DEFAULT_CACHE_MAX_MB) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self._last_eviction = 0.0
+        self._lock = threading.Lock()
+        # (path, mtime_ns, size) -> content hash, so repeated edits of a photo hash it once
+        self._hashes = OrderedDict()
+    
+    def get_cache_dir(self) -> Optional[str]:
+        """
+        Resolve the cache directory, defaulting to a hidden folder next to the user uploads
+        
+        Returns:
+            Directory path, or None when caching is disabled or no folder is configured
+        """
+        if not self.max_bytes:
+            return None
+        if self.cache_dir:
+            return self.cache_dir
+        try:
+            from flask import current_app
+            return os.path.join(current_app.config['UPLOAD_FOLDER'], '.enhancement_cache')
+        except (RuntimeError, KeyError):
+            # Outside an application there is no upload folder to share
+            return None
+    
+    def source_hash(self, image_path: str) -> Optional[str]:
+        """
+        Get the content hash of a source image, remembering it while the file is unchanged
+        
+        Args:
+            image_path: Path to the source image
+            
+        Returns:
+            Hex digest, or None if the file cannot be read
+        """
+        from photovault.services.detection_cache_service import compute_content_hash
+        
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        memo_key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+        
+        with self._lock:
+            content_hash = self._hashes.get(memo_key)
+            if content_hash is not None:
+                self._hashes.move_to_end(memo_key)
+                return content_hash
+                
+        content_hash = compute_content_hash(image_path)
+        if content_hash is not None:
+            with self._lock:
+                self._hashes[memo_key] = content_hash
+                while len(self._hashes) > 1024:
+                    self._hashes.popitem(last=False)
+        return content_hash
+    
+    def make_key(self, source_hash: str, settings: Dict, engine_version: str, output_format: str) -> str:
+        """
+        Build the cache key of a render
+        
+        Args:
+            source_hash: Content hash of the source image
+            settings: Canonical enhancement settings
+            engine_version: Version key of the enhancement engine
+            output_format: Extension of the output file, which selects the encoder
+            
+        Returns:
+            Hex cache key
+        """
+        material = f"{source_hash}|{settings_key(settings)}|{engine_version}|{output_format.lower()}"
+        return hashlib.sha256(material.encode()).hexdigest()
+    
+    def _entry_path(self, cache_dir: str, key: str) -> str:
+        return os.path.join(cache_dir, key[:2], key)
+    
+    def fetch(self, key: str, output_path: str) -> bool:
+        """
+        Materialize a cached render at output_path
+        
+        Args:
+            key: Cache key
+            output_path: Where the enhanced image should appear
+            
+        Returns:
+            True on a cache hit
+        """
+        cache_dir = self.get_cache_dir()
+        if cache_dir is None:
+            return False
+            
+        entry_path = self._entry_path(cache_dir, key)
+        try:
+            _copy_atomically(entry_path, output_path)
+            # The entry's mtime is its last use, which eviction orders by
+            os.utime(entry_path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Enhancement cache read failed for {key}: {e}")
+            return False
+    
+    def store(self, key: str, rendered_path: str):
+        """
+        Keep a fresh render in the cache
+        
+        Args:
+            key: Cache key
+            rendered_path: The enhanced image that was just written
+        """
+        cache_dir = self.get_cache_dir()
+        if cache_dir is None:
+            return
+            
+        entry_path = self._entry_path(cache_dir, key)
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            _copy_atomically(rendered_path, entry_path)
+        except OSError as e:
+            logger.warning(f"Enhancement cache store failed for {key}: {e}")
+            return
+            
+        if time.monotonic() - self._last_eviction >= EVICTION_INTERVAL:
+            self.evict()
+    
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Delete least recently used renders until the cache fits its budget
+        
+        Args:
+            max_bytes: Budget to trim to (defaults to the configured size)
+            
+        Returns:
+            Number of deleted renders
+        """
+        cache_dir = self.get_cache_dir()
+        self._last_eviction = time.monotonic()
+        if cache_dir is None or not os.path.isdir(cache_dir):
+            return 0
+            
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        entries = []
+        total = 0
+        for shard in os.scandir(cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+                
+        if total <= budget:
+            return 0
+            
+        target = budget * EVICTION_TARGET_RATIO if budget else 0
+        deleted = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            deleted += 1
+            
+        logger.info(f"Evicted {deleted} cached enhancement renders")
+        return deleted
+
+def _copy_atomically(source_path: str, target_path: str):
+    """Atomically place a private copy of source_path's content at target_path"""
+    temp_path = f"{target_path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, target_path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+# Global cache instance
+enhancement_cache = EnhancementOutputCache()
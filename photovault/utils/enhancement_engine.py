@@ -0,0 +1,302 @@
+"""
+Tiled Enhancement Engine for PhotoVault
+Runs the OpenCV enhancement steps over overlapping tiles on a thread pool,
+keeping every intermediate in uint8 so large scans stay within a bounded memory budget
+"""
+
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    cv2 = None
+    OPENCV_AVAILABLE = False
+
+# Bump whenever a change to the enhancement steps alters their output, so cached renders are not reused
+ENGINE_VERSION = 1
+
+# Edge (px) of the square tiles the image is processed in
+DEFAULT_TILE_SIZE = 1024
+
+# Bilateral filter diameter; tiles overlap by its radius so seams match a whole-image pass
+DENOISE_DIAMETER = 9
+TILE_OVERLAP = DENOISE_DIAMETER // 2
+
+# Maximum per-channel difference for an image to count as grayscale when colorizing
+GRAYSCALE_TOLERANCE = 5
+
+# 3x3 smoothing kernel the sharpness adjustment blends away from (PIL's ImageFilter.SMOOTH)
+SMOOTH_KERNEL = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=np.float32) / 13
+
+def histogram_percentile(histogram: np.ndarray, percentile: float) -> float:
+    """
+    Percentile of uint8 values from their 256-bin histogram, matching
+    np.percentile's linear interpolation on the raw values
+    
+    Args:
+        histogram: Count of each value 0-255
+        percentile: Percentile between 0 and 100
+        
+    Returns:
+        Percentile value on the 0-255 scale
+    """
+    cumulative = np.cumsum(histogram)
+    total = int(cumulative[-1])
+    if total == 0:
+        return 0.0
+        
+    rank = (total - 1) * percentile / 100.0
+    lower_rank = int(np.floor(rank))
+    upper_rank = min(lower_rank + 1, total - 1)
+    
+    # Value at sorted position k is the first bin whose cumulative count exceeds k
+    lower = int(np.searchsorted(cumulative, lower_rank, side='right'))
+    upper = int(np.searchsorted(cumulative, upper_rank, side='right'))
+    return lower + (upper - lower) * (rank - lower_rank)
+
+def levels_lut(low: float, high: float) -> np.ndarray:
+    """
+    Build the lookup table that stretches [low, high] (0-1 scale) to the full range
+    
+    Args:
+        low: Black point
+        high: White point
+        
+    Returns:
+        uint8 lookup table with 256 entries
+    """
+    values = np.arange(256, dtype=np.float64) / 255.0
+    stretched = np.clip((values - low) / (high - low), 0, 1)
+    return (stretched * 255).astype(np.uint8)
+
+class TiledEnhancementEngine:
+    """Colorize, denoise, CLAHE, auto-levels and tone adjustments over overlapping tiles"""
+    
+    def __init__(self, tile_size: int = None, workers: int = None):
+        if tile_size is None:
+            tile_size = int(os.environ.get('ENHANCEMENT_TILE_SIZE') or DEFAULT_TILE_SIZE)
+        if workers is None:
+            workers = int(os.environ.get('ENHANCEMENT_WORKERS') or 0) or os.cpu_count() or 1
+        self.tile_size = max(64, tile_size)
+        self.workers = max(1, workers)
+    
+    def process(self, img: np.ndarray, settings: Dict) -> np.ndarray:
+        """
+        Apply the enabled enhancement steps
+        
+        Args:
+            img: BGR uint8 image (may be modified in place)
+            settings: Enhancement settings (colorize, denoise, clahe_enabled, auto_levels,
+                brightness, contrast, color, sharpness)
+                
+        Returns:
+            Enhanced BGR uint8 image
+        """
+        if len(img.shape) == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+            
+        colorize = settings.get('colorize', False)
+        denoise = settings.get('denoise', True)
+        clahe_enabled = settings.get('clahe_enabled', True)
+        auto_levels = settings.get('auto_levels', True)
+        
+        tiles = self._tiles(img.shape[0], img.shape[1])
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            if colorize:
+                colorize = self._is_grayscale(executor, img, tiles)
+                if not colorize:
+                    logger.info("Image already has color, skipping colorization")
+                    
+            # Pass 1: pixel-local colorization and the bilateral filter, which
+            # reads TILE_OVERLAP pixels around each tile
+            if colorize or denoise:
+                out = np.empty_like(img)
+                list(executor.map(lambda tile: self._colorize_denoise_tile(img, out, tile, colorize, denoise), tiles))
+                if colorize:
+                    logger.info("Applied automatic colorization with warm tones")
+            else:
+                out = img
+                
+            # CLAHE works on 8x8 regions of the whole image, so the L plane is
+            # assembled once and equalized in a single call
+            if clahe_enabled:
+                lightness = np.empty(img.shape[:2], dtype=np.uint8)
+                list(executor.map(lambda tile: self._extract_lightness_tile(out, lightness, tile), tiles))
+                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+                lightness = clahe.apply(lightness)
+                histograms = list(executor.map(
+                    lambda tile: self._merge_lightness_tile(out, lightness, tile, auto_levels), tiles
+                ))
+                del lightness
+            elif auto_levels:
+                histograms = list(executor.map(lambda tile: self._histogram_tile(out, tile), tiles))
+                
+            # Auto-levels from the summed histograms, applied as a lookup table
+            if auto_levels:
+                histogram = np.sum(histograms, axis=0)
+                low = histogram_percentile(histogram, 1) / 255.0
+                high = histogram_percentile(histogram, 99) / 255.0
+                if high - low >= 0.01:
+                    lut = levels_lut(low, high)
+                    list(executor.map(lambda tile: self._apply_lut_tile(out, lut, tile), tiles))
+                    
+            out = self._adjust(executor, out, tiles, settings)
+            
+        return out
+    
+    def _adjust(self, executor: ThreadPoolExecutor, out: np.ndarray,
+                tiles: List[Tuple[int, int, int, int]], settings: Dict) -> np.ndarray:
+        """
+        Brightness, contrast, color and sharpness with the semantics of PIL's
+        ImageEnhance, applied in that order directly on the BGR array
+        
+        Each factor blends the image with a degenerate version of itself
+        (black, mean gray, grayscale, smoothed); 1.0 leaves the image unchanged.
+        """
+        brightness = float(settings.get('brightness', 1.0))
+        contrast = float(settings.get('contrast', 1.0))
+        color = float(settings.get('color', 1.0))
+        sharpness = float(settings.get('sharpness', 1.0))
+        
+        if brightness != 1.0:
+            list(executor.map(lambda tile: self._brightness_tile(out, tile, brightness), tiles))
+            
+        if contrast != 1.0:
+            # Blend towards the mean luminance of the whole image
+            gray_sum = sum(executor.map(lambda tile: self._gray_sum_tile(out, tile), tiles))
+            mean = int(gray_sum / (out.shape[0] * out.shape[1]) + 0.5)
+            list(executor.map(lambda tile: self._contrast_tile(out, tile, contrast, mean), tiles))
+            
+        if color != 1.0:
+            list(executor.map(lambda tile: self._color_tile(out, tile, color), tiles))
+            
+        if sharpness != 1.0:
+            # The smoothing kernel reads neighbouring pixels, so write to a new buffer
+            sharpened = np.empty_like(out)
+            list(executor.map(lambda tile: self._sharpness_tile(out, sharpened, tile, sharpness), tiles))
+            out = sharpened
+            
+        return out
+    
+    def _brightness_tile(self, out: np.ndarray, tile: Tuple[int, int, int, int], factor: float):
+        """Blend one tile with black"""
+        y0, y1, x0, x1 = tile
+        out[y0:y1, x0:x1] = cv2.convertScaleAbs(out[y0:y1, x0:x1], alpha=max(factor, 0.0))
+    
+    def _gray_sum_tile(self, out: np.ndarray, tile: Tuple[int, int, int, int]) -> int:
+        """Sum of the luminance of one tile"""
+        y0, y1, x0, x1 = tile
+        return int(cv2.cvtColor(out[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY).sum(dtype=np.int64))
+    
+    def _contrast_tile(self, out: np.ndarray, tile: Tuple[int, int, int, int], factor: float, mean: int):
+        """Blend one tile with a flat gray of the image's mean luminance"""
+        y0, y1, x0, x1 = tile
+        region = out[y0:y1, x0:x1]
+        out[y0:y1, x0:x1] = cv2.addWeighted(region, factor, region, 0.0, mean * (1.0 - factor))
+    
+    def _color_tile(self, out: np.ndarray, tile: Tuple[int, int, int, int], factor: float):
+        """Blend one tile with its own grayscale version"""
+        y0, y1, x0, x1 = tile
+        region = out[y0:y1, x0:x1]
+        gray = cv2.cvtColor(cv2.cvtColor(region, cv2.COLOR_BGR2GRAY), cv2.COLOR_GRAY2BGR)
+        out[y0:y1, x0:x1] = cv2.addWeighted(region, factor, gray, 1.0 - factor, 0.0)
+    
+    def _sharpness_tile(self, src: np.ndarray, dst: np.ndarray, tile: Tuple[int, int, int, int], factor: float):
+        """Blend one tile with a smoothed version of itself, reading a one pixel overlap"""
+        y0, y1, x0, x1 = tile
+        height, width = src.shape[:2]
+        oy0, oy1 = max(0, y0 - 1), min(height, y1 + 1)
+        ox0, ox1 = max(0, x0 - 1), min(width, x1 + 1)
+        
+        region = src[oy0:oy1, ox0:ox1]
+        smooth = cv2.filter2D(region, -1, SMOOTH_KERNEL)
+        
+        # Like PIL, the outermost pixels of the image are not smoothed
+        if oy0 == 0:
+            smooth[0] = region[0]
+        if oy1 == height:
+            smooth[-1] = region[-1]
+        if ox0 == 0:
+            smooth[:, 0] = region[:, 0]
+        if ox1 == width:
+            smooth[:, -1] = region[:, -1]
+            
+        interior = (slice(y0 - oy0, y1 - oy0), slice(x0 - ox0, x1 - ox0))
+        dst[y0:y1, x0:x1] = cv2.addWeighted(region[interior], factor, smooth[interior], 1.0 - factor, 0.0)
+    
+    def _tiles(self, height: int, width: int) -> List[Tuple[int, int, int, int]]:
+        """Split the image into (y0, y1, x0, x1) tiles"""
+        return [
+            (y, min(y + self.tile_size, height), x, min(x + self.tile_size, width))
+            for y in range(0, height, self.tile_size)
+            for x in range(0, width, self.tile_size)
+        ]
+    
+    def _is_grayscale(self, executor: ThreadPoolExecutor, img: np.ndarray,
+                      tiles: List[Tuple[int, int, int, int]]) -> bool:
+        """Check that the B, G and R channels differ by at most GRAYSCALE_TOLERANCE everywhere"""
+        def check(tile):
+            y0, y1, x0, x1 = tile
+            b, g, r = cv2.split(img[y0:y1, x0:x1])
+            return cv2.absdiff(b, g).max() <= GRAYSCALE_TOLERANCE and cv2.absdiff(g, r).max() <= GRAYSCALE_TOLERANCE
+            
+        return all(executor.map(check, tiles))
+    
+    def _colorize_denoise_tile(self, img: np.ndarray, out: np.ndarray, tile: Tuple[int, int, int, int],
+                               colorize: bool, denoise: bool):
+        """Colorize and denoise one tile, reading its overlap and writing only its interior"""
+        y0, y1, x0, x1 = tile
+        height, width = img.shape[:2]
+        overlap = TILE_OVERLAP if denoise else 0
+        oy0, oy1 = max(0, y0 - overlap), min(height, y1 + overlap)
+        ox0, ox1 = max(0, x0 - overlap), min(width, x1 + overlap)
+        
+        region = img[oy0:oy1, ox0:ox1]
+        if colorize:
+            region = self._colorize(region)
+        if denoise:
+            try:
+                region = cv2.bilateralFilter(region, DENOISE_DIAMETER, 75, 75)
+            except Exception as e:
+                logger.warning(f"Denoising failed: {e}")
+                
+        out[y0:y1, x0:x1] = region[y0 - oy0:y1 - oy0, x0 - ox0:x1 - ox0]
+    
+    def _colorize(self, region: np.ndarray) -> np.ndarray:
+        """Add warm sepia-like tones through the LAB A and B channels, without splitting them"""
+        lab = cv2.cvtColor(region, cv2.COLOR_BGR2LAB)
+        lab = cv2.add(lab, (0, 10, 15, 0))  # Saturating uint8 add
+        return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=lab)
+    
+    def _extract_lightness_tile(self, out: np.ndarray, lightness: np.ndarray, tile: Tuple[int, int, int, int]):
+        """Write the LAB L channel of one tile into the full lightness plane"""
+        y0, y1, x0, x1 = tile
+        lab = cv2.cvtColor(out[y0:y1, x0:x1], cv2.COLOR_BGR2LAB)
+        lightness[y0:y1, x0:x1] = lab[:, :, 0]
+    
+    def _merge_lightness_tile(self, out: np.ndarray, lightness: np.ndarray, tile: Tuple[int, int, int, int],
+                              with_histogram: bool):
+        """Replace one tile's L channel with the equalized lightness, optionally returning its histogram"""
+        y0, y1, x0, x1 = tile
+        lab = cv2.cvtColor(out[y0:y1, x0:x1], cv2.COLOR_BGR2LAB)
+        lab[:, :, 0] = lightness[y0:y1, x0:x1]
+        out[y0:y1, x0:x1] = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+        return self._histogram_tile(out, tile) if with_histogram else None
+    
+    def _histogram_tile(self, out: np.ndarray, tile: Tuple[int, int, int, int]) -> np.ndarray:
+        """256-bin histogram of all channel values of one tile"""
+        y0, y1, x0, x1 = tile
+        return np.bincount(out[y0:y1, x0:x1].ravel(), minlength=256)
+    
+    def _apply_lut_tile(self, out: np.ndarray, lut: np.ndarray, tile: Tuple[int, int, int, int]):
+        """Apply a levels lookup table to one tile in place"""
+        y0, y1, x0, x1 = tile
+        out[y0:y1, x0:x1] = cv2.LUT(out[y0:y1, x0:x1], lut)
@@ -0,0 +1,267 @@
+"""
+Header-only EXIF Parser for PhotoVault
+Reads image dimensions and the EXIF fields PhotoVault stores from the first
+bytes of a JPEG, PNG or TIFF file in a single pass, without decoding pixels
+"""
+
+import struct
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the start of a file; APP1 segments are capped at 64KB by the JPEG format
+HEADER_READ_SIZE = 64 * 1024
+
+# TIFF field types: (struct code, size in bytes)
+TIFF_TYPES = {
+    1: ('B', 1),   # BYTE
+    2: ('s', 1),   # ASCII
+    3: ('H', 2),   # SHORT
+    4: ('L', 4),   # LONG
+    5: ('L', 8),   # RATIONAL (two LONGs)
+    6: ('b', 1),   # SBYTE
+    7: ('B', 1),   # UNDEFINED
+    8: ('h', 2),   # SSHORT
+    9: ('l', 4),   # SLONG
+    10: ('l', 8),  # SRATIONAL (two SLONGs)
+}
+
+# Pointer tags to the sub-IFDs
+EXIF_IFD_POINTER = 0x8769
+GPS_IFD_POINTER = 0x8825
+
+# Tags kept from IFD0 and the Exif IFD, by the names MetadataExtractor looks up
+EXIF_TAGS = {
+    0x0100: 'imagewidth',
+    0x0101: 'imagelength',
+    0x010F: 'make',
+    0x0110: 'model',
+    0x0112: 'orientation',
+    0x0132: 'datetime',
+    0x829A: 'exposuretime',
+    0x829D: 'fnumber',
+    0x8827: 'isospeedratings',
+    0x9003: 'datetimeoriginal',
+    0x9004: 'datetimedigitized',
+    0x9202: 'aperturevalue',
+    0x9209: 'flash',
+    0x920A: 'focallength',
+    0xA001: 'colorspace',
+}
+
+# GPS IFD tags
+GPS_TAGS = {
+    0x0001: 'latituderef',
+    0x0002: 'latitude',
+    0x0003: 'longituderef',
+    0x0004: 'longitude',
+    0x0005: 'altituderef',
+    0x0006: 'altitude',
+}
+
+COLOR_SPACES = {1: 'sRGB', 2: 'Adobe RGB', 65535: 'Uncalibrated'}
+
+# JPEG start-of-frame markers that carry the image dimensions
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def parse_image_header(data: bytes) -> Dict[str, Any]:
+    """
+    Parse format, dimensions and EXIF fields from the start of an image file
+
+    Args:
+        data: Leading bytes of the file (HEADER_READ_SIZE is enough for almost every photo)
+
+    Returns:
+        Dictionary with 'format', 'width', 'height', 'exif_*' fields, 'gps_latitude',
+        'gps_longitude', 'gps_altitude' when present, and 'header_complete', which is
+        False when the EXIF block or frame header continues past the end of data
+    """
+    metadata = {'header_complete': True}
+    try:
+        if data.startswith(b'\xff\xd8'):
+            metadata['format'] = 'JPEG'
+            _parse_jpeg(data, metadata)
+        elif data.startswith(PNG_SIGNATURE):
+            metadata['format'] = 'PNG'
+            _parse_png(data, metadata)
+        elif data[:4] in (b'II*\x00', b'MM\x00*'):
+            metadata['format'] = 'TIFF'
+            _parse_tiff(data, metadata)
+            metadata.setdefault('width', metadata.get('exif_imagewidth'))
+            metadata.setdefault('height', metadata.get('exif_imagelength'))
+        else:
+            metadata['header_complete'] = False
+    except (struct.error, ValueError, IndexError) as e:
+        logger.debug(f"Image header parsing stopped early: {e}")
+        metadata['header_complete'] = False
+    return metadata
+
+def _parse_jpeg(data: bytes, metadata: Dict[str, Any]):
+    """Walk the JPEG marker segments up to the frame header"""
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            raise ValueError('Invalid JPEG marker')
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # Fill byte
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+
+        length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+        segment = data[offset + 4:offset + 2 + length]
+
+        if marker == 0xE1 and segment.startswith(b'Exif\x00\x00'):
+            if offset + 2 + length > len(data):
+                metadata['header_complete'] = False
+            _parse_tiff(segment[6:], metadata)
+        elif marker in JPEG_SOF_MARKERS:
+            if len(segment) < 5:
+                break
+            height, width = struct.unpack('>HH', segment[1:5])
+            metadata['width'] = width
+            metadata['height'] = height
+            return
+        elif marker == 0xDA:
+            # Start of scan without a frame header means a corrupt file
+            return
+
+        offset += 2 + length
+
+    # Ran out of data before the frame header
+    metadata['header_complete'] = False
+
+def _parse_png(data: bytes, metadata: Dict[str, Any]):
+    """Read IHDR and any eXIf chunk before the image data"""
+    offset = len(PNG_SIGNATURE)
+    while offset + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[offset:offset + 8])
+        chunk = data[offset + 8:offset + 8 + length]
+        if chunk_type == b'IHDR':
+            metadata['width'], metadata['height'] = struct.unpack('>II', chunk[:8])
+        elif chunk_type == b'eXIf':
+            if len(chunk) < length:
+                metadata['header_complete'] = False
+            _parse_tiff(chunk, metadata)
+        elif chunk_type in (b'IDAT', b'IEND'):
+            return
+        offset += 12 + length
+
+def _parse_tiff(tiff: bytes, metadata: Dict[str, Any]):
+    """Read IFD0, the Exif IFD and the GPS IFD of a TIFF structure"""
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        raise ValueError('Invalid TIFF byte order')
+
+    ifd0_offset = struct.unpack(endian + 'I', tiff[4:8])[0]
+    ifd0 = _read_ifd(tiff, endian, ifd0_offset, metadata)
+
+    exif = {}
+    if EXIF_IFD_POINTER in ifd0:
+        exif = _read_ifd(tiff, endian, ifd0[EXIF_IFD_POINTER], metadata)
+    for tag, value in list(ifd0.items()) + list(exif.items()):
+        name = EXIF_TAGS.get(tag)
+        if name is not None and value is not None:
+            metadata[f'exif_{name}'] = _normalize_value(name, value)
+
+    if GPS_IFD_POINTER in ifd0:
+        gps = {GPS_TAGS[tag]: value for tag, value in
+               _read_ifd(tiff, endian, ifd0[GPS_IFD_POINTER], metadata).items() if tag in GPS_TAGS}
+        _normalize_gps(gps, metadata)
+
+def _read_ifd(tiff: bytes, endian: str, offset: int, metadata: Dict[str, Any]) -> Dict[int, Any]:
+    """Read the entries of one IFD; values outside the buffer are skipped and flag the header incomplete"""
+    if offset + 2 > len(tiff):
+        metadata['header_complete'] = False
+        return {}
+
+    count = struct.unpack(endian + 'H', tiff[offset:offset + 2])[0]
+    entries = {}
+    for index in range(count):
+        entry_offset = offset + 2 + index * 12
+        if entry_offset + 12 > len(tiff):
+            metadata['header_complete'] = False
+            break
+        tag, field_type, value_count = struct.unpack(endian + 'HHI', tiff[entry_offset:entry_offset + 8])
+        if field_type not in TIFF_TYPES:
+            continue
+
+        code, size = TIFF_TYPES[field_type]
+        byte_count = size * value_count
+        if byte_count <= 4:
+            value_offset = entry_offset + 8
+        else:
+            value_offset = struct.unpack(endian + 'I', tiff[entry_offset + 8:entry_offset + 12])[0]
+        if value_offset + byte_count > len(tiff):
+            metadata['header_complete'] = False
+            continue
+
+        raw = tiff[value_offset:value_offset + byte_count]
+        entries[tag] = _decode_value(raw, endian, field_type, code, value_count)
+    return entries
+
+def _decode_value(raw: bytes, endian: str, field_type: int, code: str, value_count: int) -> Any:
+    """Decode a TIFF field into a str, an int or float, or a tuple of them"""
+    if field_type == 2:
+        return raw.split(b'\x00', 1)[0].decode('ascii', errors='replace').strip() or None
+    if field_type == 7:
+        return raw[0] if value_count == 1 else raw
+    if field_type in (5, 10):
+        numbers = struct.unpack(f'{endian}{value_count * 2}{code}', raw)
+        values = tuple((numbers[i], numbers[i + 1]) for i in range(0, len(numbers), 2))
+    else:
+        values = struct.unpack(f'{endian}{value_count}{code}', raw)
+    return values[0] if value_count == 1 else values
+
+def _rational_to_float(value: Any) -> Optional[float]:
+    """Convert a (numerator, denominator) pair or plain number to a float"""
+    if isinstance(value, tuple) and len(value) == 2 and not isinstance(value[0], tuple):
+        numerator, denominator = value
+        return numerator / denominator if denominator else None
+    return float(value)
+
+def _normalize_value(name: str, value: Any) -> Any:
+    """Turn a decoded tag into the form the MetadataExtractor field parsers accept"""
+    if name == 'exposuretime' and isinstance(value, tuple):
+        numerator, denominator = value
+        if numerator and denominator and denominator % numerator == 0:
+            return f"1/{denominator // numerator}"
+        return str(_rational_to_float(value))
+    if name == 'colorspace':
+        return COLOR_SPACES.get(value, str(value))
+    if name == 'isospeedratings' and isinstance(value, tuple):
+        return value[0]
+    if isinstance(value, tuple) and len(value) == 2 and not isinstance(value[0], tuple):
+        return _rational_to_float(value)
+    return value
+
+def _normalize_gps(gps: Dict[str, Any], metadata: Dict[str, Any]):
+    """Convert GPS degrees/minutes/seconds rationals to signed decimal coordinates"""
+    for axis, negative_ref in (('latitude', 'S'), ('longitude', 'W')):
+        coordinate = gps.get(axis)
+        if not isinstance(coordinate, tuple) or len(coordinate) != 3:
+            continue
+        parts = [_rational_to_float(part) for part in coordinate]
+        if None in parts:
+            continue
+        decimal = parts[0] + parts[1] / 60.0 + parts[2] / 3600.0
+        if str(gps.get(f'{axis}ref', '')).upper() == negative_ref:
+            decimal = -decimal
+        metadata[f'gps_{axis}'] = decimal
+
+    altitude = gps.get('altitude')
+    if altitude is not None and 'gps_latitude' in metadata:
+        altitude = _rational_to_float(altitude)
+        if altitude is not None and gps.get('altituderef') == 1:
+            # Reference 1 means below sea level
+            altitude = -altitude
+        metadata['gps_altitude'] = altitude
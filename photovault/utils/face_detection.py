@@ -5,32 +5,69 @@ Implements automatic face detection using OpenCV with multiple detection methods
 
 import os
 import cv2
+import json
+import hashlib
 import numpy as np
 import logging
+import threading
 from typing import List, Dict, Tuple, Optional
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Long edge (px) of the proxy image detection runs on; 0 disables downscaling
+DEFAULT_DETECTION_MAX_DIMENSION = 1024
+
+# Bump when detection code changes in a way that alters results (invalidates cached detections)
+DETECTOR_VERSION = 2
+
+# Smallest face (px) the Haar cascade looks for, in original image pixels
+HAAR_MIN_FACE_SIZE = 30
+
+# Floor (px) of that minimum once scaled down to the detection proxy
+HAAR_MIN_PROXY_FACE_SIZE = 12
+DNN_MODEL_DIR = Path(__file__).parent / 'models'
+DNN_MODEL_FILE = 'res10_300x300_ssd_iter_140000.caffemodel'
+
 class FaceDetector:
     """Face detection using OpenCV with multiple detection methods"""
     
-    def __init__(self):
+    def __init__(self, max_dimension: Optional[int] = None, preload: bool = False):
         self.opencv_available = True
         self.face_cascade = None
         self.dnn_net = None
         self.confidence_threshold = 0.5
+        self.max_dimension = (max_dimension if max_dimension is not None else
+                              int(os.environ.get('FACE_DETECTION_MAX_DIMENSION') or DEFAULT_DETECTION_MAX_DIMENSION))
+        self.models_loaded = False
+        self._load_lock = threading.Lock()
         
-        try:
-            import cv2
-            self._initialize_detectors()
-            logger.info("Face detection initialized successfully")
-        except ImportError:
-            self.opencv_available = False
-            logger.warning("OpenCV not available - face detection disabled")
-        except Exception as e:
-            logger.error(f"Failed to initialize face detection: {e}")
-            self.opencv_available = False
+        # Models are loaded on first use so importing this module stays cheap
+        if preload:
+            self._ensure_models_loaded()
+    
+    def _ensure_models_loaded(self):
+        """Load the Haar cascade and DNN models once, on first use; a failed load is retried on the next use"""
+        if self.models_loaded:
+            return
+            
+        # Threads sharing this instance wait for one load instead of seeing half-loaded models
+        with self._load_lock:
+            if self.models_loaded:
+                return
+                
+            try:
+                import cv2
+                self.opencv_available = True
+                self._initialize_detectors()
+                self.models_loaded = True
+                logger.info("Face detection initialized successfully")
+            except ImportError:
+                self.opencv_available = False
+                logger.warning("OpenCV not available - face detection disabled")
+            except Exception as e:
+                logger.error(f"Failed to initialize face detection: {e}")
+                self.opencv_available = False
     
     def _initialize_detectors(self):
         """Initialize face detection models"""
@@ -46,11 +83,11 @@ class FaceDetector:
             # Try to initialize DNN detector (more accurate but slower)
             try:
                 # Download DNN model files if they don't exist
-                model_dir = Path(__file__).parent / 'models'
+                model_dir = DNN_MODEL_DIR
                 model_dir.mkdir(exist_ok=True)
                 
                 prototxt_path = model_dir / 'deploy.prototxt'
-                model_path = model_dir / 'res10_300x300_ssd_iter_140000.caffemodel'
+                model_path = model_dir / DNN_MODEL_FILE
                 
                 # Create basic prototxt if it doesn't exist
                 if not prototxt_path.exists():
@@ -90,16 +127,18 @@ layer {
         with open(prototxt_path, 'w') as f:
             f.write(prototxt_content)
     
-    def detect_faces_haar(self, image: np.ndarray) -> List[Dict]:
+    def detect_faces_haar(self, image: np.ndarray, scale: float = 1.0) -> List[Dict]:
         """
         Detect faces using Haar cascade classifier
         
         Args:
             image: Input image as numpy array
+            scale: Scale factor from the original image to this one, when it is a detection proxy
             
         Returns:
             List of detected faces with bounding boxes and confidence scores
         """
+        self._ensure_models_loaded()
         if not self.opencv_available or self.face_cascade is None:
             return []
         
@@ -107,12 +146,15 @@ layer {
             # Convert to grayscale
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
+            # The minimum face size is given in original pixels, so shrink it with the proxy
+            min_size = max(HAAR_MIN_PROXY_FACE_SIZE, int(round(HAAR_MIN_FACE_SIZE * scale)))
+            
             # Detect faces
             faces = self.face_cascade.detectMultiScale(
                 gray,
                 scaleFactor=1.1,
                 minNeighbors=5,
-                minSize=(30, 30),
+                minSize=(min_size, min_size),
                 flags=cv2.CASCADE_SCALE_IMAGE
             )
             
@@ -147,6 +189,7 @@ layer {
         Returns:
             List of detected faces with bounding boxes and confidence scores
         """
+        self._ensure_models_loaded()
         if not self.opencv_available or self.dnn_net is None:
             return []
         
@@ -164,36 +207,7 @@ layer {
             self.dnn_net.setInput(blob)
             detections = self.dnn_net.forward()
             
-            detected_faces = []
-            
-            # Process detections
-            for i in range(0, detections.shape[2]):
-                confidence = detections[0, 0, i, 2]
-                
-                # Filter weak detections
-                if confidence > self.confidence_threshold:
-                    # Compute bounding box coordinates
-                    box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                    (x, y, x1, y1) = box.astype("int")
-                    
-                    # Ensure coordinates are within image bounds
-                    x = max(0, x)
-                    y = max(0, y)
-                    x1 = min(w, x1)
-                    y1 = min(h, y1)
-                    
-                    width = x1 - x
-                    height = y1 - y
-                    
-                    if width > 0 and height > 0:
-                        detected_faces.append({
-                            'x': int(x),
-                            'y': int(y),
-                            'width': int(width),
-                            'height': int(height),
-                            'confidence': float(confidence),
-                            'method': 'dnn'
-                        })
+            detected_faces = self._parse_dnn_detections(detections[0, 0], w, h)
             
             logger.info(f"DNN detected {len(detected_faces)} faces")
             return detected_faces
@@ -202,6 +216,80 @@ layer {
             logger.error(f"DNN face detection failed: {e}")
             return []
     
+    def detect_faces_dnn_batch(self, images: List[np.ndarray]) -> List[List[Dict]]:
+        """
+        Detect faces in several images with a single batched DNN forward pass
+        
+        Args:
+            images: Input images as numpy arrays
+            
+        Returns:
+            One list of detected faces per input image, in input order
+        """
+        self._ensure_models_loaded()
+        if not images:
+            return []
+        if not self.opencv_available or self.dnn_net is None:
+            return [[] for _ in images]
+        
+        try:
+            blob = cv2.dnn.blobFromImages(
+                [cv2.resize(image, (300, 300)) for image in images], 1.0,
+                (300, 300), (104.0, 177.0, 123.0)
+            )
+            
+            self.dnn_net.setInput(blob)
+            detections = self.dnn_net.forward()[0, 0]
+            
+            # Column 0 of each detection row is the index of its image in the batch
+            results = []
+            for index, image in enumerate(images):
+                (h, w) = image.shape[:2]
+                rows = detections[detections[:, 0] == index]
+                results.append(self._parse_dnn_detections(rows, w, h))
+            
+            logger.info(f"Batched DNN detected {sum(len(faces) for faces in results)} faces in {len(images)} images")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Batched DNN face detection failed: {e}")
+            return [self.detect_faces_dnn(image) for image in images]
+    
+    def _parse_dnn_detections(self, detections: np.ndarray, w: int, h: int) -> List[Dict]:
+        """Convert DNN detection rows into face dictionaries for a w x h image"""
+        detected_faces = []
+        
+        # Process detections
+        for i in range(0, detections.shape[0]):
+            confidence = detections[i, 2]
+            
+            # Filter weak detections
+            if confidence > self.confidence_threshold:
+                # Compute bounding box coordinates
+                box = detections[i, 3:7] * np.array([w, h, w, h])
+                (x, y, x1, y1) = box.astype("int")
+                
+                # Ensure coordinates are within image bounds
+                x = max(0, x)
+                y = max(0, y)
+                x1 = min(w, x1)
+                y1 = min(h, y1)
+                
+                width = x1 - x
+                height = y1 - y
+                
+                if width > 0 and height > 0:
+                    detected_faces.append({
+                        'x': int(x),
+                        'y': int(y),
+                        'width': int(width),
+                        'height': int(height),
+                        'confidence': float(confidence),
+                        'method': 'dnn'
+                    })
+        
+        return detected_faces
+    
     def detect_faces(self, image_path: str) -> List[Dict]:
         """
         Detect faces in an image using the best available method
@@ -212,6 +300,7 @@ layer {
         Returns:
             List of detected faces with metadata
         """
+        self._ensure_models_loaded()
         if not self.opencv_available:
             logger.warning("Face detection not available - OpenCV not installed")
             return []
@@ -227,20 +316,48 @@ layer {
                 logger.error(f"Could not load image: {image_path}")
                 return []
             
+            return self.detect_faces_in_image(image, image_path)
+            
+        except Exception as e:
+            logger.error(f"Face detection failed for {image_path}: {e}")
+            return []
+    
+    def detect_faces_in_image(self, image: np.ndarray, image_path: Optional[str] = None) -> List[Dict]:
+        """
+        Detect faces in an already decoded image using the best available method
+        
+        Args:
+            image: Decoded BGR image as numpy array
+            image_path: Optional source path recorded on each face
+            
+        Returns:
+            List of detected faces with metadata
+        """
+        self._ensure_models_loaded()
+        if not self.opencv_available or image is None:
+            return []
+        
+        try:
+            # Run detection on a bounded-size proxy and map boxes back
+            proxy, scale = self._make_detection_proxy(image)
+            
             # Try DNN first (more accurate), fall back to Haar cascade
             faces = []
             
             if self.dnn_net is not None:
-                faces = self.detect_faces_dnn(image)
+                faces = self.detect_faces_dnn(proxy)
                 if faces:
                     logger.info(f"DNN detection successful: {len(faces)} faces found")
             
             # If DNN didn't work or found no faces, try Haar cascade
             if not faces and self.face_cascade is not None:
-                faces = self.detect_faces_haar(image)
+                faces = self.detect_faces_haar(proxy, scale)
                 if faces:
                     logger.info(f"Haar cascade detection successful: {len(faces)} faces found")
             
+            if scale != 1.0:
+                faces = self._rescale_faces(faces, scale, image.shape[1], image.shape[0])
+            
             # Add image metadata to each face
             for face in faces:
                 face['image_path'] = image_path
@@ -250,9 +367,119 @@ layer {
             return faces
             
         except Exception as e:
-            logger.error(f"Face detection failed for {image_path}: {e}")
+            logger.error(f"Face detection failed for {image_path or 'image'}: {e}")
             return []
     
+    def detect_faces_in_images(self, images: List[np.ndarray]) -> List[List[Dict]]:
+        """
+        Detect faces in several decoded images, batching DNN inference
+        
+        Args:
+            images: Decoded BGR images as numpy arrays
+            
+        Returns:
+            One list of detected faces per input image, in input order
+        """
+        self._ensure_models_loaded()
+        if not self.opencv_available:
+            return [[] for _ in images]
+        
+        proxies = [self._make_detection_proxy(image) for image in images]
+        
+        if self.dnn_net is not None:
+            results = self.detect_faces_dnn_batch([proxy for proxy, _ in proxies])
+        else:
+            results = [[] for _ in images]
+        
+        for index, (image, (proxy, scale)) in enumerate(zip(images, proxies)):
+            faces = results[index]
+            
+            # Fall back to Haar cascade per image when DNN found nothing
+            if not faces and self.face_cascade is not None:
+                faces = self.detect_faces_haar(proxy, scale)
+            
+            if scale != 1.0:
+                faces = self._rescale_faces(faces, scale, image.shape[1], image.shape[0])
+            
+            for face in faces:
+                face['image_width'] = image.shape[1]
+                face['image_height'] = image.shape[0]
+            
+            results[index] = faces
+        
+        return results
+    
+    def get_version_key(self) -> str:
+        """
+        Identify the detector name and parameters, for keying cached detections
+        
+        Returns:
+            Short string that changes whenever detection results could change
+        """
+        params = {
+            'version': DETECTOR_VERSION,
+            'dnn': (DNN_MODEL_DIR / DNN_MODEL_FILE).exists(),
+            'confidence_threshold': self.confidence_threshold,
+            'max_dimension': self._get_max_dimension()
+        }
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+        return f"opencv-{digest}"
+    
+    def _get_max_dimension(self) -> int:
+        """Get the proxy long-edge limit, preferring the app config when available"""
+        try:
+            from flask import current_app, has_app_context
+            if has_app_context():
+                return int(current_app.config.get('FACE_DETECTION_MAX_DIMENSION', self.max_dimension) or 0)
+        except ImportError:
+            pass
+        return self.max_dimension
+    
+    def _make_detection_proxy(self, image: np.ndarray) -> Tuple[np.ndarray, float]:
+        """
+        Downscale an image so its long edge fits the detection limit
+        
+        Args:
+            image: Full-resolution image as numpy array
+            
+        Returns:
+            Tuple of (proxy image, scale factor from original to proxy)
+        """
+        max_dimension = self._get_max_dimension()
+        height, width = image.shape[:2]
+        long_edge = max(height, width)
+        
+        if max_dimension <= 0 or long_edge <= max_dimension:
+            return image, 1.0
+        
+        scale = max_dimension / long_edge
+        proxy = cv2.resize(image, (max(1, int(round(width * scale))), max(1, int(round(height * scale)))),
+                           interpolation=cv2.INTER_AREA)
+        logger.debug(f"Face detection proxy {proxy.shape[1]}x{proxy.shape[0]} for {width}x{height} image")
+        return proxy, scale
+    
+    def _rescale_faces(self, faces: List[Dict], scale: float, width: int, height: int) -> List[Dict]:
+        """
+        Map face boxes detected on a proxy back to original image coordinates
+        
+        Args:
+            faces: Faces detected on the proxy image
+            scale: Scale factor from original to proxy
+            width: Original image width
+            height: Original image height
+            
+        Returns:
+            Faces with bounding boxes in original coordinates
+        """
+        for face in faces:
+            x = min(width - 1, max(0, int(round(face['x'] / scale))))
+            y = min(height - 1, max(0, int(round(face['y'] / scale))))
+            face['x'] = x
+            face['y'] = y
+            face['width'] = max(1, min(width - x, int(round(face['width'] / scale))))
+            face['height'] = max(1, min(height - y, int(round(face['height'] / scale))))
+        return faces
+    
     def validate_face_detection(self, faces: List[Dict]) -> List[Dict]:
         """
         Validate and filter face detections
@@ -286,6 +513,7 @@ layer {
     
     def is_available(self) -> bool:
         """Check if face detection is available"""
+        self._ensure_models_loaded()
         return self.opencv_available and (self.face_cascade is not None or self.dnn_net is not None)
 
 # Global instance
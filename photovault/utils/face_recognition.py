@@ -8,6 +8,7 @@ import cv2
 import numpy as np
 import pickle
 import logging
+import threading
 from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 import json
@@ -17,24 +18,45 @@ logger = logging.getLogger(__name__)
 class FaceRecognizer:
     """Face recognition and encoding system"""
     
-    def __init__(self):
+    # Bump when the encoding layout changes (invalidates stored and cached encodings)
+    ENCODING_VERSION = 'hist-lbp-1'
+    
+    def __init__(self, preload: bool = False):
         self.opencv_available = True
         self.face_recognizer = None
         self.face_cascade = None
         self.encodings_cache = {}
         self.encodings_file = Path(__file__).parent / 'face_encodings.pkl'
+        self.models_loaded = False
+        self._load_lock = threading.Lock()
         
-        try:
-            import cv2
-            self._initialize_recognizer()
-            self._load_encodings_cache()
-            logger.info("Face recognition initialized successfully")
-        except ImportError:
-            self.opencv_available = False
-            logger.warning("OpenCV not available - face recognition disabled")
-        except Exception as e:
-            logger.error(f"Failed to initialize face recognition: {e}")
-            self.opencv_available = False
+        # Models and the encodings pickle are loaded on first use so importing this module stays cheap
+        if preload:
+            self._ensure_models_loaded()
+    
+    def _ensure_models_loaded(self):
+        """Load recognition models and cached encodings once, on first use; a failed load is retried on the next use"""
+        if self.models_loaded:
+            return
+            
+        # Threads sharing this instance wait for one load instead of seeing half-loaded models
+        with self._load_lock:
+            if self.models_loaded:
+                return
+                
+            try:
+                import cv2
+                self.opencv_available = True
+                self._initialize_recognizer()
+                self._load_encodings_cache()
+                self.models_loaded = True
+                logger.info("Face recognition initialized successfully")
+            except ImportError:
+                self.opencv_available = False
+                logger.warning("OpenCV not available - face recognition disabled")
+            except Exception as e:
+                logger.error(f"Failed to initialize face recognition: {e}")
+                self.opencv_available = False
     
     def _initialize_recognizer(self):
         """Initialize face recognition models"""
@@ -99,6 +121,7 @@ class FaceRecognizer:
         Returns:
             Face encoding as numpy array or None if extraction fails
         """
+        self._ensure_models_loaded()
         if not self.opencv_available:
             return None
         
@@ -109,6 +132,28 @@ class FaceRecognizer:
                 logger.error(f"Could not load image: {image_path}")
                 return None
             
+            return self.extract_face_encoding_from_image(image, face_box)
+            
+        except Exception as e:
+            logger.error(f"Error extracting face encoding: {e}")
+            return None
+    
+    def extract_face_encoding_from_image(self, image: np.ndarray, face_box: Dict) -> Optional[np.ndarray]:
+        """
+        Extract face encoding from a face region of an already decoded image
+        
+        Args:
+            image: Decoded BGR image as numpy array
+            face_box: Dictionary with face bounding box coordinates
+            
+        Returns:
+            Face encoding as numpy array or None if extraction fails
+        """
+        self._ensure_models_loaded()
+        if not self.opencv_available or image is None:
+            return None
+        
+        try:
             # Extract face region
             x = face_box['x']
             y = face_box['y']
@@ -203,30 +248,56 @@ class FaceRecognizer:
             image_path: Path to the image containing the person's face
             face_box: Bounding box of the face in the image
         """
+        self._ensure_models_loaded()
         try:
             encoding = self.extract_face_encoding(image_path, face_box)
             if encoding is not None:
-                # Store encoding with person information
-                if person_id not in self.encodings_cache:
-                    self.encodings_cache[person_id] = {
-                        'name': person_name,
-                        'encodings': []
-                    }
-                
-                self.encodings_cache[person_id]['encodings'].append({
+                self.add_person_encodings(person_id, person_name, [{
                     'encoding': encoding,
                     'image_path': image_path,
                     'face_box': face_box
-                })
-                
-                self._save_encodings_cache()
-                logger.info(f"Added face encoding for {person_name} (ID: {person_id})")
+                }])
             else:
                 logger.warning(f"Could not extract encoding for {person_name}")
                 
         except Exception as e:
             logger.error(f"Error adding person encoding: {e}")
     
+    def add_person_encodings(self, person_id: int, person_name: str, entries: List[Dict]):
+        """
+        Add already extracted face encodings for a known person, saving the cache once
+        
+        Args:
+            person_id: Database ID of the person
+            person_name: Name of the person
+            entries: Dictionaries with 'encoding' and optional 'image_path' and 'face_box'
+        """
+        self._ensure_models_loaded()
+        entries = [entry for entry in entries if entry.get('encoding') is not None]
+        if not entries:
+            return
+        
+        try:
+            # Store encodings with person information
+            if person_id not in self.encodings_cache:
+                self.encodings_cache[person_id] = {
+                    'name': person_name,
+                    'encodings': []
+                }
+            
+            for entry in entries:
+                self.encodings_cache[person_id]['encodings'].append({
+                    'encoding': entry['encoding'],
+                    'image_path': entry.get('image_path'),
+                    'face_box': entry.get('face_box')
+                })
+            
+            self._save_encodings_cache()
+            logger.info(f"Added {len(entries)} face encodings for {person_name} (ID: {person_id})")
+            
+        except Exception as e:
+            logger.error(f"Error adding person encodings: {e}")
+    
     def recognize_face(self, image_path: str, face_box: Dict, confidence_threshold: float = 0.6) -> Optional[Dict]:
         """
         Try to recognize a face by matching against known encodings
@@ -239,6 +310,7 @@ class FaceRecognizer:
         Returns:
             Dictionary with person info and confidence, or None if no match
         """
+        self._ensure_models_loaded()
         if not self.encodings_cache:
             logger.debug("No face encodings available for recognition")
             return None
@@ -249,40 +321,81 @@ class FaceRecognizer:
             if unknown_encoding is None:
                 return None
             
-            best_match = None
-            best_distance = float('inf')
-            
-            # Compare against all known encodings
-            for person_id, person_data in self.encodings_cache.items():
-                person_name = person_data['name']
-                
-                for known_face in person_data['encodings']:
-                    known_encoding = known_face['encoding']
-                    
-                    # Calculate distance between encodings
-                    distance = self._calculate_encoding_distance(unknown_encoding, known_encoding)
-                    
-                    if distance < best_distance:
-                        best_distance = distance
-                        best_match = {
-                            'person_id': person_id,
-                            'person_name': person_name,
-                            'distance': distance,
-                            'confidence': max(0.0, 1.0 - distance)
-                        }
-            
-            # Check if best match meets confidence threshold
-            if best_match and best_match['confidence'] >= confidence_threshold:
-                logger.info(f"Recognized face as {best_match['person_name']} with confidence {best_match['confidence']:.2f}")
-                return best_match
-            else:
-                logger.debug(f"No confident face match found (best confidence: {best_match['confidence'] if best_match else 0:.2f})")
-                return None
+            return self.match_encoding(unknown_encoding, confidence_threshold)
                 
         except Exception as e:
             logger.error(f"Error during face recognition: {e}")
             return None
     
+    def recognize_faces_in_image(self, image: np.ndarray, face_boxes: List[Dict],
+                                 confidence_threshold: float = 0.6) -> List[Dict]:
+        """
+        Encode and match every face of an already decoded image in one pass
+        
+        Args:
+            image: Decoded BGR image as numpy array
+            face_boxes: Bounding boxes of the faces to recognize
+            confidence_threshold: Minimum confidence for recognition
+            
+        Returns:
+            One dictionary per face box, in input order, with the face 'encoding'
+            (or None if extraction failed) and the 'match' (or None if no match)
+        """
+        self._ensure_models_loaded()
+        results = []
+        for face_box in face_boxes:
+            encoding = self.extract_face_encoding_from_image(image, face_box)
+            match = None
+            if encoding is not None and self.encodings_cache:
+                try:
+                    match = self.match_encoding(encoding, confidence_threshold)
+                except Exception as e:
+                    logger.error(f"Error during face recognition: {e}")
+            results.append({'encoding': encoding, 'match': match})
+        return results
+    
+    def match_encoding(self, unknown_encoding: np.ndarray, confidence_threshold: float = 0.6) -> Optional[Dict]:
+        """
+        Match a face encoding against all known encodings
+        
+        Args:
+            unknown_encoding: Encoding of the face to identify
+            confidence_threshold: Minimum confidence for recognition
+            
+        Returns:
+            Dictionary with person info and confidence, or None if no match
+        """
+        self._ensure_models_loaded()
+        best_match = None
+        best_distance = float('inf')
+        
+        # Compare against all known encodings
+        for person_id, person_data in self.encodings_cache.items():
+            person_name = person_data['name']
+            
+            for known_face in person_data['encodings']:
+                known_encoding = known_face['encoding']
+                
+                # Calculate distance between encodings
+                distance = self._calculate_encoding_distance(unknown_encoding, known_encoding)
+                
+                if distance < best_distance:
+                    best_distance = distance
+                    best_match = {
+                        'person_id': person_id,
+                        'person_name': person_name,
+                        'distance': distance,
+                        'confidence': max(0.0, 1.0 - distance)
+                    }
+        
+        # Check if best match meets confidence threshold
+        if best_match and best_match['confidence'] >= confidence_threshold:
+            logger.info(f"Recognized face as {best_match['person_name']} with confidence {best_match['confidence']:.2f}")
+            return best_match
+        else:
+            logger.debug(f"No confident face match found (best confidence: {best_match['confidence'] if best_match else 0:.2f})")
+            return None
+    
     def _calculate_encoding_distance(self, encoding1: np.ndarray, encoding2: np.ndarray) -> float:
         """
         Calculate distance between two face encodings
@@ -317,12 +430,33 @@ class FaceRecognizer:
             logger.error(f"Error calculating encoding distance: {e}")
             return 1.0
     
+    def get_person_encoding_matrix(self, person_id: int) -> Optional[np.ndarray]:
+        """
+        Get all known encodings of a person stacked into a matrix
+        
+        Args:
+            person_id: Database ID of the person
+            
+        Returns:
+            Matrix with one encoding per row, or None if the person has no encodings
+        """
+        self._ensure_models_loaded()
+        person_data = self.encodings_cache.get(person_id)
+        if not person_data or not person_data['encodings']:
+            return None
+        
+        encodings = [np.asarray(face['encoding'], dtype=np.float32) for face in person_data['encodings']]
+        length = len(encodings[-1])
+        return np.vstack([encoding for encoding in encodings if len(encoding) == length])
+    
     def get_known_people_count(self) -> int:
         """Get the number of people with stored face encodings"""
+        self._ensure_models_loaded()
         return len(self.encodings_cache)
     
     def remove_person_encodings(self, person_id: int):
         """Remove all encodings for a specific person"""
+        self._ensure_models_loaded()
         try:
             if person_id in self.encodings_cache:
                 person_name = self.encodings_cache[person_id]['name']
@@ -336,6 +470,7 @@ class FaceRecognizer:
     
     def is_available(self) -> bool:
         """Check if face recognition is available"""
+        self._ensure_models_loaded()
         return self.opencv_available
 
 # Global instance
@@ -364,4 +499,32 @@ def add_known_face(person_id: int, person_name: str, image_path: str, face_box:
         image_path: Path to the image
         face_box: Face bounding box dictionary
     """
-    face_recognizer.add_person_encoding(person_id, person_name, image_path, face_box)
\ No newline at end of file
+    face_recognizer.add_person_encoding(person_id, person_name, image_path, face_box)
+
+def encoding_to_bytes(encoding: Optional[np.ndarray]) -> Optional[bytes]:
+    """
+    Serialize a face encoding for storage in the database
+    
+    Args:
+        encoding: Face encoding as numpy array
+        
+    Returns:
+        Raw float32 bytes, or None if there is no encoding
+    """
+    if encoding is None:
+        return None
+    return np.asarray(encoding, dtype=np.float32).tobytes()
+
+def encoding_from_bytes(data: Optional[bytes]) -> Optional[np.ndarray]:
+    """
+    Deserialize a face encoding stored with encoding_to_bytes
+    
+    Args:
+        data: Raw float32 bytes
+        
+    Returns:
+        Face encoding as numpy array, or None if there is no data
+    """
+    if not data:
+        return None
+    return np.frombuffer(data, dtype=np.float32)
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+Geohash Utilities for PhotoVault
+Encodes GPS coordinates into sortable grid-cell keys and converts map
+zoom levels, tiles and search areas into latitude/longitude bounds
+"""
+
+import math
+from typing import List, Tuple
+
+# Base-32 alphabet of the geohash standard
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Precision of the geohash stored per photo (~3.7cm x 1.9cm cells)
+STORED_PRECISION = 12
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Latitude limit of the Web Mercator tile grid
+MAX_MERCATOR_LATITUDE = 85.0511287798
+
+# Bounding box as (min_lat, min_lon, max_lat, max_lon)
+BBox = Tuple[float, float, float, float]
+
+def encode(latitude: float, longitude: float, precision: int = STORED_PRECISION) -> str:
+    """
+    Encode a coordinate as a geohash
+    
+    Args:
+        latitude: Latitude in decimal degrees
+        longitude: Longitude in decimal degrees
+        precision: Number of characters
+        
+    Returns:
+        Geohash string; every prefix is the key of an enclosing cell
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    
+    while len(chars) < precision:
+        value_range, value = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            value_range[0] = mid
+        else:
+            bits <<= 1
+            value_range[1] = mid
+        even = not even
+        
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+            
+    return ''.join(chars)
+
+def decode_bbox(geohash: str) -> BBox:
+    """
+    Get the bounds of a geohash cell
+    
+    Args:
+        geohash: Geohash string
+        
+    Returns:
+        (min_lat, min_lon, max_lat, max_lon)
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    
+    for char in geohash:
+        bits = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            value_range = lon_range if even else lat_range
+            mid = (value_range[0] + value_range[1]) / 2
+            if (bits >> shift) & 1:
+                value_range[0] = mid
+            else:
+                value_range[1] = mid
+            even = not even
+            
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+def precision_for_zoom(zoom: int) -> int:
+    """
+    Pick the cluster cell size for a map zoom level, giving a few cells per 256px tile
+    
+    Args:
+        zoom: Slippy map zoom level (0-22)
+        
+    Returns:
+        Geohash precision between 1 and 8
+    """
+    thresholds = (3, 5, 8, 10, 13, 15, 18)
+    for precision, max_zoom in enumerate(thresholds, start=1):
+        if zoom < max_zoom:
+            return precision
+    return 8
+
+def tile_bbox(zoom: int, x: int, y: int) -> BBox:
+    """
+    Get the bounds of a slippy map (Web Mercator) tile
+    
+    Args:
+        zoom: Zoom level
+        x: Tile column
+        y: Tile row
+        
+    Returns:
+        (min_lat, min_lon, max_lat, max_lon)
+    """
+    tiles = 2 ** zoom
+    
+    def tile_latitude(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / tiles))))
+        
+    return tile_latitude(y + 1), x / tiles * 360.0 - 180.0, tile_latitude(y), (x + 1) / tiles * 360.0 - 180.0
+
+def tiles_containing(zoom: int, latitude: float, longitude: float) -> List[Tuple[int, int]]:
+    """
+    Get the slippy map tiles whose bounds include a point, two on a shared edge
+    
+    Args:
+        zoom: Zoom level
+        latitude: Latitude in degrees
+        longitude: Longitude in degrees
+        
+    Returns:
+        List of (x, y) tiles
+    """
+    tiles = 2 ** zoom
+    latitude = max(-MAX_MERCATOR_LATITUDE, min(MAX_MERCATOR_LATITUDE, latitude))
+    column = (longitude + 180.0) / 360.0 * tiles
+    row = (1 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2 * tiles
+    
+    def indexes(position: float) -> List[int]:
+        index = min(tiles - 1, max(0, int(math.floor(position))))
+        # A point on the edge between two tiles lies inside both of their boxes
+        if position == index and index > 0:
+            return [index - 1, index]
+        return [index]
+        
+    return [(x, y) for x in indexes(column) for y in indexes(row)]
+
+def bbox_around(latitude: float, longitude: float, radius_km: float) -> List[BBox]:
+    """
+    Get the boxes enclosing a circle, split in two where it crosses the antimeridian
+    
+    Args:
+        latitude: Center latitude
+        longitude: Center longitude
+        radius_km: Radius in kilometers
+        
+    Returns:
+        One or two (min_lat, min_lon, max_lat, max_lon) boxes
+    """
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(-90.0, latitude - lat_delta)
+    max_lat = min(90.0, latitude + lat_delta)
+    
+    # Near the poles the circle covers every longitude
+    cos_lat = math.cos(math.radians(latitude))
+    if min_lat <= -90.0 or max_lat >= 90.0 or cos_lat < 1e-9:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+        
+    lon_delta = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    if lon_delta >= 180.0:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    return split_antimeridian((min_lat, longitude - lon_delta, max_lat, longitude + lon_delta))
+
+def split_antimeridian(bbox: BBox) -> List[BBox]:
+    """
+    Normalize a box whose longitudes leave [-180, 180] or wrap (min_lon > max_lon)
+    
+    Args:
+        bbox: (min_lat, min_lon, max_lat, max_lon)
+        
+    Returns:
+        One or two boxes within [-180, 180]
+    """
+    min_lat, min_lon, max_lat, max_lon = bbox
+    if min_lon < -180.0:
+        min_lon += 360.0
+    if max_lon > 180.0:
+        max_lon -= 360.0
+    if min_lon <= max_lon:
+        return [(min_lat, min_lon, max_lat, max_lon)]
+    return [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two coordinates in kilometers"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
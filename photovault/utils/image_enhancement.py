@@ -9,6 +9,8 @@ import json
 import logging
 from typing import Dict, Tuple, Optional, Union
 import os
+from photovault.utils.enhancement_engine import TiledEnhancementEngine, ENGINE_VERSION
+from photovault.utils.enhancement_cache import enhancement_cache, canonical_settings
 
 logger = logging.getLogger(__name__)
 
@@ -36,9 +38,20 @@ class ImageEnhancer:
             'auto_levels': True,
             'colorize': False
         }
+        self.engine = TiledEnhancementEngine()
+    
+    def get_version_key(self) -> str:
+        """
+        Identify the enhancement pipeline, for keying cached renders
+        
+        Returns:
+            Short string that changes whenever enhancement output could change
+        """
+        backend = 'opencv' if OPENCV_AVAILABLE else 'pil'
+        return f"{backend}-{ENGINE_VERSION}"
     
     def auto_enhance_photo(self, image_path: str, output_path: str = None, 
-                          settings: Dict = None) -> Tuple[str, Dict]:
+                          settings: Dict = None, use_cache: bool = True) -> Tuple[str, Dict]:
         """
         Automatically enhance a photo for optimal viewing
         
@@ -46,6 +59,7 @@ class ImageEnhancer:
             image_path: Path to input image
             output_path: Path for enhanced output (if None, overwrites original)
             settings: Custom enhancement settings
+            use_cache: Reuse a stored render of the same source and settings
             
         Returns:
             Tuple of (output_path, applied_settings)
@@ -53,37 +67,38 @@ class ImageEnhancer:
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"Image file not found: {image_path}")
         
-        logger.info(f"Starting auto-enhancement for: {image_path}")
+        # Merge default with custom settings, normalized so equal requests share a cache key
+        enhancement_settings = canonical_settings(settings, self.default_settings)
+        
+        if output_path is None:
+            output_path = image_path
         
-        # Merge default with custom settings
-        enhancement_settings = self.default_settings.copy()
-        if settings:
-            enhancement_settings.update(settings)
+        # Renders are cached by source content, so in-place enhancement is never cached
+        cache_key = None
+        if use_cache and os.path.abspath(output_path) != os.path.abspath(image_path):
+            source_hash = enhancement_cache.source_hash(image_path)
+            if source_hash:
+                cache_key = enhancement_cache.make_key(source_hash, enhancement_settings, self.get_version_key(),
+                                                      os.path.splitext(output_path)[1])
+                if enhancement_cache.fetch(cache_key, output_path):
+                    logger.info(f"Reused cached enhancement for: {image_path}")
+                    return output_path, enhancement_settings
+        
+        logger.info(f"Starting auto-enhancement for: {image_path}")
         
         if OPENCV_AVAILABLE:
-            # Full OpenCV enhancement pipeline
+            # Full OpenCV enhancement pipeline, on the BGR array from load to save
             img = cv2.imread(image_path)
             if img is None:
                 raise ValueError(f"Could not load image: {image_path}")
             
-            # Step 0: Colorize if enabled
-            if enhancement_settings.get('colorize', False):
-                img = self._apply_colorization(img)
-            
-            # Step 1: Denoise if enabled
-            if enhancement_settings.get('denoise', True):
-                img = self._apply_denoising(img)
-            
-            # Step 2: Apply CLAHE for contrast enhancement
-            if enhancement_settings.get('clahe_enabled', True):
-                img = self._apply_clahe(img)
+            # Colorize, denoise, CLAHE, auto-levels and the tone adjustments over tiles on all cores
+            img = self.engine.process(img, enhancement_settings)
             
-            # Step 3: Auto-levels adjustment
-            if enhancement_settings.get('auto_levels', True):
-                img = self._apply_auto_levels(img)
-            
-            # Step 4: Convert to PIL for fine adjustments
-            pil_img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+            # Save with original quality
+            success = cv2.imwrite(output_path, img, [cv2.IMWRITE_JPEG_QUALITY, 95])
+            if not success:
+                raise IOError(f"Failed to save enhanced image: {output_path}")
         else:
             # Fallback to PIL-only enhancement
             logger.info("Using PIL-only enhancement (OpenCV not available)")
@@ -92,123 +107,17 @@ class ImageEnhancer:
             # Apply colorization using PIL if requested
             if enhancement_settings.get('colorize', False):
                 pil_img = self._apply_colorization_pil(pil_img)
-        
-        # Step 5: Apply PIL enhancements
-        pil_img = self._apply_pil_enhancements(pil_img, enhancement_settings)
-        
-        # Step 6: Save enhanced image
-        if output_path is None:
-            output_path = image_path
-        
-        if OPENCV_AVAILABLE:
-            # Convert back to BGR for OpenCV saving
-            final_cv_img = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-            # Save with original quality
-            success = cv2.imwrite(output_path, final_cv_img, [cv2.IMWRITE_JPEG_QUALITY, 95])
-            if not success:
-                raise IOError(f"Failed to save enhanced image: {output_path}")
-        else:
-            # Use PIL for saving
+            
+            # Apply PIL enhancements and save
+            pil_img = self._apply_pil_enhancements(pil_img, enhancement_settings)
             pil_img.save(output_path, 'JPEG', quality=95)
         
+        if cache_key:
+            enhancement_cache.store(cache_key, output_path)
+        
         logger.info(f"Auto-enhancement completed: {output_path}")
         return output_path, enhancement_settings
     
-    def _apply_denoising(self, img: np.ndarray) -> np.ndarray:
-        """Apply bilateral filtering to reduce noise while preserving edges"""
-        if not OPENCV_AVAILABLE:
-            return img
-        try:
-            # Bilateral filter - reduces noise while keeping edges sharp
-            return cv2.bilateralFilter(img, 9, 75, 75)
-        except Exception as e:
-            logger.warning(f"Denoising failed: {e}")
-            return img
-    
-    def _apply_clahe(self, img: np.ndarray) -> np.ndarray:
-        """Apply Contrast Limited Adaptive Histogram Equalization"""
-        if not OPENCV_AVAILABLE:
-            return img
-        try:
-            # Convert to LAB color space
-            lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-            l, a, b = cv2.split(lab)
-            
-            # Apply CLAHE to the L channel only
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-            enhanced_l = clahe.apply(l)
-            
-            # Merge channels back
-            enhanced_lab = cv2.merge([enhanced_l, a, b])
-            return cv2.cvtColor(enhanced_lab, cv2.COLOR_LAB2BGR)
-        except Exception as e:
-            logger.warning(f"CLAHE enhancement failed: {e}")
-            return img
-    
-    def _apply_auto_levels(self, img: np.ndarray) -> np.ndarray:
-        """Automatically adjust levels to improve dynamic range"""
-        try:
-            # Convert to float for calculations
-            img_float = img.astype(np.float64) / 255.0
-            
-            # Calculate percentile-based levels (ignore extreme 1% on each end)
-            low_perc = np.percentile(img_float, 1)
-            high_perc = np.percentile(img_float, 99)
-            
-            # Avoid division by zero
-            if high_perc - low_perc < 0.01:
-                return img
-            
-            # Stretch levels
-            img_stretched = (img_float - low_perc) / (high_perc - low_perc)
-            img_stretched = np.clip(img_stretched, 0, 1)
-            
-            return (img_stretched * 255).astype(np.uint8)
-        except Exception as e:
-            logger.warning(f"Auto-levels adjustment failed: {e}")
-            return img
-    
-    def _apply_colorization(self, img: np.ndarray) -> np.ndarray:
-        """
-        Apply automatic colorization to grayscale images using LAB color space
-        This uses a simple but effective technique to add warm tones to B&W photos
-        """
-        if not OPENCV_AVAILABLE:
-            return img
-        try:
-            # Check if image is grayscale or already color
-            if len(img.shape) == 2:
-                # Image is grayscale, convert to BGR first
-                img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
-            
-            # Check if image is already colorful (not grayscale)
-            b, g, r = cv2.split(img)
-            if not (np.allclose(b, g, atol=5) and np.allclose(g, r, atol=5)):
-                # Image already has color, skip colorization
-                logger.info("Image already has color, skipping colorization")
-                return img
-            
-            # Convert to LAB color space for colorization
-            lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-            l, a, b = cv2.split(lab)
-            
-            # Apply warm sepia-like tones to create a colorized effect
-            # Add warm tones (yellow-orange) to the A channel
-            a_colored = np.clip(a.astype(np.float32) + 10, 0, 255).astype(np.uint8)
-            # Add slight warm tones to the B channel
-            b_colored = np.clip(b.astype(np.float32) + 15, 0, 255).astype(np.uint8)
-            
-            # Merge back and convert to BGR
-            colorized_lab = cv2.merge([l, a_colored, b_colored])
-            colorized = cv2.cvtColor(colorized_lab, cv2.COLOR_LAB2BGR)
-            
-            logger.info("Applied automatic colorization with warm tones")
-            return colorized
-            
-        except Exception as e:
-            logger.warning(f"Colorization failed: {e}")
-            return img
-    
     def _apply_colorization_pil(self, pil_img: Image.Image) -> Image.Image:
         """
         Apply colorization using PIL (fallback method)
@@ -4,20 +4,40 @@ Extracts comprehensive metadata from photographs for digitization projects
 """
 
 from PIL import Image, ExifTags
-import exifread
 import logging
 from datetime import datetime
 from typing import Dict, Optional, Tuple, Any
 import json
 import os
 import re
+from photovault.utils.exif_parser import parse_image_header, HEADER_READ_SIZE
+from photovault.utils.geohash import encode as encode_geohash
 
 logger = logging.getLogger(__name__)
 
+# Optional exifread import for files the header parser cannot fully read
+try:
+    import exifread
+    EXIFREAD_AVAILABLE = True
+except ImportError:
+    exifread = None
+    EXIFREAD_AVAILABLE = False
+
+# Fields of extract_photo_metadata_for_db stored in Photo columns of the same name
+PHOTO_EXIF_FIELDS = (
+    'camera_make', 'camera_model', 'iso', 'aperture', 'shutter_speed', 'focal_length', 'flash_used',
+    'gps_latitude', 'gps_longitude', 'gps_altitude', 'geohash', 'orientation', 'color_space'
+)
+
 class MetadataExtractor:
     """Extract and process EXIF metadata from photographs"""
     
-    def __init__(self):
+    def __init__(self, use_exifread: Optional[bool] = None):
+        # Full-file exifread pass when the header parser cannot read a file completely (opt-in)
+        if use_exifread is None:
+            use_exifread = os.environ.get('METADATA_EXIFREAD_FALLBACK', '').lower() in ('1', 'true', 'yes')
+        self.use_exifread = use_exifread and EXIFREAD_AVAILABLE
+        
         # GPS reference mappings
         self.gps_ref_map = {
             'N': 1, 'S': -1, 'E': 1, 'W': -1
@@ -46,26 +66,42 @@ class MetadataExtractor:
             return {}
         
         try:
-            # Try PIL first for modern EXIF support
-            pil_metadata = self._extract_pil_metadata(image_path)
+            # One open, one read of the header region, one fstat
+            with open(image_path, 'rb') as f:
+                header = f.read(HEADER_READ_SIZE)
+                file_metadata = self._stat_to_metadata(os.fstat(f.fileno()))
             
-            # Try exifread for additional data and fallback
-            exifread_metadata = self._extract_exifread_metadata(image_path)
+            combined_metadata = self.extract_header_metadata(header)
             
-            # Merge and normalize data
-            combined_metadata = self._merge_metadata(pil_metadata, exifread_metadata)
+            # Formats the header parser does not know still get their dimensions from Pillow
+            if combined_metadata.get('width') is None:
+                combined_metadata = self._merge_metadata(self._extract_pil_metadata(image_path), combined_metadata)
+            
+            if self.use_exifread and not combined_metadata.get('header_complete'):
+                exifread_metadata = self._extract_exifread_metadata(image_path)
+                combined_metadata = self._merge_metadata(combined_metadata, exifread_metadata)
             
-            # Add file-based metadata
-            file_metadata = self._extract_file_metadata(image_path)
             combined_metadata.update(file_metadata)
             
-            logger.info(f"Extracted metadata from: {image_path}")
+            logger.debug(f"Extracted metadata from: {image_path}")
             return combined_metadata
             
         except Exception as e:
             logger.error(f"Error extracting metadata from {image_path}: {e}")
             return self._extract_file_metadata(image_path)  # At least return file info
     
+    def extract_header_metadata(self, header: bytes) -> Dict[str, Any]:
+        """
+        Extract metadata from the leading bytes of an image, e.g. an upload buffer or a ranged read
+        
+        Args:
+            header: First HEADER_READ_SIZE bytes of the file (or the whole file)
+            
+        Returns:
+            Dictionary of format, dimensions and EXIF fields
+        """
+        return parse_image_header(header)
+    
     def _extract_pil_metadata(self, image_path: str) -> Dict[str, Any]:
         """Extract metadata using Pillow/PIL"""
         metadata = {}
@@ -116,18 +152,19 @@ class MetadataExtractor:
     
     def _extract_file_metadata(self, image_path: str) -> Dict[str, Any]:
         """Extract file system metadata"""
-        metadata = {}
-        
         try:
-            stat = os.stat(image_path)
-            metadata['file_size'] = stat.st_size
-            metadata['file_modified'] = datetime.fromtimestamp(stat.st_mtime)
-            metadata['file_created'] = datetime.fromtimestamp(stat.st_ctime)
-            
+            return self._stat_to_metadata(os.stat(image_path))
         except Exception as e:
             logger.warning(f"File metadata extraction failed: {e}")
-        
-        return metadata
+            return {}
+    
+    def _stat_to_metadata(self, stat: os.stat_result) -> Dict[str, Any]:
+        """Convert a stat result to file metadata fields"""
+        return {
+            'file_size': stat.st_size,
+            'file_modified': datetime.fromtimestamp(stat.st_mtime),
+            'file_created': datetime.fromtimestamp(stat.st_ctime)
+        }
     
     def _merge_metadata(self, pil_data: Dict, exifread_data: Dict) -> Dict[str, Any]:
         """Merge and normalize metadata from different sources"""
@@ -148,8 +185,26 @@ class MetadataExtractor:
         Returns:
             Dictionary with keys matching Photo model fields
         """
-        raw_metadata = self.extract_all_metadata(image_path)
+        return self._to_db_metadata(self.extract_all_metadata(image_path))
+    
+    def extract_photo_metadata_from_header(self, header: bytes, file_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Extract metadata formatted for database storage from the leading bytes of an image,
+        without touching the stored file
         
+        Args:
+            header: First HEADER_READ_SIZE bytes of the file
+            file_size: Size of the whole file, if known
+            
+        Returns:
+            Dictionary with keys matching Photo model fields
+        """
+        raw_metadata = self.extract_header_metadata(header)
+        raw_metadata['file_size'] = file_size
+        return self._to_db_metadata(raw_metadata)
+    
+    def _to_db_metadata(self, raw_metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize raw metadata into Photo model fields"""
         # Initialize database fields
         db_metadata = {
             'date_taken': None,
@@ -163,6 +218,7 @@ class MetadataExtractor:
             'gps_latitude': None,
             'gps_longitude': None,
             'gps_altitude': None,
+            'geohash': None,
             'orientation': None,
             'color_space': None,
             'width': raw_metadata.get('width'),
@@ -185,6 +241,8 @@ class MetadataExtractor:
         db_metadata['gps_latitude'] = lat
         db_metadata['gps_longitude'] = lon
         db_metadata['gps_altitude'] = alt
+        if lat is not None and lon is not None:
+            db_metadata['geohash'] = encode_geohash(lat, lon)
         
         # Image properties
         db_metadata['orientation'] = self._extract_orientation(raw_metadata)
@@ -417,6 +475,10 @@ def extract_metadata_for_photo(image_path: str) -> Dict[str, Any]:
     """Convenience function for extracting photo metadata"""
     return extractor.extract_photo_metadata_for_db(image_path)
 
+def extract_metadata_from_header(header: bytes, file_size: Optional[int] = None) -> Dict[str, Any]:
+    """Convenience function for extracting photo metadata from an in-memory file header"""
+    return extractor.extract_photo_metadata_from_header(header, file_size)
+
 def extract_all_metadata(image_path: str) -> Dict[str, Any]:
     """Convenience function for extracting all available metadata"""
     return extractor.extract_all_metadata(image_path)
\ No newline at end of file
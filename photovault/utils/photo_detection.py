@@ -4,13 +4,32 @@ Uses OpenCV to detect rectangular photos within larger images and extract them a
 """
 import os
 import cv2
+import json
+import hashlib
 import numpy as np
 from typing import List, Dict, Tuple
 import logging
-from PIL import Image
+from PIL import Image, ImageOps
 
 logger = logging.getLogger(__name__)
 
+# Bump when detection code changes in a way that alters results (invalidates cached detections)
+DETECTOR_VERSION = 3
+
+# Long edge (px) of the proxy image contours are detected on; 0 disables downscaling
+DEFAULT_DETECTION_MAX_DIMENSION = 2048
+
+# Transpose that displays a stored raster according to its EXIF orientation tag
+EXIF_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90
+}
+
 # Check OpenCV availability
 try:
     import cv2
@@ -23,22 +42,47 @@ except ImportError:
 class PhotoDetector:
     """Automatic detection and extraction of rectangular photos from images"""
     
-    def __init__(self):
+    def __init__(self, max_dimension: int = None):
+        if max_dimension is None:
+            max_dimension = int(os.environ.get('PHOTO_DETECTION_MAX_DIMENSION') or DEFAULT_DETECTION_MAX_DIMENSION)
+        self.max_dimension = max_dimension  # Proxy long edge for contour detection
         self.min_photo_area = 10000  # Minimum area for a valid photo (pixels)
         self.max_photo_area_ratio = 0.8  # Max ratio of detected photo to original image
         self.min_aspect_ratio = 0.3  # Minimum width/height ratio
         self.max_aspect_ratio = 3.0  # Maximum width/height ratio
         self.contour_area_threshold = 0.01  # Min contour area as fraction of image
         
-    def detect_photos(self, image_path: str) -> List[Dict]:
+    def get_version_key(self) -> str:
+        """
+        Identify the detector name and parameters, for keying cached detections
+        
+        Returns:
+            Short string that changes whenever detection results could change
+        """
+        params = {
+            'version': DETECTOR_VERSION,
+            'min_photo_area': self.min_photo_area,
+            'max_photo_area_ratio': self.max_photo_area_ratio,
+            'min_aspect_ratio': self.min_aspect_ratio,
+            'max_aspect_ratio': self.max_aspect_ratio,
+            'contour_area_threshold': self.contour_area_threshold,
+            'max_dimension': self._get_max_dimension()
+        }
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+        return f"contours-{digest}"
+    
+    def detect_photos(self, image_path: str, include_contours: bool = False) -> List[Dict]:
         """
         Detect rectangular photos in an image
         
         Args:
             image_path: Path to the image file
+            include_contours: Also return the full contour point list of each
+                detection (large; for debugging/visualization only)
             
         Returns:
-            List of detected photo regions with coordinates and metadata
+            List of detected photo regions with bounding box, simplified polygon,
+            four corner points and metadata
         """
         if not OPENCV_AVAILABLE:
             logger.warning("Photo detection not available - OpenCV not installed")
@@ -50,22 +94,16 @@ class PhotoDetector:
             
         image = None
         try:
-            # Load image with memory management
-            image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+            # Decode a downscaled proxy; full-resolution pixels are only read on extraction
+            image, scale, (width, height) = self._load_detection_proxy(image_path)
             if image is None:
                 logger.error(f"Could not load image: {image_path}")
                 return []
                 
-            logger.info(f"Starting photo detection on {image_path}")
-            
-            # Check image size to prevent memory issues - reject instead of resize
-            height, width = image.shape[:2]
-            if height * width > 25000000:  # ~25MP limit for detection
-                logger.error(f"Image too large for processing: {width}x{height} pixels. Maximum supported: 25MP")
-                return []
+            logger.info(f"Starting photo detection on {image_path} ({width}x{height}, "
+                        f"proxy {image.shape[1]}x{image.shape[0]})")
             
-            # Get image dimensions
-            height, width = image.shape[:2]
+            # Region filters work in original image coordinates
             original_area = width * height
             
             # Preprocess image for edge detection
@@ -82,6 +120,10 @@ class PhotoDetector:
                 return []
             
             for i, contour in enumerate(contours):
+                # Map the proxy contour back to original image coordinates
+                if scale != 1.0:
+                    contour = np.round(contour / scale).astype(np.int32)
+                    
                 # Get bounding rectangle
                 x, y, w, h = cv2.boundingRect(contour)
                 area = w * h
@@ -94,7 +136,7 @@ class PhotoDetector:
                 confidence = self._calculate_confidence(contour, x, y, w, h)
                 
                 if confidence > 0.3:  # Minimum confidence threshold
-                    detected_photos.append({
+                    detection = {
                         'x': int(x),
                         'y': int(y),
                         'width': int(w),
@@ -102,8 +144,12 @@ class PhotoDetector:
                         'area': int(area),
                         'confidence': float(confidence),
                         'aspect_ratio': float(w/h),
-                        'contour': contour.tolist()  # For debugging/visualization
-                    })
+                        'polygon': self._simplify_contour(contour),
+                        'corners': self._find_corners(contour)
+                    }
+                    if include_contours:
+                        detection['contour'] = contour.reshape(-1, 2).tolist()  # For debugging/visualization
+                    detected_photos.append(detection)
             
             # Sort by confidence
             detected_photos.sort(key=lambda p: p['confidence'], reverse=True)
@@ -131,6 +177,95 @@ class PhotoDetector:
                 except:
                     pass
     
+    def _get_max_dimension(self) -> int:
+        """Get the proxy long-edge limit, preferring the app config when available"""
+        try:
+            from flask import current_app, has_app_context
+            if has_app_context():
+                return int(current_app.config.get('PHOTO_DETECTION_MAX_DIMENSION', self.max_dimension) or 0)
+        except ImportError:
+            pass
+        return self.max_dimension
+        
+    def _load_detection_proxy(self, image_path: str) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+        """
+        Decode an image at reduced size for contour detection
+        
+        JPEGs are decoded with DCT scaling (draft mode), so large scans are never
+        fully decoded just to be downscaled again.
+        
+        Args:
+            image_path: Path to the image file
+            
+        Returns:
+            Tuple of (BGR proxy image or None, scale factor from original to proxy,
+            (original width, original height))
+        """
+        max_dimension = self._get_max_dimension()
+        
+        try:
+            img = Image.open(image_path)
+        except OSError as e:
+            logger.error(f"Could not open image {image_path}: {e}")
+            return None, 1.0, (0, 0)
+            
+        with img:
+            # Orientation as displayed, matching cv2.imread
+            orientation = img.getexif().get(0x0112, 1)
+            width, height = img.size
+            if orientation in (5, 6, 7, 8):
+                width, height = height, width
+                
+            if max_dimension > 0 and max(width, height) > max_dimension:
+                scale = max_dimension / max(width, height)
+                target = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+                draft_size = (target[1], target[0]) if orientation in (5, 6, 7, 8) else target
+                img.draft('RGB', draft_size)
+            else:
+                scale = 1.0
+                target = (width, height)
+                
+            proxy = ImageOps.exif_transpose(img).convert('RGB')
+            if proxy.size != target:
+                proxy = proxy.resize(target, Image.Resampling.BOX)
+                
+            image = cv2.cvtColor(np.asarray(proxy), cv2.COLOR_RGB2BGR)
+            
+        # Use the exact per-axis ratio of the final proxy for mapping back
+        scale = image.shape[1] / width if scale != 1.0 else 1.0
+        return image, scale, (width, height)
+        
+    def _to_stored_box(self, box: Tuple[int, int, int, int], orientation: int,
+                       stored_size: Tuple[int, int]) -> Tuple[int, int, int, int]:
+        """
+        Map a crop box in displayed (EXIF-oriented) coordinates to the stored raster
+        
+        Args:
+            box: (left, top, right, bottom) in displayed coordinates
+            orientation: EXIF orientation tag value
+            stored_size: (width, height) of the stored raster
+            
+        Returns:
+            (left, top, right, bottom) in stored coordinates
+        """
+        x0, y0, x1, y1 = box
+        sw, sh = stored_size
+        if orientation == 2:
+            return (sw - x1, y0, sw - x0, y1)
+        if orientation == 3:
+            return (sw - x1, sh - y1, sw - x0, sh - y0)
+        if orientation == 4:
+            return (x0, sh - y1, x1, sh - y0)
+        if orientation == 5:
+            return (y0, x0, y1, x1)
+        if orientation == 6:
+            return (y0, sh - x1, y1, sh - x0)
+        if orientation == 7:
+            return (sw - y1, sh - x1, sw - y0, sh - x0)
+        if orientation == 8:
+            return (sw - y1, x0, sw - y0, x1)
+        return box
+        
     def _preprocess_image(self, image: np.ndarray) -> np.ndarray:
         """Preprocess image for better edge detection"""
         # Convert to grayscale
@@ -170,6 +305,20 @@ class PhotoDetector:
         
         return filtered_contours[:20]  # Limit to top 20 contours for efficiency
     
+    def _simplify_contour(self, contour) -> List[List[int]]:
+        """Approximate a contour with a polygon of a few vertices"""
+        epsilon = 0.02 * cv2.arcLength(contour, True)
+        polygon = cv2.approxPolyDP(contour, epsilon, True)
+        return polygon.reshape(-1, 2).astype(int).tolist()
+        
+    def _find_corners(self, contour) -> List[List[int]]:
+        """Get the corners of a contour's minimum-area rectangle, ordered top-left, top-right, bottom-right, bottom-left"""
+        points = cv2.boxPoints(cv2.minAreaRect(contour))
+        sums = points.sum(axis=1)
+        diffs = np.diff(points, axis=1).ravel()
+        corners = [points[np.argmin(sums)], points[np.argmin(diffs)], points[np.argmax(sums)], points[np.argmax(diffs)]]
+        return [[int(round(px)), int(round(py))] for px, py in corners]
+        
     def _is_valid_photo_region(self, x: int, y: int, w: int, h: int, original_area: int) -> bool:
         """Validate if a region could be a photo"""
         area = w * h
@@ -236,17 +385,12 @@ class PhotoDetector:
             
         image = None
         try:
-            # Load original image with memory management
-            image = cv2.imread(image_path, cv2.IMREAD_COLOR)
-            if image is None:
-                logger.error(f"Could not load image: {image_path}")
-                return []
-            
-            # Check image size for extraction
-            height, width = image.shape[:2]
-            if height * width > 30000000:  # Limit for extraction (slightly higher)
-                logger.error(f"Image too large for extraction: {width}x{height} pixels")
-                return []
+            # Open lazily; the pixels are decoded once and only the detected windows are copied out
+            image = Image.open(image_path)
+            orientation = image.getexif().get(0x0112, 1)
+            width, height = image.size
+            if orientation in (5, 6, 7, 8):
+                width, height = height, width
                 
             # Create output directory if it doesn't exist
             os.makedirs(output_dir, exist_ok=True)
@@ -263,21 +407,26 @@ class PhotoDetector:
                     padding = 10
                     x_start = max(0, x - padding)
                     y_start = max(0, y - padding)
-                    x_end = min(image.shape[1], x + w + padding)
-                    y_end = min(image.shape[0], y + h + padding)
+                    x_end = min(width, x + w + padding)
+                    y_end = min(height, y + h + padding)
                     
-                    # Extract the region
-                    extracted_region = image[y_start:y_end, x_start:x_end]
+                    # Extract the region from the stored raster, then orient only the crop
+                    box = self._to_stored_box((x_start, y_start, x_end, y_end), orientation, image.size)
+                    extracted_region = image.crop(box)
+                    if orientation in EXIF_TRANSPOSE:
+                        extracted_region = extracted_region.transpose(EXIF_TRANSPOSE[orientation])
+                    if extracted_region.mode != 'RGB':
+                        extracted_region = extracted_region.convert('RGB')
                     
                     # Generate filename
                     output_filename = f"{base_filename}_photo_{i+1:02d}_conf{photo['confidence']:.2f}.jpg"
                     output_path = os.path.join(output_dir, output_filename)
                     
                     # Save extracted photo with quality control
-                    success = cv2.imwrite(output_path, extracted_region, 
-                                        [cv2.IMWRITE_JPEG_QUALITY, 95])
-                    if not success:
-                        logger.error(f"Failed to save extracted photo: {output_path}")
+                    try:
+                        extracted_region.save(output_path, 'JPEG', quality=95)
+                    except OSError as e:
+                        logger.error(f"Failed to save extracted photo: {output_path}: {e}")
                         continue
                     
                     extracted_info = {
@@ -307,18 +456,18 @@ class PhotoDetector:
             return []
         finally:
             # Ensure memory cleanup
-            if 'image' in locals() and image is not None:
+            if image is not None:
                 try:
-                    del image
+                    image.close()
                 except:
                     pass
 
 # Global instance
 photo_detector = PhotoDetector()
 
-def detect_photos_in_image(image_path: str) -> List[Dict]:
+def detect_photos_in_image(image_path: str, include_contours: bool = False) -> List[Dict]:
     """Convenience function for detecting photos in an image"""
-    return photo_detector.detect_photos(image_path)
+    return photo_detector.detect_photos(image_path, include_contours=include_contours)
 
 def extract_detected_photos(image_path: str, output_dir: str, detected_photos: List[Dict]) -> List[Dict]:
     """Convenience function for extracting detected photos"""
@@ -0,0 +1,78 @@
+"""
+Bulk Upsert Helper for PhotoVault
+Multi-row INSERT ... ON CONFLICT statements for PostgreSQL and SQLite
+"""
+
+import logging
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy.dialects import postgresql, sqlite
+
+logger = logging.getLogger(__name__)
+
+# Bound parameters per statement, under SQLite's historical limit of 999
+MAX_STATEMENT_PARAMETERS = 900
+
+_DIALECT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+def _dialect_insert(connection):
+    """INSERT construct with ON CONFLICT support for the connection's database"""
+    dialect = connection.get_bind().dialect.name if hasattr(connection, 'get_bind') else connection.dialect.name
+    insert = _DIALECT_INSERTS.get(dialect)
+    if insert is None:
+        raise NotImplementedError(f"Bulk upsert is not supported on {dialect}")
+    return insert
+
+def bulk_upsert(connection, table, rows: List[Dict], conflict_columns: Sequence[str],
+                update_columns: Optional[Sequence[str]] = None) -> int:
+    """
+    Insert rows, updating or skipping those that collide on a unique constraint
+    
+    Args:
+        connection: Connection or session to execute on
+        table: Target Table
+        rows: Row dictionaries, all with the same keys
+        conflict_columns: Columns of the unique constraint that detects existing rows
+        update_columns: Columns overwritten on existing rows; None skips existing rows
+        
+    Returns:
+        Number of rows inserted or updated
+    """
+    if not rows:
+        return 0
+        
+    insert = _dialect_insert(connection)
+    chunk_size = max(1, MAX_STATEMENT_PARAMETERS // len(rows[0]))
+    written = 0
+    for start in range(0, len(rows), chunk_size):
+        statement = insert(table).values(rows[start:start + chunk_size])
+        if update_columns:
+            statement = statement.on_conflict_do_update(
+                index_elements=list(conflict_columns),
+                set_={column: statement.excluded[column] for column in update_columns}
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=list(conflict_columns))
+        written += connection.execute(statement).rowcount
+    return written
+
+def insert_from_select(connection, table, columns: Sequence[str], select_statement,
+                       conflict_columns: Sequence[str]) -> int:
+    """
+    Insert the rows of a SELECT in one statement, skipping those that collide on a unique constraint
+    
+    Args:
+        connection: Connection or session to execute on
+        table: Target Table
+        columns: Target columns, in the order the SELECT returns them
+        select_statement: SELECT producing the new rows; it must have a WHERE clause on SQLite
+        conflict_columns: Columns of the unique constraint that detects existing rows
+        
+    Returns:
+        Number of rows inserted
+    """
+    statement = _dialect_insert(connection)(table).from_select(list(columns), select_statement)
+    statement = statement.on_conflict_do_nothing(index_elements=list(conflict_columns))
+    return connection.execute(statement).rowcount